@@ -3,31 +3,39 @@ from flask_cors import CORS
 import yt_dlp
 import os
 import argparse
+import threading
 from database import add_video, get_video, get_tables, get_table_data, execute_query, update_video_metadata, commit_query
 import database
 from datetime import datetime
 from routes.films import films_bp
-from routes.videos import videos_bp
+from routes.videos import videos_bp, init_ell
 from routes.hotkeys import hotkeys_bp
 from routes.upload import upload_bp, DOWNLOAD_DIRECTORY
 from routes.bounding_boxes import bp as bounding_boxes_bp
 import requests
+import b2
 from b2 import bucket
 from routes.homography import homography_bp
 from routes.datasets import datasets_bp
-from routes.b2_files import b2_bp
+from routes.b2_files import b2_bp, init_b2_files
+from routes.jobs import jobs_bp
+from jobs import job_runner
 
 
 app = Flask(__name__, static_folder='react_app/build', template_folder='templates')
 CORS(app)
 CORS(films_bp)
-CORS(videos_bp)
+CORS(videos_bp, expose_headers=[
+    'X-Next-After-Id', 'X-Frames-Decoded', 'X-Total-Frames', 'X-Thumbnail-Frame',
+    'X-Items-Missing', 'X-Contact-Sheet-Layout'
+])
 CORS(hotkeys_bp)
 CORS(upload_bp)
 CORS(bounding_boxes_bp)
-CORS(homography_bp)
+CORS(homography_bp, expose_headers=['X-Heatmap-Total'])
 CORS(datasets_bp)
 CORS(b2_bp)
+CORS(jobs_bp)
 
 app.register_blueprint(films_bp, url_prefix='/api/films')
 app.register_blueprint(videos_bp, url_prefix='/api/videos')
@@ -37,13 +45,48 @@ app.register_blueprint(homography_bp, url_prefix='/api/homography')
 app.register_blueprint(datasets_bp, url_prefix='/datasets')
 app.register_blueprint(bounding_boxes_bp, url_prefix='/bounding-boxes')
 app.register_blueprint(b2_bp, url_prefix='/api/b2')
-
-if not os.path.exists(DOWNLOAD_DIRECTORY):
-    os.makedirs(DOWNLOAD_DIRECTORY)
+app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
 
 # Add a global variable to track test mode
 test_mode = False
 
+_started = False
+_startup_lock = threading.Lock()
+
+def startup():
+    """
+    One-time setup of the server process: B2, ell, the databases and job recovery.
+
+    Nothing here may run on import. Crop extraction spawns worker processes
+    that re-import this module as __mp_main__. Without this guard each worker
+    would authorize with B2, run the migrations and mark the server's jobs as
+    interrupted. Only the first call in a process does anything.
+    """
+    global _started
+    with _startup_lock:
+        if _started:
+            return
+        _startup()
+        _started = True
+
+def _startup():
+    b2.authorize()
+    init_b2_files()
+    init_ell()
+    database.init_db()  # also initializes bounding_boxes.db, which its migrations write to
+    job_runner.recover()
+    os.makedirs(DOWNLOAD_DIRECTORY, exist_ok=True)
+
+def create_app():
+    """
+    The app after startup(), for WSGI servers: gunicorn -w 1 'app:create_app()'.
+
+    Use one worker process: jobs run in-process, and each worker's startup
+    marks the jobs of the others as interrupted.
+    """
+    startup()
+    return app
+
 # New route for the studio page
 @app.route('/studio', methods=['GET', 'POST'])
 def studio():
@@ -129,5 +172,6 @@ if __name__ == '__main__':
 
     if test_mode:
         print("Running in test mode")
-    
+
+    startup()
     app.run(debug=True)
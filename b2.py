@@ -1,5 +1,7 @@
 from b2sdk.v2 import *
+from b2sdk.v2.exception import FileNotPresent
 import os
+import threading
 
 info = InMemoryAccountInfo()
 b2_api = B2Api(info)
@@ -10,13 +12,44 @@ B2_APPLICATION_KEY = os.getenv('BACKBLAZE_APPLICATION_KEY')
 B2_BUCKET_NAME = 'remotion-videos'
 B2_SAM_BUCKET = 'sam-videos'
 
-# Initialize B2 connection
-b2_api.authorize_account("production", B2_KEY_ID, B2_APPLICATION_KEY)
-bucket = b2_api.get_bucket_by_name(B2_BUCKET_NAME)
-sam_bucket = b2_api.get_bucket_by_name(B2_SAM_BUCKET)
+_buckets = {}
+_authorize_lock = threading.Lock()
 
+def authorize():
+    """
+    Authorize the B2 account and look up the buckets, once per process.
 
-def check_file_exists_in_b2(filename, this_bucket=bucket):
+    Called from app startup; anything that uses a bucket earlier authorizes
+    on first use. Importing this module never contacts B2.
+    """
+    with _authorize_lock:
+        if not _buckets:
+            b2_api.authorize_account("production", B2_KEY_ID, B2_APPLICATION_KEY)
+            for name in (B2_BUCKET_NAME, B2_SAM_BUCKET):
+                _buckets[name] = b2_api.get_bucket_by_name(name)
+    return _buckets
+
+class LazyBucket:
+    """A named bucket, resolved through authorize() on first attribute access"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(authorize()[self.name], attr)
+
+bucket = LazyBucket(B2_BUCKET_NAME)
+sam_bucket = LazyBucket(B2_SAM_BUCKET)
+
+
+def check_file_exists_in_b2(filename, this_bucket=bucket, raise_errors=False):
+    """
+    (True, file info) if filename is in the bucket, (False, None) if it is not.
+
+    Any other error (network, auth) is logged and also reported as (False, None),
+    unless raise_errors is set: then it is raised, so callers that delete local
+    copies on a miss can tell "gone" from "couldn't ask".
+    """
     try:
         # Get file info directly using file name
         file_version = this_bucket.get_file_info_by_name(filename)
@@ -31,8 +64,10 @@ def check_file_exists_in_b2(filename, this_bucket=bucket):
         }
         return True, file_info
         
-    except FileNotFoundError:
+    except (FileNotPresent, FileNotFoundError):
         return False, None
     except Exception as e:
         print(f"Error checking B2 file: {str(e)}")
+        if raise_errors:
+            raise
         return False, None
@@ -0,0 +1,86 @@
+"""
+Benchmark inverted-mode collect_frames_for_batch: the original any() scan over
+every catch/throw range vs the per-player RangeIndex.
+
+    python bench_collect_frames.py --frames 100000 --players 14 --catches 800
+"""
+import argparse
+import random
+import time
+from trajectories import collect_frames_for_batch, RangeIndex
+
+def collect_frames_legacy(boxes_data, frame_range, catch_throw_ranges, skip=0, name_prefix=''):
+    """The original inverted-mode loop, kept for comparison"""
+    frame_data = []
+    frame_count = 0
+    start_frame, end_frame = frame_range
+    for frame in range(start_frame, end_frame + 1):
+        if skip > 0 and frame_count > 0 and frame_count % (skip + 1) != 0:
+            frame_count += 1
+            continue
+        if frame < len(boxes_data):
+            for p_name, box_data in boxes_data[frame].items():
+                is_in_sequence = False
+                if catch_throw_ranges:
+                    is_in_sequence = any(
+                        r['player'] == p_name and
+                        r['range'][0] <= frame <= r['range'][1]
+                        for r in catch_throw_ranges
+                    )
+                if not is_in_sequence:
+                    frame_data.append((frame, f"{name_prefix}{p_name}_non_throw", box_data['bbox']))
+        frame_count += 1
+    return frame_data
+
+def synthetic_game(frames, players, catches, seed=0):
+    """boxes.json-shaped frames with every player visible, plus buffered catch/throw ranges"""
+    rng = random.Random(seed)
+    names = [f"Player {i}" for i in range(players)]
+    boxes_data = [
+        {name: {'bbox': [rng.random() * 1800, rng.random() * 1000, 60, 120]} for name in names}
+        for _ in range(frames)
+    ]
+    ranges = []
+    for _ in range(catches):
+        catch_frame = rng.randrange(frames)
+        throw_frame = catch_frame + rng.randrange(5, 90)
+        ranges.append({
+            'player': rng.choice(names),
+            'range': (max(0, catch_frame - 30), throw_frame + 30)
+        })
+    return boxes_data, ranges
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=100000)
+    parser.add_argument('--players', type=int, default=14)
+    parser.add_argument('--catches', type=int, default=800)
+    parser.add_argument('--skip', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    boxes_data, ranges = synthetic_game(args.frames, args.players, args.catches)
+    frame_range = (0, args.frames - 1)
+    print(f"{args.frames} frames, {args.players} players, {len(ranges)} catch/throw ranges, skip={args.skip}")
+
+    legacy_seconds, legacy = timed(lambda: collect_frames_legacy(boxes_data, frame_range, ranges, skip=args.skip), args.repeat)
+    index_seconds, indexed = timed(lambda: collect_frames_for_batch(
+        boxes_data, frame_range, None, catch_throw_ranges=ranges, skip=args.skip, is_throw_sequence=False
+    ), args.repeat)
+    build_seconds, _ = timed(lambda: RangeIndex(ranges), args.repeat)
+
+    assert legacy == indexed, 'implementations disagree'
+    print(f"legacy any():  {legacy_seconds:8.3f}s")
+    print(f"RangeIndex:    {index_seconds:8.3f}s  (index build {build_seconds * 1000:.2f} ms)")
+    print(f"speedup:       {legacy_seconds / index_seconds:8.1f}x  ({len(indexed)} boxes kept)")
+
+if __name__ == '__main__':
+    main()
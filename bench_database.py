@@ -0,0 +1,166 @@
+"""
+Benchmark videos.db latency while tags are being saved: video reads racing
+metadata writes, with the original connect-per-call / rollback-journal
+helpers vs pooled WAL connections.
+
+    python bench_database.py --videos 50 --tags 200 --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import numpy as np
+import database
+import database_bounding_box
+
+def legacy_get_video(path, video_id):
+    """get_video as it was: a fresh default connection per call"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        video = conn.execute('SELECT * FROM videos WHERE id = ?', (video_id,)).fetchone()
+    finally:
+        conn.close()
+    video = dict(video)
+    video['metadata'] = json.loads(video['metadata']) if video['metadata'] else None
+    return video
+
+def legacy_update_video_metadata(path, video_id, metadata):
+    """update_video_metadata as it was: the whole blob, tags included, on a fresh default connection"""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("UPDATE videos SET metadata = ? WHERE id = ?", (json.dumps(metadata), video_id))
+        database._refresh_possession_index(conn, video_id, metadata['tags'])
+        conn.commit()
+    finally:
+        conn.close()
+
+def synthetic_metadata(rng, tags):
+    return {
+        'tags': [
+            {'name': rng.choice(['catch', 'throw', 'score', 'drop']), 'frame': rng.randrange(100000),
+             'player': f"Player {rng.randrange(14)}"}
+            for _ in range(tags)
+        ]
+    }
+
+def seed(videos, tags, legacy_path=None):
+    """Add videos through database.add_video, or with tags inside the metadata blob at legacy_path"""
+    rng = random.Random(0)
+    conn = sqlite3.connect(legacy_path) if legacy_path else None
+    for i in range(videos):
+        args = (f"Game {i}", 0, f"https://example.com/file/remotion-videos/game{i}.mp4", synthetic_metadata(rng, tags))
+        if conn:
+            conn.execute('INSERT INTO videos (title, size, filepath, metadata) VALUES (?, ?, ?, ?)',
+                         args[:3] + (json.dumps(args[3]),))
+        else:
+            database.add_video(*args)
+    if conn:
+        conn.commit()
+        conn.close()
+
+def is_lock_error(error):
+    """SQLite gave up waiting for a lock: contention the benchmark measures, not a bug"""
+    return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+def run(read, write, videos, tags, readers, writers, seconds):
+    """
+    Hammer read/write from threads for `seconds`; returns latencies in ms and
+    counts of lock timeouts. Any other exception stops its thread and is
+    re-raised once all threads have finished.
+    """
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    failures = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(kind, seed):
+        rng = random.Random(seed)
+        metadata = synthetic_metadata(rng, tags)
+        samples, failed = [], 0
+        while time.perf_counter() < deadline:
+            video_id = rng.randrange(1, videos + 1)
+            started = time.perf_counter()
+            try:
+                if kind == 'read':
+                    read(video_id)
+                else:
+                    metadata['tags'][rng.randrange(tags)]['frame'] = rng.randrange(100000)
+                    write(video_id, metadata)
+            except Exception as e:
+                if not is_lock_error(e):
+                    with lock:
+                        failures.append(e)
+                    break
+                failed += 1
+                continue
+            samples.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies[kind].extend(samples)
+            errors[kind] += failed
+
+    threads = [threading.Thread(target=worker, args=('read', i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write', 100 + i)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise failures[0]
+    return latencies, errors
+
+def report(label, latencies, errors, seconds):
+    print(label)
+    for kind in ['read', 'write']:
+        samples = np.array(latencies[kind]) if latencies[kind] else np.array([np.nan])
+        print(f"  {kind:5}  {len(latencies[kind]) / seconds:8.0f}/s  "
+              f"p50 {np.percentile(samples, 50):7.2f} ms  p95 {np.percentile(samples, 95):7.2f} ms  "
+              f"p99 {np.percentile(samples, 99):7.2f} ms  max {samples.max():8.2f} ms  errors {errors[kind]}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', type=int, default=50)
+    parser.add_argument('--tags', type=int, default=200)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{args.videos} videos with {args.tags} tags each, "
+              f"{args.readers} reader and {args.writers} writer threads for {args.seconds:g}s each")
+
+        # database.init_db() also creates the box store; keep it out of the working directory
+        database_bounding_box.BOUNDING_BOXES_DB = os.path.join(directory, 'bounding_boxes.db')
+        legacy_path = os.path.join(directory, 'legacy.db')
+        database.DATABASE_FILE = legacy_path
+        database.init_db()
+        database.connection_pool.close_all()
+        seed(args.videos, args.tags, legacy_path)
+        conn = sqlite3.connect(legacy_path)
+        conn.execute('PRAGMA journal_mode = DELETE')
+        conn.close()
+        latencies, errors = run(
+            lambda video_id: legacy_get_video(legacy_path, video_id),
+            lambda video_id, metadata: legacy_update_video_metadata(legacy_path, video_id, metadata),
+            args.videos, args.tags, args.readers, args.writers, args.seconds
+        )
+        report('connect per call, rollback journal:', latencies, errors, args.seconds)
+
+        database.DATABASE_FILE = os.path.join(directory, 'pooled.db')
+        database.init_db()
+        seed(args.videos, args.tags)
+        latencies, errors = run(
+            database.get_video, database.update_video_metadata,
+            args.videos, args.tags, args.readers, args.writers, args.seconds
+        )
+        report('pooled connections, WAL:', latencies, errors, args.seconds)
+        database.connection_pool.close_all()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+from b2 import sam_bucket, check_file_exists_in_b2
+from boxes_index import BoxesIndex, build_boxes_index
+
+BOXES_CACHE_DIR = os.getenv('BOXES_CACHE_DIR', 'boxes_cache')
+BOXES_CACHE_MAX_BYTES = int(os.getenv('BOXES_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+BOXES_CACHE_REVALIDATE_SECONDS = float(os.getenv('BOXES_CACHE_REVALIDATE_SECONDS', 30))
+
+def _deep_size(obj):
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key) + _deep_size(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_size(value) for value in obj)
+    return size
+
+def parsed_size(frames, samples=64):
+    """
+    Approximate memory held by a parsed boxes.json frame list.
+
+    Parsed JSON takes several times the file size, so the LRU budget is
+    charged this instead. Measured on up to `samples` evenly spaced frames
+    and scaled up, so it stays cheap on long videos.
+    """
+    if not isinstance(frames, list) or not frames:
+        return _deep_size(frames)
+    sampled = frames[::max(1, len(frames) // samples)]
+    per_frame = sum(_deep_size(frame) for frame in sampled) / len(sampled)
+    return int(sys.getsizeof(frames) + per_frame * len(frames))
+
+def boxes_filename_for(video_url):
+    """Name of the SAM boxes file that belongs to a video URL or filepath"""
+    video_filename = video_url.split('/')[-1]
+    base_filename = video_filename.replace('.mp4', '')
+    return f"{base_filename}.boxes.json"
+
+class BoxesCache:
+    """
+    Two-level cache for SAM <name>.boxes.json files stored in B2.
+
+    Level 1 is a local disk copy per file, validated against the B2 file id
+    and upload timestamp, plus its columnar sidecar (see boxes_index). Level 2
+    is an in-process LRU of parsed frame arrays and memory-mapped indexes,
+    bounded by their estimated in-memory size (see parsed_size). A memory entry is trusted for
+    revalidate_seconds before B2 is asked again whether it changed. Copies
+    are only dropped when B2 says the file is gone; if B2 can't be reached
+    the cached copy keeps being served.
+
+    Parsed frame arrays are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, cache_dir=BOXES_CACHE_DIR, max_bytes=BOXES_CACHE_MAX_BYTES,
+                 revalidate_seconds=BOXES_CACHE_REVALIDATE_SECONDS, bucket=sam_bucket):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.bucket = bucket
+        self._entries = OrderedDict()  # (kind, filename) -> entry dict
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._file_locks = {}
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'not_found': 0,
+            'b2_errors': 0,
+            'revalidations': 0,
+            'index_builds': 0,
+            'evictions': 0
+        }
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _file_lock(self, filename):
+        with self._lock:
+            return self._file_locks.setdefault(filename, threading.RLock())
+
+    def _paths(self, filename):
+        data_path = os.path.join(self.cache_dir, filename)
+        return data_path, f"{data_path}.meta.json"
+
+    def _fresh_entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry['validated_at'] < self.revalidate_seconds:
+                self._entries.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return entry
+        return None
+
+    def _store(self, key, version, size, data):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old['size']
+            self._entries[key] = {
+                'version': version,
+                'size': size,
+                'data': data,
+                'validated_at': time.monotonic()
+            }
+            self._bytes += size
+            # Always keep the entry we just stored, even if it alone exceeds the budget
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted['size']
+                self._counters['evictions'] += 1
+
+    def _drop(self, filename):
+        with self._lock:
+            for key in [('json', filename), ('index', filename)]:
+                old = self._entries.pop(key, None)
+                if old:
+                    self._bytes -= old['size']
+        data_path, meta_path = self._paths(filename)
+        for path in [data_path, meta_path, f"{data_path}.index"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _read_meta(self, filename):
+        _, meta_path = self._paths(filename)
+        if not os.path.exists(meta_path):
+            return {}
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _write_meta(self, filename, meta):
+        _, meta_path = self._paths(filename)
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+
+    def _read_disk_copy(self, filename, version):
+        data_path, _ = self._paths(filename)
+        meta = self._read_meta(filename)
+        if not os.path.exists(data_path) or [meta.get('file_id'), meta.get('upload_timestamp')] != list(version):
+            return None
+        with open(data_path, 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+
+    def _download(self, filename, file_info):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data_path, _ = self._paths(filename)
+        tmp_path = f"{data_path}.{threading.get_ident()}.tmp"
+        print(f"Downloading boxes data from B2: {filename}")
+        downloaded_file = self.bucket.download_file_by_name(filename)
+        downloaded_file.save_to(tmp_path)
+        os.replace(tmp_path, data_path)
+        self._write_meta(filename, {
+            'file_id': file_info['file_id'],
+            'upload_timestamp': file_info['upload_timestamp'],
+            'size': file_info['size']
+        })
+        with open(data_path, 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+
+    def _load_json(self, filename, file_info, version):
+        data = self._read_disk_copy(filename, version)
+        if data is not None:
+            self._count('disk_hits')
+        else:
+            self._count('misses')
+            data = self._download(filename, file_info)
+        return data, parsed_size(data)
+
+    def _load_index(self, filename, file_info, version):
+        data_path, _ = self._paths(filename)
+        index_path = f"{data_path}.index"
+        meta = self._read_meta(filename)
+        if os.path.exists(index_path) and meta.get('index_file_id') == file_info['file_id']:
+            self._count('disk_hits')
+        else:
+            # Already validated against B2 by the caller: build from that version
+            # without asking B2 again
+            with self._lock:
+                entry = self._entries.get(('json', filename))
+                boxes_data = entry['data'] if entry and entry['version'] == version else None
+            if boxes_data is None:
+                boxes_data, size = self._load_json(filename, file_info, version)
+                self._store(('json', filename), version, size, boxes_data)
+            self._count('index_builds')
+            tmp_path = f"{index_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(build_boxes_index(boxes_data))
+            os.replace(tmp_path, index_path)
+            meta = self._read_meta(filename)
+            meta['index_file_id'] = file_info['file_id']
+            self._write_meta(filename, meta)
+        index = BoxesIndex.from_file(index_path)
+        return index, index.nbytes
+
+    def _lookup(self, key, filename, load):
+        entry = self._fresh_entry(key)
+        if entry:
+            return entry['data']
+
+        with self._file_lock(filename):
+            # Another request may have refreshed it while we waited
+            entry = self._fresh_entry(key)
+            if entry:
+                return entry['data']
+
+            try:
+                exists, file_info = check_file_exists_in_b2(filename, self.bucket, raise_errors=True)
+            except Exception as e:
+                return self._serve_stale(key, filename, load, e)
+            self._count('revalidations')
+            if not exists:
+                self._count('not_found')
+                self._drop(filename)
+                return None
+
+            version = (file_info['file_id'], file_info['upload_timestamp'])
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry['version'] == version:
+                    entry['validated_at'] = time.monotonic()
+                    self._entries.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return entry['data']
+
+            data, size = load(filename, file_info, version)
+            if data is not None:
+                self._store(key, version, size, data)
+            return data
+
+    def _serve_stale(self, key, filename, load, error):
+        """The memory or disk copy of a file when B2 can't be asked about it; re-raises if there is none"""
+        self._count('b2_errors')
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                # Try B2 again after another revalidate_seconds
+                entry['validated_at'] = time.monotonic()
+                self._entries.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return entry['data']
+        meta = self._read_meta(filename)
+        if 'file_id' not in meta:
+            raise error
+        print(f"Could not revalidate {filename} with B2, serving the cached copy: {str(error)}")
+        file_info = {'file_id': meta['file_id'], 'upload_timestamp': meta['upload_timestamp'], 'size': meta['size']}
+        version = (file_info['file_id'], file_info['upload_timestamp'])
+        data, size = load(filename, file_info, version)
+        if data is not None:
+            self._store(key, version, size, data)
+        return data
+
+    def get(self, filename):
+        """
+        Get the parsed frame array for a boxes file.
+
+        Returns:
+            list of per-frame dicts, or None if the file is not in B2
+        """
+        return self._lookup(('json', filename), filename, self._load_json)
+
+    def get_index(self, filename):
+        """
+        Get the columnar BoxesIndex for a boxes file, building its sidecar on first use.
+
+        Returns:
+            BoxesIndex backed by a memory-mapped sidecar, or None if the file is not in B2
+        """
+        return self._lookup(('index', filename), filename, self._load_index)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['memory_hits'] + self._counters['disk_hits'] + self._counters['misses']
+            hits = self._counters['memory_hits'] + self._counters['disk_hits']
+            return {
+                **self._counters,
+                'hit_rate': round(hits / lookups, 3) if lookups else None,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+boxes_cache = BoxesCache()
+
+def get_boxes_data(video_url):
+    """Parsed boxes.json frames for a video URL, or None if SAM output does not exist"""
+    return boxes_cache.get(boxes_filename_for(video_url))
+
+def get_boxes_index(video_url):
+    """Columnar BoxesIndex for a video URL, or None if SAM output does not exist"""
+    return boxes_cache.get_index(boxes_filename_for(video_url))
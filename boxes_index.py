@@ -0,0 +1,130 @@
+"""
+Indexed, columnar sidecar format for SAM boxes.json files.
+
+boxes.json is a list with one {player_name: {'bbox': [x, y, w, h]}} dict per
+frame. The sidecar stores the same boxes as packed little-endian columns so a
+frame range can be sliced without parsing (or transferring) the whole file:
+
+    magic        4 bytes   b'GBX1'
+    header       5 x uint32  start_frame, frame_count, box_count, player_count, names_len
+    names        names_len bytes of UTF-8 JSON (list of player names), zero padded to 4 bytes
+    offsets      uint32[frame_count + 1]  boxes of frame i are [offsets[i], offsets[i + 1])
+    player_ids   uint16[box_count], zero padded to 4 bytes, index into names
+    boxes        float32[box_count, 4]  x, y, w, h
+
+A range response from /api/videos/get-boxes uses the same layout, with
+start_frame set to the first frame it contains.
+"""
+import json
+import numpy as np
+
+MAGIC = b'GBX1'
+_HEADER = np.dtype('<u4')
+_HEADER_FIELDS = 5
+
+def _pad4(length):
+    return (4 - length % 4) % 4
+
+def _pack(start_frame, names, offsets, player_ids, boxes):
+    names_bytes = json.dumps(names).encode('utf-8')
+    header = np.array([
+        start_frame, len(offsets) - 1, len(player_ids), len(names), len(names_bytes)
+    ], dtype=_HEADER)
+    return b''.join([
+        MAGIC,
+        header.tobytes(),
+        names_bytes, b'\0' * _pad4(len(names_bytes)),
+        np.ascontiguousarray(offsets, dtype='<u4').tobytes(),
+        np.ascontiguousarray(player_ids, dtype='<u2').tobytes(), b'\0' * _pad4(2 * len(player_ids)),
+        np.ascontiguousarray(boxes, dtype='<f4').tobytes()
+    ])
+
+def build_boxes_index(boxes_data):
+    """Convert a parsed boxes.json frame list into sidecar bytes"""
+    player_lookup = {}
+    offsets = np.zeros(len(boxes_data) + 1, dtype='<u4')
+    player_ids = []
+    boxes = []
+
+    for frame_num, frame_boxes in enumerate(boxes_data):
+        for player_name, box_data in (frame_boxes or {}).items():
+            bbox = box_data.get('bbox') if isinstance(box_data, dict) else None
+            if not bbox:
+                continue
+            player_ids.append(player_lookup.setdefault(player_name, len(player_lookup)))
+            boxes.append(bbox[:4])
+        offsets[frame_num + 1] = len(player_ids)
+
+    return _pack(
+        0,
+        list(player_lookup),
+        offsets,
+        np.array(player_ids, dtype='<u2'),
+        np.array(boxes, dtype='<f4').reshape(-1, 4)
+    )
+
+class BoxesIndex:
+    """Read-only view over sidecar bytes (or a np.memmap of a sidecar file)"""
+
+    def __init__(self, buffer):
+        buffer = np.frombuffer(buffer, dtype=np.uint8) if not isinstance(buffer, np.ndarray) else buffer
+        if bytes(buffer[:4]) != MAGIC:
+            raise ValueError('Not a boxes index')
+        pos = 4
+        header = buffer[pos:pos + 4 * _HEADER_FIELDS].view(_HEADER)
+        pos += 4 * _HEADER_FIELDS
+        self.start_frame, self.frame_count, box_count, _, names_len = (int(v) for v in header)
+
+        self.names = json.loads(bytes(buffer[pos:pos + names_len]).decode('utf-8'))
+        pos += names_len + _pad4(names_len)
+
+        self.offsets = buffer[pos:pos + 4 * (self.frame_count + 1)].view('<u4')
+        pos += 4 * (self.frame_count + 1)
+
+        self.player_ids = buffer[pos:pos + 2 * box_count].view('<u2')
+        pos += 2 * box_count + _pad4(2 * box_count)
+
+        self.boxes = buffer[pos:pos + 16 * box_count].view('<f4').reshape(-1, 4)
+        self.nbytes = buffer.nbytes
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(np.memmap(path, dtype=np.uint8, mode='r'))
+
+    @property
+    def end_frame(self):
+        return self.start_frame + self.frame_count - 1
+
+    def _bounds(self, start_frame, end_frame):
+        start = min(max(start_frame - self.start_frame, 0), self.frame_count)
+        end = min(max(end_frame - self.start_frame + 1, start), self.frame_count)
+        return start, end
+
+    def slice(self, start_frame, end_frame):
+        """Sidecar bytes covering frames start_frame..end_frame (inclusive)"""
+        start, end = self._bounds(start_frame, end_frame)
+        first_box, last_box = int(self.offsets[start]), int(self.offsets[end])
+        return _pack(
+            self.start_frame + start,
+            self.names,
+            self.offsets[start:end + 1] - first_box,
+            self.player_ids[first_box:last_box],
+            self.boxes[first_box:last_box]
+        )
+
+    def frames(self, start_frame, end_frame):
+        """
+        Frames start_frame..end_frame (inclusive) in the boxes.json dict shape.
+
+        Lossy: only 'bbox' is kept, as float32. Serve clients from the parsed
+        boxes.json instead.
+        """
+        start, end = self._bounds(start_frame, end_frame)
+        result = []
+        for i in range(start, end):
+            lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+            result.append({
+                self.names[player_id]: {'bbox': box}
+                for player_id, box in zip(self.player_ids[lo:hi].tolist(), self.boxes[lo:hi].tolist())
+            })
+        return result
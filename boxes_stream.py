@@ -0,0 +1,107 @@
+import codecs
+import json
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]'
+
+def iter_file_chunks(fp, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield byte chunks from a file-like object until it is exhausted"""
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+def iter_json_array(chunks):
+    """
+    Incrementally parse a top-level JSON array, yielding one element at a time.
+
+    Only the unparsed tail of the input is buffered, so memory stays bounded
+    by the size of a single element (one frame of a boxes.json file) no
+    matter how long the array is.
+
+    Args:
+        chunks: Iterable of bytes (or str) chunks, e.g. iter_file_chunks(request.stream)
+
+    Yields:
+        Each decoded array element in order
+
+    Raises:
+        ValueError: If the input is not one JSON array (content after the
+            closing bracket included), once the parse reaches the problem
+    """
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        for chunk in chunks:
+            text = utf8.decode(chunk) if isinstance(chunk, (bytes, bytearray)) else chunk
+            if text:
+                buffer = buffer[pos:] + text
+                pos = 0
+                return True
+        buffer = buffer[pos:] + utf8.decode(b'', final=True)
+        pos = 0
+        eof = True
+        return False
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof or not fill():
+                return
+
+    skip_whitespace()
+    if pos >= len(buffer) or buffer[pos] != '[':
+        raise ValueError('Expected a JSON array')
+    pos += 1
+
+    expect_value = True
+    first = True
+    while True:
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise ValueError('Unexpected end of JSON array')
+
+        char = buffer[pos]
+        if char == ']':
+            if expect_value and not first:
+                raise ValueError('Expected a value after "," in JSON array')
+            pos += 1
+            skip_whitespace()
+            if pos < len(buffer):
+                raise ValueError(f'Unexpected content after JSON array: {buffer[pos:pos + 20]!r}')
+            return
+        if not expect_value:
+            if char != ',':
+                raise ValueError(f'Expected "," or "]" in JSON array, got {char!r}')
+            pos += 1
+            expect_value = True
+            continue
+
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof or not fill():
+                    raise
+                continue
+            # A number split across chunks (12|34, 1.|5) decodes early, so
+            # only accept a value once a delimiter follows it or input is done
+            if not eof and (end >= len(buffer) or buffer[end] not in _DELIMITERS) and fill():
+                continue
+            break
+
+        pos = end
+        expect_value = False
+        first = False
+        yield value
@@ -0,0 +1,79 @@
+import os
+import threading
+from collections import OrderedDict
+import database
+from field_projection import Calibration, parse_keyframes
+
+CALIBRATION_CACHE_SIZE = int(os.getenv('CALIBRATION_CACHE_SIZE', 256))
+
+class CalibrationCache:
+    """
+    In-process LRU of per-video Calibration objects, loaded from the
+    video_calibrations table on first use. Writes go through set() so the
+    cached entry is replaced along with the stored keyframes; uncalibrated
+    videos are cached too (as None).
+    """
+
+    def __init__(self, max_entries=CALIBRATION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # video_id -> Calibration or None
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0}
+
+    def _store(self, video_id, calibration):
+        with self._lock:
+            self._entries[video_id] = calibration
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, video_id):
+        """The video's Calibration, or None if it has none"""
+        with self._lock:
+            if video_id in self._entries:
+                self._entries.move_to_end(video_id)
+                self._counters['hits'] += 1
+                return self._entries[video_id]
+            self._counters['misses'] += 1
+        keyframes = database.get_video_calibration(video_id)
+        calibration = Calibration(keyframes) if keyframes else None
+        self._store(video_id, calibration)
+        return calibration
+
+    def set(self, video_id, keyframes):
+        """
+        Validate and store a video's keyframes, replacing any earlier calibration.
+
+        Returns:
+            The new Calibration, or None if there is no such video
+
+        Raises:
+            ValueError: If the keyframes are malformed
+        """
+        keyframes = parse_keyframes(keyframes)
+        if not database.set_video_calibration(video_id, keyframes):
+            return None
+        calibration = Calibration(keyframes)
+        self._store(video_id, calibration)
+        return calibration
+
+    def delete(self, video_id):
+        """Remove a video's calibration; returns False if there is no such video"""
+        if not database.set_video_calibration(video_id, []):
+            return False
+        self._store(video_id, None)
+        return True
+
+    def invalidate(self, video_id=None):
+        """Forget one video's entry, or all of them"""
+        with self._lock:
+            if video_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(video_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, 'entries': len(self._entries)}
+
+calibration_cache = CalibrationCache()
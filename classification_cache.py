@@ -0,0 +1,129 @@
+import hashlib
+import threading
+from concurrent.futures import Future
+import database
+from roboflow_classifier import roboflow_classifier
+
+# Results are written to the database in batches of this size
+CLASSIFICATION_CACHE_FLUSH_SIZE = 64
+
+def bbox_key(bbox, pad_crop=0):
+    """Stable text key for a crop box; padding is part of the key since it changes the crop"""
+    return ','.join(f"{float(v):.2f}" for v in bbox[:4]) + f"|{pad_crop}"
+
+def crop_hash(crop):
+    """Content hash of a crop's pixels and shape"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(crop.shape).encode('utf-8'))
+    digest.update(crop.tobytes())
+    return digest.hexdigest()
+
+def resolved(result):
+    """A Future that is already done, for results that need no request"""
+    future = Future()
+    future.set_result(result)
+    return future
+
+class ClassificationCache:
+    """
+    Persistent cache of Roboflow results in the classification_cache table.
+
+    Results are keyed by (video id, frame, bbox key, model id). A crop that
+    misses by key is looked up by the hash of its pixels before a request is
+    made, so the same crop reached through a different key is not classified
+    twice. Changing model_id misses everything; stale rows are removed with
+    database.delete_cached_classifications.
+    """
+
+    def __init__(self, classifier=roboflow_classifier):
+        self.classifier = classifier
+        self._pending = []
+        self._lock = threading.Lock()
+        self._counters = {'key_hits': 0, 'hash_hits': 0, 'misses': 0}
+
+    @property
+    def model_id(self):
+        return self.classifier.model_id
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def range(self, video_id, start_frame, end_frame):
+        """All cached results for a frame range, keyed by (frame, bbox key)"""
+        return database.get_cached_classifications(video_id, self.model_id, start_frame, end_frame)
+
+    def hit(self, result):
+        """Future for a result found by range(), counted as a key hit"""
+        self._count('key_hits')
+        return resolved(result)
+
+    def lookup(self, video_id, frame_number, bbox, pad_crop=0):
+        """The cached result for a crop by key, without needing its pixels; None on a miss"""
+        cached = database.get_cached_classification(self.model_id, video_id, frame_number, bbox_key(bbox, pad_crop))
+        if cached is not None:
+            self._count('key_hits')
+        return cached
+
+    def submit(self, crop, video_id=None, frame_number=None, bbox=None, pad_crop=0):
+        """
+        Classify a crop, answering from the cache when possible.
+
+        Returns:
+            Future of the classification dict; cached results have no 'image'
+        """
+        key = bbox_key(bbox, pad_crop) if bbox is not None else None
+        content_hash = crop_hash(crop)
+        if video_id is not None and key is not None:
+            cached = database.get_cached_classification(self.model_id, video_id, frame_number, key)
+            if cached is not None:
+                self._count('key_hits')
+                return resolved(cached)
+        cached = database.get_cached_classification(self.model_id, content_hash=content_hash)
+        if cached is not None:
+            self._count('hash_hits')
+            if video_id is not None and key is not None:
+                self._queue((video_id, frame_number, key, self.model_id, content_hash, cached))
+            return resolved(cached)
+
+        self._count('misses')
+        entry = (video_id, frame_number, key, self.model_id, content_hash)
+
+        def store(result):
+            self._queue(entry + ({k: v for k, v in result.items() if k != 'image'},))
+        return self.classifier.submit(crop, on_result=store)
+
+    def classify(self, crop, video_id=None, frame_number=None, bbox=None, pad_crop=0):
+        """Blocking submit(); the result is written through before returning"""
+        result = self.submit(crop, video_id, frame_number, bbox, pad_crop).result()
+        self.flush()
+        return result
+
+    def _queue(self, entry):
+        with self._lock:
+            self._pending.append(entry)
+            full = len(self._pending) >= CLASSIFICATION_CACHE_FLUSH_SIZE
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write queued results to the database"""
+        with self._lock:
+            entries, self._pending = self._pending, []
+        if entries:
+            database.save_cached_classifications(entries)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            pending = len(self._pending)
+        lookups = sum(counters.values())
+        return {
+            **counters,
+            'hit_rate': round((counters['key_hits'] + counters['hash_hits']) / lookups, 3) if lookups else None,
+            'pending_writes': pending,
+            'model_id': self.model_id,
+            'models': database.get_classification_cache_summary()
+        }
+
+classification_cache = ClassificationCache()
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import pytest
+from flask import Flask
+import database
+import database_bounding_box
+from calibration_cache import calibration_cache
+from routes.homography import homography_bp
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """The database module on a fresh videos.db and bounding_boxes.db under tmp_path"""
+    monkeypatch.setattr(database, 'DATABASE_FILE', str(tmp_path / 'videos.db'))
+    monkeypatch.setattr(database_bounding_box, 'BOUNDING_BOXES_DB', str(tmp_path / 'bounding_boxes.db'))
+    database.init_db()
+    yield database
+    database.connection_pool.close_all()
+
+@pytest.fixture
+def client(db):
+    """A test client for the homography blueprint, with an empty calibration cache"""
+    calibration_cache.invalidate()
+    app = Flask(__name__)
+    app.register_blueprint(homography_bp, url_prefix='/api/homography')
+    yield app.test_client()
+    calibration_cache.invalidate()
+
+@pytest.fixture(scope='session')
+def make_video(tmp_path_factory):
+    """
+    Factory for short 25 fps MJPG videos whose frames encode their frame number.
+
+    make_video(frames, size=(width, height), step=brightness per frame, label=False)
+    fills frame i with brightness (i * step) % 255 and, with label, draws i on it.
+    Each distinct video is written once per session; treat it as read-only.
+    """
+    videos = {}
+
+    def make(frames, size=(160, 120), step=5, label=False):
+        key = (frames, size, step, label)
+        if key not in videos:
+            width, height = size
+            path = str(tmp_path_factory.mktemp('video') / 'game.avi')
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (width, height))
+            for i in range(frames):
+                frame = np.full((height, width, 3), (i * step) % 255, dtype=np.uint8)
+                if label:
+                    cv2.putText(frame, str(i), (10, 80), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+                writer.write(frame)
+            writer.release()
+            videos[key] = path
+        return videos[key]
+
+    return make
@@ -0,0 +1,236 @@
+"""
+Player crop extraction for dataset builds.
+
+Kept free of Flask and route imports so segments can run in spawned worker
+processes.
+"""
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import cv2
+from seek_planner import KeyframeIndex, read_through_without_index, seek_planner
+from video_capture_pool import video_source
+
+DATASET_DIR = 'player_crops'
+# Worker processes for batch extraction; 1 keeps everything in the calling process
+CROP_WORKERS = int(os.getenv('CROP_WORKERS', 1))
+# Threads per process that JPEG-encode and write crops
+CROP_WRITER_THREADS = int(os.getenv('CROP_WRITER_THREADS', 4))
+# Don't split work into segments smaller than this many crops
+CROP_MIN_SEGMENT = int(os.getenv('CROP_MIN_SEGMENT', 200))
+
+def crop_to_box(frame, bbox, pad_crop=0):
+    """
+    Cut a box out of a decoded frame.
+
+    Args:
+        frame: numpy array of the full frame
+        bbox: [x, y, w, h] in pixels
+        pad_crop: Padding around the box in pixels, clamped to the frame
+
+    Returns:
+        numpy array view of the padded box region
+    """
+    height, width = frame.shape[:2]
+    x, y, w, h = (int(v) for v in bbox[:4])
+    x1 = max(0, x - pad_crop)
+    y1 = max(0, y - pad_crop)
+    x2 = min(width, x + w + pad_crop)
+    y2 = min(height, y + h + pad_crop)
+    return frame[y1:y2, x1:x2]
+
+def crop_filename(player_name, video_id, frame_number):
+    return f"{player_name}_{video_id}_{frame_number}.jpg"
+
+def split_segments(frame_data, segments):
+    """
+    Split sorted frame_data into up to `segments` contiguous runs of similar size.
+
+    Cuts only fall where the frame number changes, so every frame is decoded
+    by exactly one segment.
+    """
+    target = max(1, -(-len(frame_data) // max(1, segments)))
+    result = []
+    start = 0
+    while start < len(frame_data):
+        end = min(start + target, len(frame_data))
+        while end < len(frame_data) and frame_data[end][0] == frame_data[end - 1][0]:
+            end += 1
+        result.append(frame_data[start:end])
+        start = end
+    return result
+
+def _write_crop(filepath, crop):
+    return cv2.imwrite(filepath, crop)
+
+def extract_segment(video_filepath, segment, pad_crop=5, video_id=None, dataset_dir=DATASET_DIR,
+                    writer_threads=CROP_WRITER_THREADS, progress=None, cached_frame=None, keyframes=None):
+    """
+    Decode one sorted run of frame_data sequentially on its own capture and save its crops.
+
+    Args:
+        video_filepath: Video filepath or URL
+        segment: Sorted list of (frame_number, player_name, bbox)
+        progress: Optional callable(done, total, message), called before each crop
+        cached_frame: Optional callable(frame_number) returning an already decoded frame or None
+        keyframes: Keyframe frame numbers of the video, used to choose between
+            decoding through a gap and seeking
+
+    Returns:
+        (successful_crops, failed_crops)
+    """
+    if not segment:
+        return 0, 0
+
+    cap = cv2.VideoCapture(video_source(video_filepath))
+    if not cap.isOpened():
+        raise Exception("Could not open video")
+    read_through = KeyframeIndex(keyframes).read_through if keyframes else read_through_without_index
+
+    current_frame = -1
+    last_frame = None
+    failed_crops = 0
+    writes = []
+    # Bound queued writes so crops don't pile up faster than they are encoded
+    in_flight = threading.BoundedSemaphore(writer_threads * 4)
+    writer = ThreadPoolExecutor(max_workers=writer_threads, thread_name_prefix='crop-writer')
+
+    def write(filepath, crop):
+        try:
+            return _write_crop(filepath, crop)
+        finally:
+            in_flight.release()
+
+    try:
+        for done, (frame_number, player_name, bbox) in enumerate(segment):
+            if progress:
+                progress(done, len(segment), f"frame {frame_number} for {player_name}")
+
+            frame = cached_frame(frame_number) if cached_frame else None
+            if frame is None and frame_number == current_frame:
+                frame = last_frame
+            if frame is None:
+                # Get to the next required frame by decoding through the gap or seeking
+                next_frame = current_frame + 1 if current_frame >= 0 else -1
+                if frame_number != next_frame:
+                    if read_through(next_frame, frame_number):
+                        while next_frame < frame_number and cap.grab():
+                            next_frame += 1
+                    if next_frame != frame_number:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+
+                ret, frame = cap.read()
+                if not ret:
+                    failed_crops += 1
+                    current_frame = -1
+                    print(f"❌ Error reading frame {frame_number}")
+                    continue
+
+                current_frame = frame_number
+                last_frame = frame
+
+            try:
+                # Copy so a queued write doesn't keep the whole frame alive
+                cropped = crop_to_box(frame, bbox, pad_crop).copy()
+                filepath = os.path.join(dataset_dir, crop_filename(player_name, video_id, frame_number))
+            except Exception as e:
+                failed_crops += 1
+                print(f"❌ Error processing frame {frame_number}: {str(e)}")
+                continue
+            in_flight.acquire()
+            writes.append((frame_number, writer.submit(write, filepath, cropped)))
+    finally:
+        cap.release()
+        writer.shutdown(wait=True)
+
+    successful_crops = 0
+    for frame_number, future in writes:
+        try:
+            if future.result():
+                successful_crops += 1
+                continue
+            print(f"❌ Error writing crop for frame {frame_number}")
+        except Exception as e:
+            print(f"❌ Error processing frame {frame_number}: {str(e)}")
+        failed_crops += 1
+    return successful_crops, failed_crops
+
+def extract_crops(video_filepath, frame_data, pad_crop=5, video_id=None, dataset_dir=DATASET_DIR,
+                  workers=None, writer_threads=CROP_WRITER_THREADS, progress=None, cached_frame=None):
+    """
+    Save padded crops for (frame_number, player_name, bbox) entries, optionally across processes.
+
+    With workers > 1 the sorted entries are split into contiguous segments
+    (several per worker, for balance and finer progress), and each worker
+    process decodes its segments sequentially on its own capture. Output files
+    are the same as with workers=1.
+
+    Args:
+        workers: Worker processes (default CROP_WORKERS)
+        progress: Optional callable(done, total, message); with workers > 1 it
+            is called as segments finish
+        cached_frame: Optional frame lookup, only used in the serial path
+
+    Returns:
+        dict with total, successful, failed, workers, segments and seconds
+    """
+    workers = max(1, workers or CROP_WORKERS)
+    frame_data = sorted(frame_data, key=lambda x: x[0])
+    total = len(frame_data)
+    os.makedirs(dataset_dir, exist_ok=True)
+    started = time.perf_counter()
+    # Probing a local file is quick and the whole extraction is planned
+    # around it; remote videos aren't probed and use the gap heuristic
+    source = video_source(video_filepath)
+    index = seek_planner.index(source, wait=os.path.exists(source))
+    keyframes = index.keyframes if index else None
+    # Hand workers the mirrored copy directly; they don't load the mirror
+    if '://' not in source:
+        video_filepath = source
+
+    segments = split_segments(frame_data, min(workers * 4, max(1, total // CROP_MIN_SEGMENT))) if workers > 1 else [frame_data]
+    if len(segments) <= 1:
+        workers = 1
+
+    if workers == 1:
+        successful, failed = extract_segment(
+            video_filepath, frame_data, pad_crop, video_id, dataset_dir,
+            writer_threads=writer_threads, progress=progress, cached_frame=cached_frame, keyframes=keyframes
+        )
+        segments = [frame_data]
+    else:
+        successful = failed = done = 0
+        # spawn, not fork: the server process has live threads and open captures. Spawned
+        # workers re-import the server's main module (app.py) as __mp_main__, so it must
+        # keep its side effects in startup()
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            futures = {
+                executor.submit(
+                    extract_segment, video_filepath, segment, pad_crop, video_id, dataset_dir,
+                    writer_threads, None, None, keyframes
+                ): len(segment)
+                for segment in segments
+            }
+            for future in as_completed(futures):
+                segment_successful, segment_failed = future.result()
+                successful += segment_successful
+                failed += segment_failed
+                done += futures[future]
+                if progress:
+                    progress(done, total, f"{done} of {total} crops")
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown(wait=True)
+
+    return {
+        'total': total,
+        'successful': successful,
+        'failed': failed,
+        'workers': workers,
+        'segments': len(segments),
+        'seconds': round(time.perf_counter() - started, 3)
+    }
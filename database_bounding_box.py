@@ -2,6 +2,9 @@ import sqlite3
 import json
 from pathlib import Path
 import os
+import time
+
+BOUNDING_BOXES_DB = os.getenv('BOUNDING_BOXES_DB', 'bounding_boxes.db')
 
 def get_db_connection(db_path):
     conn = sqlite3.connect(db_path)
@@ -66,15 +69,93 @@ def init_db(db_path):
             )
         ''')
 
+        # Link to the row in videos.db whose boxes these are
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(videos)')}
+        if 'source_video_id' not in columns:
+            conn.execute('ALTER TABLE videos ADD COLUMN source_video_id INTEGER')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_source ON videos(source_video_id)')
+
         # Create indexes
         conn.execute('CREATE INDEX IF NOT EXISTS idx_frames_video_number ON frames(video_id, frame_number)')
         conn.execute('CREATE INDEX IF NOT EXISTS idx_bboxes_frame ON bounding_boxes(frame_id)')
         conn.execute('CREATE INDEX IF NOT EXISTS idx_bboxes_player ON bounding_boxes(player_id)')
 
+        _init_spatial_index(conn)
+
         conn.commit()
     finally:
         conn.close()
 
+def _init_spatial_index(conn):
+    """
+    R*Tree over every box as (video, frame, x, y) extents, keyed by bbox_id
+    and kept in step with bounding_boxes by triggers, so inserts, imports
+    and deletes all maintain it. Created and backfilled on first init.
+
+    INSERT OR REPLACE deletes the row it replaces without firing delete
+    triggers (recursive_triggers is off), so the insert trigger drops the
+    replaced row's entry itself first.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bounding_boxes_rtree'"
+    ).fetchone()
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS bounding_boxes_rtree USING rtree(
+            id,
+            min_video, max_video,
+            min_frame, max_frame,
+            min_x, max_x,
+            min_y, max_y
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS bounding_boxes_rtree_before_insert
+        BEFORE INSERT ON bounding_boxes
+        BEGIN
+            DELETE FROM bounding_boxes_rtree WHERE id = (
+                SELECT bbox_id FROM bounding_boxes WHERE frame_id = NEW.frame_id AND player_id = NEW.player_id
+            );
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS bounding_boxes_rtree_insert
+        AFTER INSERT ON bounding_boxes
+        BEGIN
+            INSERT OR REPLACE INTO bounding_boxes_rtree
+            SELECT NEW.bbox_id, f.video_id, f.video_id, f.frame_number, f.frame_number,
+                   NEW.x, NEW.x + NEW.width, NEW.y, NEW.y + NEW.height
+            FROM frames f WHERE f.frame_id = NEW.frame_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS bounding_boxes_rtree_update
+        AFTER UPDATE OF frame_id, x, y, width, height ON bounding_boxes
+        BEGIN
+            DELETE FROM bounding_boxes_rtree WHERE id = OLD.bbox_id;
+            INSERT INTO bounding_boxes_rtree
+            SELECT NEW.bbox_id, f.video_id, f.video_id, f.frame_number, f.frame_number,
+                   NEW.x, NEW.x + NEW.width, NEW.y, NEW.y + NEW.height
+            FROM frames f WHERE f.frame_id = NEW.frame_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS bounding_boxes_rtree_delete
+        AFTER DELETE ON bounding_boxes
+        BEGIN
+            DELETE FROM bounding_boxes_rtree WHERE id = OLD.bbox_id;
+        END
+    ''')
+    if not exists:
+        cursor = conn.execute('''
+            INSERT INTO bounding_boxes_rtree
+            SELECT b.bbox_id, f.video_id, f.video_id, f.frame_number, f.frame_number,
+                   b.x, b.x + b.width, b.y, b.y + b.height
+            FROM bounding_boxes b
+            JOIN frames f ON f.frame_id = b.frame_id
+        ''')
+        if cursor.rowcount > 0:
+            print(f"Indexed {cursor.rowcount} existing bounding boxes in bounding_boxes_rtree")
+
 def add_video(db_path, filename, duration, total_frames, frame_rate, width, height, b2_path=None):
     conn = get_db_connection(db_path)
     try:
@@ -145,6 +226,151 @@ def get_frame_bounding_boxes(db_path, video_id, frame_number):
     finally:
         conn.close()
 
+def get_boxes_in_range(db_path, video_id, start_frame=None, end_frame=None):
+    """
+    Boxes for a frame range, in the per-frame format of boxes.json.
+
+    Returns:
+        {frame_number: {player_name: {'bbox': [x, y, w, h], 'frame': frame_number}}}
+        for the frames in range that have boxes (confidence is included when set)
+    """
+    conn = get_db_connection(db_path)
+    try:
+        rows = conn.execute('''
+            SELECT f.frame_number, p.name, b.x, b.y, b.width, b.height, b.confidence
+            FROM frames f
+            JOIN bounding_boxes b ON b.frame_id = f.frame_id
+            JOIN players p ON b.player_id = p.player_id
+            WHERE f.video_id = ? AND f.frame_number BETWEEN ? AND ?
+            ORDER BY f.frame_number
+        ''', (video_id, start_frame if start_frame is not None else 0,
+              end_frame if end_frame is not None else 2 ** 62)).fetchall()
+    finally:
+        conn.close()
+
+    frames = {}
+    for row in rows:
+        box = {'bbox': [row['x'], row['y'], row['width'], row['height']], 'frame': row['frame_number']}
+        if row['confidence'] is not None:
+            box['confidence'] = row['confidence']
+        frames.setdefault(row['frame_number'], {})[row['name']] = box
+    return frames
+
+REGION_MODES = {
+    # R*Tree extents overlapping the rectangle, then the exact test on the stored box
+    'intersects': (
+        'r.max_x >= :x1 AND r.min_x <= :x2 AND r.max_y >= :y1 AND r.min_y <= :y2',
+        'b.x + b.width >= :x1 AND b.x <= :x2 AND b.y + b.height >= :y1 AND b.y <= :y2'
+    ),
+    'contains': (
+        'r.max_x >= :x1 AND r.min_x <= :x2 AND r.max_y >= :y1 AND r.min_y <= :y2',
+        'b.x >= :x1 AND b.x + b.width <= :x2 AND b.y >= :y1 AND b.y + b.height <= :y2'
+    ),
+    # Bottom-centre (the player's feet) inside the rectangle
+    'feet': (
+        'r.max_x >= :x1 AND r.min_x <= :x2 AND r.max_y >= :y1 AND r.min_y <= :y2',
+        'b.x + b.width / 2.0 BETWEEN :x1 AND :x2 AND b.y + b.height BETWEEN :y1 AND :y2'
+    )
+}
+
+def get_boxes_in_region(db_path, video_id, x1, y1, x2, y2, start_frame=None, end_frame=None, mode='intersects', players=None):
+    """
+    Boxes of a video inside a pixel rectangle over a frame window, found
+    through the bounding_boxes_rtree index.
+
+    Args:
+        x1, y1, x2, y2: The rectangle in video pixels
+        start_frame, end_frame: Optional inclusive frame window
+        mode: 'intersects' (box overlaps the rectangle), 'contains' (box lies
+            inside it) or 'feet' (the box's bottom-centre lies inside it)
+        players: Optional list of player names to keep
+
+    Returns:
+        List of {'frame_number', 'name', 'x', 'y', 'width', 'height', 'confidence'}
+        ordered by frame and player
+
+    Raises:
+        ValueError: For an unknown mode
+    """
+    if mode not in REGION_MODES:
+        raise ValueError(f"Unknown region mode: {mode}; use one of {', '.join(REGION_MODES)}")
+    index_filter, exact_filter = REGION_MODES[mode]
+    params = {
+        'video_id': video_id,
+        'x1': min(x1, x2), 'x2': max(x1, x2), 'y1': min(y1, y2), 'y2': max(y1, y2),
+        'start_frame': start_frame if start_frame is not None else 0,
+        'end_frame': end_frame if end_frame is not None else 2 ** 62
+    }
+    player_filter = ''
+    if players:
+        player_filter = f"AND p.name IN ({', '.join(f':player{i}' for i in range(len(players)))})"
+        params.update({f'player{i}': name for i, name in enumerate(players)})
+
+    conn = get_db_connection(db_path)
+    try:
+        rows = conn.execute(f'''
+            SELECT f.frame_number, p.name, b.x, b.y, b.width, b.height, b.confidence
+            FROM bounding_boxes_rtree r
+            JOIN bounding_boxes b ON b.bbox_id = r.id
+            JOIN frames f ON f.frame_id = b.frame_id
+            JOIN players p ON p.player_id = b.player_id
+            WHERE r.min_video <= :video_id AND r.max_video >= :video_id
+              AND r.max_frame >= :start_frame AND r.min_frame <= :end_frame
+              AND {index_filter}
+              AND {exact_filter}
+              AND f.frame_number BETWEEN :start_frame AND :end_frame
+              {player_filter}
+            ORDER BY f.frame_number, p.name
+        ''', params).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+def summarize_region_presence(boxes):
+    """{player_name: {'frames', 'first_frame', 'last_frame'}} from get_boxes_in_region rows"""
+    presence = {}
+    for box in boxes:
+        player = presence.setdefault(box['name'], {'frames': 0, 'first_frame': box['frame_number'], 'last_frame': box['frame_number']})
+        player['frames'] += 1
+        player['last_frame'] = box['frame_number']
+    return presence
+
+def get_box_frame_span(db_path, video_id):
+    """(first, last) frame number with boxes for a video, or None if it has none"""
+    conn = get_db_connection(db_path)
+    try:
+        row = conn.execute('''
+            SELECT MIN(f.frame_number), MAX(f.frame_number)
+            FROM frames f
+            WHERE f.video_id = ? AND EXISTS (SELECT 1 FROM bounding_boxes b WHERE b.frame_id = f.frame_id)
+        ''', (video_id,)).fetchone()
+    finally:
+        conn.close()
+    return None if row[0] is None else (row[0], row[1])
+
+def get_boxes_signature(db_path, video_id):
+    """
+    (frame count, highest frame_id, box count, highest bbox_id) of a video.
+
+    Frame and bbox ids are AUTOINCREMENT and never reused, and INSERT OR
+    REPLACE gives the replacing row a new bbox_id. So any import, replacement
+    or deletion of the video's boxes changes the signature, including boxes
+    rewritten in place on existing frames. Callers use it to tell whether
+    derived results are stale.
+    """
+    conn = get_db_connection(db_path)
+    try:
+        frames = conn.execute('SELECT COUNT(*), MAX(frame_id) FROM frames WHERE video_id = ?', (video_id,)).fetchone()
+        boxes = conn.execute('''
+            SELECT COUNT(*), MAX(b.bbox_id)
+            FROM frames f
+            JOIN bounding_boxes b ON b.frame_id = f.frame_id
+            WHERE f.video_id = ?
+        ''', (video_id,)).fetchone()
+    finally:
+        conn.close()
+    return (frames[0], frames[1], boxes[0], boxes[1])
+
 def get_player_tracking(db_path, video_id, player_name):
     conn = get_db_connection(db_path)
     try:
@@ -198,36 +424,185 @@ def export_video_bounding_boxes(db_path, video_id):
     finally:
         conn.close()
 
-def import_bounding_boxes_json(db_path, video_id, boxes_data):
-    """Import bounding boxes from the JSON format used by the system"""
+def link_source_video(db_path, source_video_id, filename, b2_path=None, width=0, height=0):
+    """
+    The video_id of the row linked to a videos.db video, created if there is none.
+
+    Duration, frame count and rate start at 0 until boxes are imported.
+    """
+    conn = get_db_connection(db_path)
+    try:
+        row = conn.execute('SELECT video_id FROM videos WHERE source_video_id = ?', (source_video_id,)).fetchone()
+        if row:
+            return row['video_id']
+        cursor = conn.execute('''
+            INSERT INTO videos (filename, duration_seconds, total_frames, frame_rate, width, height, b2_path, source_video_id)
+            VALUES (?, 0, 0, 0, ?, ?, ?, ?)
+        ''', (filename, width or 0, height or 0, b2_path, source_video_id))
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+def get_linked_video_ids(db_path, source_video_ids=None):
+    """{source_video_id: video_id} for linked videos, optionally only the given source ids"""
+    conn = get_db_connection(db_path)
+    try:
+        rows = conn.execute('SELECT source_video_id, video_id FROM videos WHERE source_video_id IS NOT NULL').fetchall()
+    finally:
+        conn.close()
+    links = {row['source_video_id']: row['video_id'] for row in rows}
+    if source_video_ids is not None:
+        links = {source: links[source] for source in source_video_ids if source in links}
+    return links
+
+def get_video_ids_with_boxes(db_path, video_ids):
+    """The subset of video_ids that have at least one box"""
+    video_ids = list(video_ids)
+    found = set()
+    conn = get_db_connection(db_path)
+    try:
+        for start in range(0, len(video_ids), 500):
+            chunk = video_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            found.update(row[0] for row in conn.execute(f'''
+                SELECT DISTINCT f.video_id FROM frames f
+                JOIN bounding_boxes b ON b.frame_id = f.frame_id
+                WHERE f.video_id IN ({placeholders})
+            ''', chunk))
+    finally:
+        conn.close()
+    return found
+
+def _delete_video_boxes(cursor, video_id):
+    cursor.execute('''
+        DELETE FROM bounding_boxes
+        WHERE frame_id IN (SELECT frame_id FROM frames WHERE video_id = ?)
+    ''', (video_id,))
+    cursor.execute('DELETE FROM frames WHERE video_id = ?', (video_id,))
+
+def delete_video_bounding_boxes(db_path, video_id):
+    """Delete every frame and box of a video"""
+    conn = get_db_connection(db_path)
+    try:
+        _delete_video_boxes(conn.cursor(), video_id)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _resolve_player_ids(cursor, names, player_ids):
+    """Look up (creating if needed) the player ids for names not already in player_ids"""
+    missing = [name for name in names if name not in player_ids]
+    if not missing:
+        return
+    cursor.executemany(
+        'INSERT OR IGNORE INTO players (name) VALUES (?)',
+        [(name,) for name in missing]
+    )
+    # Stay well under SQLite's bound-parameter limit
+    for start in range(0, len(missing), 500):
+        chunk = missing[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
+        for row in cursor.execute(
+            f'SELECT name, player_id FROM players WHERE name IN ({placeholders})', chunk
+        ):
+            player_ids[row['name']] = row['player_id']
+
+def _import_frame_batch(cursor, video_id, batch, player_ids):
+    """Insert a batch of (frame_number, frame_data) pairs and return the number of boxes written"""
+    names = {name for _, frame_data in batch for name in frame_data}
+    _resolve_player_ids(cursor, names, player_ids)
+
+    cursor.executemany('''
+        INSERT OR IGNORE INTO frames (video_id, frame_number)
+        VALUES (?, ?)
+    ''', [(video_id, frame_num) for frame_num, _ in batch])
+
+    frame_ids = {
+        row['frame_number']: row['frame_id']
+        for row in cursor.execute('''
+            SELECT frame_number, frame_id FROM frames
+            WHERE video_id = ? AND frame_number BETWEEN ? AND ?
+        ''', (video_id, batch[0][0], batch[-1][0]))
+    }
+
+    box_rows = []
+    for frame_num, frame_data in batch:
+        frame_id = frame_ids[frame_num]
+        for player_name, player_data in frame_data.items():
+            bbox = player_data['bbox']
+            box_rows.append((
+                frame_id,
+                player_ids[player_name],
+                bbox[0], bbox[1], bbox[2], bbox[3],
+                player_data.get('confidence')
+            ))
+
+    cursor.executemany('''
+        INSERT OR REPLACE INTO bounding_boxes (frame_id, player_id, x, y, width, height, confidence)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', box_rows)
+    return len(box_rows)
+
+def import_bounding_boxes_json(db_path, video_id, boxes_data, batch_size=1000, replace=False):
+    """
+    Import bounding boxes from the JSON format used by the system.
+
+    Everything is written on one connection inside a single transaction.
+    boxes_data can be any iterable of per-frame dicts (a list, or a generator
+    for streamed input) and is consumed batch_size frames at a time. With
+    replace=True the video's existing boxes are deleted first and its
+    total_frames is set to the length of boxes_data.
+
+    Returns a dict of import stats (frames, boxes, players, seconds, rows_per_sec).
+    """
+    started = time.perf_counter()
     conn = get_db_connection(db_path)
     try:
         cursor = conn.cursor()
-        
+        if replace:
+            _delete_video_boxes(cursor, video_id)
+        player_ids = {}
+        frame_count = 0
+        box_count = 0
+        batch = []
+        frame_num = -1
+
         for frame_num, frame_data in enumerate(boxes_data):
             if not frame_data:  # Skip empty frames
                 continue
-                
-            frame_id = add_frame(db_path, video_id, frame_num)
-            
-            for player_name, player_data in frame_data.items():
-                player_id = add_player(db_path, player_name)
-                bbox = player_data['bbox']
-                
-                add_bounding_box(
-                    db_path=db_path,
-                    frame_id=frame_id,
-                    player_id=player_id,
-                    x=bbox[0],
-                    y=bbox[1],
-                    width=bbox[2],
-                    height=bbox[3]
-                )
-        
+            batch.append((frame_num, frame_data))
+            if len(batch) >= batch_size:
+                box_count += _import_frame_batch(cursor, video_id, batch, player_ids)
+                frame_count += len(batch)
+                batch = []
+
+        if batch:
+            box_count += _import_frame_batch(cursor, video_id, batch, player_ids)
+            frame_count += len(batch)
+
+        if replace:
+            cursor.execute('UPDATE videos SET total_frames = ? WHERE video_id = ?', (frame_num + 1, video_id))
         conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
+    seconds = time.perf_counter() - started
+    rows = frame_count + box_count
+    stats = {
+        'frames': frame_count,
+        'boxes': box_count,
+        'players': len(player_ids),
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else None
+    }
+    print(f"Imported {box_count} boxes across {frame_count} frames for video {video_id} "
+          f"in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec)")
+    return stats
+
 def execute_sql(db_path, query, params=()):
     conn = get_db_connection(db_path)
     try:
@@ -264,6 +639,3 @@ def get_all_bounding_boxes(db_path, limit=None):
         JOIN videos v ON f.video_id = v.video_id
         ORDER BY b.bbox_id{limit_clause}
     """)
-
-# Initialize the database when this module is imported
-init_db('bounding_boxes.db') 
\ No newline at end of file
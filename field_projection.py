@@ -0,0 +1,205 @@
+"""
+Projection of player boxes onto the overhead field view.
+
+Kept free of Flask so it can be tested on its own. Boxes are projected by
+their bottom-centre (the player's feet), all frames at once: one NumPy
+array of points and a single cv2.perspectiveTransform call per request.
+"""
+from functools import lru_cache
+import hashlib
+import json
+import numpy as np
+import cv2
+
+# Destination points (overhead view)
+DST_POINTS = np.float32([
+    [0, 0],          # Top-left
+    [400, 0],        # Top-right
+    [400, 600],      # Bottom-right
+    [0, 600]         # Bottom-left
+])
+
+HOMOGRAPHY_CACHE_SIZE = 256
+
+def _field_key(field_points):
+    """Hashable key for four field corners"""
+    points = np.asarray(field_points, dtype=np.float32)
+    if points.shape != (4, 2):
+        raise ValueError('Field points must contain exactly 4 corner points')
+    return tuple(points.ravel().tolist())
+
+@lru_cache(maxsize=HOMOGRAPHY_CACHE_SIZE)
+def _homography_for_key(key):
+    H = cv2.getPerspectiveTransform(np.float32(key).reshape(4, 2), DST_POINTS)
+    H.setflags(write=False)
+    return H
+
+def homography_matrix(field_points):
+    """
+    Homography from the video's field corners to DST_POINTS, solved once per
+    distinct set of corners.
+
+    Args:
+        field_points: Four [x, y] corners, top-left -> top-right -> bottom-right -> bottom-left
+
+    Returns:
+        Read-only 3x3 float64 matrix
+
+    Raises:
+        ValueError: If there are not exactly four corners
+    """
+    return _homography_for_key(_field_key(field_points))
+
+def transform_points(points, H):
+    """Project an (N, 2) array-like of image points with H; returns an (N, 2) float32 array"""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 1, 2)
+    if not len(points):
+        return np.empty((0, 2), dtype=np.float32)
+    return cv2.perspectiveTransform(points, H).reshape(-1, 2)
+
+def _normalized(matrix):
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.shape != (3, 3) or not np.all(np.isfinite(matrix)) or abs(matrix[2, 2]) < 1e-12:
+        raise ValueError('A homography matrix is 3x3 with a non-zero bottom-right entry')
+    return matrix / matrix[2, 2]
+
+def parse_keyframes(keyframes):
+    """
+    Validate calibration keyframes as sent by clients.
+
+    Each keyframe has a 'frame' and either 'fieldPoints' (four field corners,
+    solved against DST_POINTS) or a 3x3 'matrix'; 'interpolate' (default
+    true) says whether to blend towards the next keyframe or hold until it,
+    e.g. across a camera cut.
+
+    Returns:
+        Keyframes sorted by frame as {'frame', 'matrix', 'field_points', 'interpolate'}
+
+    Raises:
+        ValueError: If a keyframe is malformed or two share a frame
+    """
+    if not isinstance(keyframes, list) or not keyframes:
+        raise ValueError('A calibration needs at least one keyframe')
+    parsed = {}
+    for keyframe in keyframes:
+        if not isinstance(keyframe, dict):
+            raise ValueError('Each keyframe is an object')
+        frame = keyframe.get('frame', 0)
+        if isinstance(frame, bool) or not isinstance(frame, int) or frame < 0:
+            raise ValueError(f"Invalid keyframe frame: {frame!r}")
+        if frame in parsed:
+            raise ValueError(f"Two keyframes at frame {frame}")
+        field_points = keyframe.get('fieldPoints')
+        if field_points is not None:
+            matrix = homography_matrix(field_points)
+            field_points = np.asarray(field_points, dtype=np.float64).tolist()
+        elif keyframe.get('matrix') is not None:
+            matrix = keyframe['matrix']
+        else:
+            raise ValueError(f"Keyframe at frame {frame} needs fieldPoints or a matrix")
+        parsed[frame] = {
+            'frame': frame,
+            'matrix': _normalized(matrix).tolist(),
+            'field_points': field_points,
+            'interpolate': bool(keyframe.get('interpolate', True))
+        }
+    return [parsed[frame] for frame in sorted(parsed)]
+
+class Calibration:
+    """
+    A video's homography over time.
+
+    Between two keyframes the (normalised) matrices are blended linearly,
+    unless the first one holds; before the first and after the last
+    keyframe their matrix applies. A single keyframe is a static
+    calibration. Matrices for any number of points are looked up and
+    applied in one vectorised step, nothing is solved per request.
+    """
+
+    def __init__(self, keyframes):
+        """
+        Args:
+            keyframes: Sorted keyframes from parse_keyframes() or the calibration store
+        """
+        self.keyframes = keyframes
+        self.fingerprint = hashlib.sha1(json.dumps(keyframes, sort_keys=True).encode('utf-8')).hexdigest()
+        self.frames = np.array([keyframe['frame'] for keyframe in keyframes], dtype=np.int64)
+        self.matrices = np.array([keyframe['matrix'] for keyframe in keyframes], dtype=np.float64).reshape(-1, 3, 3)
+        self.interpolate = np.array([keyframe['interpolate'] for keyframe in keyframes], dtype=bool)
+
+    @property
+    def is_static(self):
+        return len(self.frames) == 1
+
+    def matrices_at(self, frames):
+        """(N, 3, 3) homographies for an array of frame numbers"""
+        frames = np.asarray(frames, dtype=np.float64).reshape(-1)
+        last = len(self.frames) - 1
+        i = np.clip(np.searchsorted(self.frames, frames, side='right') - 1, 0, last)
+        j = np.minimum(i + 1, last)
+        span = (self.frames[j] - self.frames[i]).astype(np.float64)
+        t = np.where(span > 0, (frames - self.frames[i]) / np.where(span > 0, span, 1), 0)
+        t = np.where(self.interpolate[i], np.clip(t, 0, 1), 0)[:, None, None]
+        return self.matrices[i] * (1 - t) + self.matrices[j] * t
+
+    def matrix_at(self, frame):
+        """The 3x3 homography for one frame"""
+        return self.matrices_at([frame])[0]
+
+    def project(self, frames, points):
+        """Project (N, 2) image points, each with the homography of its frame; returns (N, 2) float32"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if self.is_static:
+            return transform_points(points, self.matrices[0])
+        homogeneous = np.einsum('nij,nj->ni', self.matrices_at(frames), np.column_stack((points, np.ones(len(points)))))
+        return (homogeneous[:, :2] / homogeneous[:, 2:]).astype(np.float32)
+
+def foot_points(boxes, players=None):
+    """
+    Flatten per-frame boxes into arrays.
+
+    Args:
+        boxes: {frame_number: {player_name: {'bbox': [x, y, w, h], ...}}}
+        players: Optional collection of player names to keep
+
+    Returns:
+        (frames, player_names, player_index, points): frame numbers and indexes
+        into player_names as int arrays, and (N, 2) bottom-centre points
+    """
+    names = {}
+    frames, player_index, bboxes = [], [], []
+    for frame_number, frame_boxes in boxes.items():
+        for player_name, box in frame_boxes.items():
+            if players is not None and player_name not in players:
+                continue
+            frames.append(frame_number)
+            player_index.append(names.setdefault(player_name, len(names)))
+            bboxes.append(box['bbox'][:4])
+
+    bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+    points = np.column_stack((bboxes[:, 0] + bboxes[:, 2] / 2, bboxes[:, 1] + bboxes[:, 3]))
+    return np.asarray(frames, dtype=np.int64), list(names), np.asarray(player_index, dtype=np.int64), points
+
+def project_trajectories(boxes, H, players=None):
+    """
+    Every player's overhead trajectory over a set of frames.
+
+    Args:
+        boxes: {frame_number: {player_name: {'bbox': [x, y, w, h], ...}}}
+        H: 3x3 homography, e.g. from homography_matrix(), or a Calibration
+        players: Optional collection of player names to keep
+
+    Yields:
+        (player_name, frames, points) per player in order of first appearance,
+        frames ascending; frames is an int array and points an (n, 2) array
+    """
+    frames, names, player_index, points = foot_points(boxes, players)
+    projected = H.project(frames, points) if isinstance(H, Calibration) else transform_points(points, H)
+
+    # Group by player, frames ascending within a player
+    order = np.lexsort((frames, player_index))
+    player_index, frames, projected = player_index[order], frames[order], projected[order]
+    bounds = np.flatnonzero(np.diff(player_index)) + 1
+    for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(order)]))):
+        if start < end:
+            yield names[player_index[start]], frames[start:end], projected[start:end]
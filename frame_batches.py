@@ -0,0 +1,157 @@
+"""
+Many boxes over many frames of one video in a single request.
+
+Items are (frame, bbox, crop, pad_crop). Each distinct frame is decoded once,
+in ascending order, and every item is rendered from it; the images are then
+packed into a zip, a multipart/mixed body or one contact sheet.
+"""
+import io
+import os
+import json
+import uuid
+import zipfile
+import cv2
+import numpy as np
+from crop_extraction import crop_to_box
+from frame_cache import iter_video_frames
+from frame_encoding import encode_frame, resize_to_width
+
+FRAME_BATCH_MAX_ITEMS = int(os.getenv('FRAME_BATCH_MAX_ITEMS', 500))
+CONTACT_SHEET_TILE_WIDTH = 240
+OUTPUTS = ['zip', 'multipart', 'contact-sheet']
+BOX_COLOR = (0, 255, 0)  # Green in BGR
+BOX_THICKNESS = 2
+
+def draw_box(frame, bbox, color=BOX_COLOR, thickness=BOX_THICKNESS):
+    """A copy of frame with an [x, y, w, h] rectangle drawn on it"""
+    x, y, w, h = (int(v) for v in bbox[:4])
+    return cv2.rectangle(frame.copy(), (x, y), (x + w, y + h), color, thickness)
+
+def parse_items(items):
+    """
+    Validate request items into dicts with frame, bbox, crop and pad_crop.
+
+    Each item has a frame plus either bbox [x, y, w, h] or x, y, w, h.
+
+    Raises:
+        ValueError: On a missing or malformed field, or too many items
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError("items must be a non-empty list")
+    if len(items) > FRAME_BATCH_MAX_ITEMS:
+        raise ValueError(f"At most {FRAME_BATCH_MAX_ITEMS} items per request")
+
+    parsed = []
+    for i, item in enumerate(items):
+        try:
+            bbox = item['bbox'] if 'bbox' in item else [item['x'], item['y'], item['w'], item['h']]
+            parsed.append({
+                'frame': int(item['frame']),
+                'bbox': [float(v) for v in bbox[:4]],
+                'crop': bool(item.get('crop', False)),
+                'pad_crop': int(item.get('pad_crop', 0))
+            })
+        except (KeyError, TypeError, ValueError, IndexError):
+            raise ValueError(f"Item {i} needs frame and bbox (or x, y, w, h)")
+        if len(parsed[-1]['bbox']) != 4:
+            raise ValueError(f"Item {i} needs frame and bbox (or x, y, w, h)")
+    return parsed
+
+def render_items(video_filepath, items, scale=1):
+    """
+    Render every item, decoding each distinct frame once in ascending order.
+
+    Args:
+        video_filepath: Video (or proxy) to decode
+        items: Parsed items, see parse_items
+        scale: Multiplier from item coordinates to video pixels (for proxies)
+
+    Returns:
+        List of BGR images in item order; None for items whose frame could not be read
+    """
+    by_frame = {}
+    for i, item in enumerate(items):
+        by_frame.setdefault(item['frame'], []).append(i)
+
+    images = [None] * len(items)
+    for frame_number, ret, frame in iter_video_frames(video_filepath, by_frame.keys()):
+        if not ret:
+            continue
+        for i in by_frame[frame_number]:
+            item = items[i]
+            bbox = [v * scale for v in item['bbox']]
+            if item['crop']:
+                images[i] = crop_to_box(frame, bbox, int(round(item['pad_crop'] * scale)))
+            else:
+                images[i] = draw_box(frame, bbox)
+    return images
+
+def image_name(index, item, extension):
+    return f"{index:03d}_frame{item['frame']}.{extension}"
+
+def pack_zip(items, images, **encode_kwargs):
+    """Zip of the encoded images plus an index.json describing each entry"""
+    buffer = io.BytesIO()
+    index = []
+    # Images are already compressed, store them as they are
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for i, (item, image) in enumerate(zip(items, images)):
+            entry = {**item, 'index': i, 'file': None}
+            if image is not None:
+                encoded = encode_frame(image, route='frames-with-boxes', **encode_kwargs)
+                entry['file'] = image_name(i, item, encoded.mimetype.split('/')[1])
+                archive.writestr(entry['file'], encoded.data)
+            index.append(entry)
+        archive.writestr('index.json', json.dumps(index))
+    return buffer.getvalue(), 'application/zip'
+
+def pack_multipart(items, images, **encode_kwargs):
+    """multipart/mixed body with one part per item, in item order; unreadable frames get empty parts"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for i, (item, image) in enumerate(zip(items, images)):
+        if image is not None:
+            encoded = encode_frame(image, route='frames-with-boxes', **encode_kwargs)
+            data, mimetype = encoded.data, encoded.mimetype
+        else:
+            data, mimetype = b'', 'application/octet-stream'
+        headers = (
+            f"--{boundary}\r\n"
+            f"Content-Type: {mimetype}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"X-Item-Index: {i}\r\n"
+            f"X-Frame: {item['frame']}\r\n\r\n"
+        )
+        parts.append(headers.encode('utf-8') + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode('utf-8'))
+    return b''.join(parts), f"multipart/mixed; boundary={boundary}"
+
+def contact_sheet(images, columns=None, tile_width=CONTACT_SHEET_TILE_WIDTH):
+    """
+    Tile images left to right, top to bottom into one image.
+
+    Each image is scaled to tile_width wide (never up) and centred in its
+    cell; rows are as tall as the tallest scaled image. Missing images leave
+    a black cell.
+
+    Returns:
+        (sheet, layout) where layout gives columns, rows and each tile's x, y, w, h
+    """
+    columns = max(1, min(columns or int(np.ceil(np.sqrt(len(images)))), len(images)))
+    tiles = [resize_to_width(image, tile_width) if image is not None else None for image in images]
+    cell_height = max((tile.shape[0] for tile in tiles if tile is not None), default=1)
+    rows = -(-len(tiles) // columns)
+    sheet = np.zeros((rows * cell_height, columns * tile_width, 3), dtype=np.uint8)
+
+    placements = []
+    for i, tile in enumerate(tiles):
+        row, column = divmod(i, columns)
+        if tile is None:
+            placements.append(None)
+            continue
+        height, width = tile.shape[:2]
+        x = column * tile_width + (tile_width - width) // 2
+        y = row * cell_height + (cell_height - height) // 2
+        sheet[y:y + height, x:x + width] = tile
+        placements.append([x, y, width, height])
+    return sheet, {'columns': columns, 'rows': rows, 'tiles': placements}
@@ -0,0 +1,120 @@
+import os
+import threading
+from collections import OrderedDict
+from video_capture_pool import capture_pool
+
+FRAME_CACHE_MAX_BYTES = int(os.getenv('FRAME_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+FRAME_CACHE_READ_AHEAD = int(os.getenv('FRAME_CACHE_READ_AHEAD', 3))
+
+class FrameCache:
+    """
+    LRU of decoded frames keyed by (video filepath, frame number), bounded by
+    the total bytes of the cached arrays.
+
+    Cached frames are marked read-only because they are shared between
+    requests; copy one before drawing on it.
+    """
+
+    def __init__(self, max_bytes=FRAME_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, video_filepath, frame_number):
+        key = (video_filepath, frame_number)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                self._counters['misses'] += 1
+                return None
+            self._frames.move_to_end(key)
+            self._counters['hits'] += 1
+            return frame
+
+    def put(self, video_filepath, frame_number, frame):
+        if frame.nbytes > self.max_bytes:
+            return
+        frame.setflags(write=False)
+        key = (video_filepath, frame_number)
+        with self._lock:
+            old = self._frames.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._frames[key] = frame
+            self._bytes += frame.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._frames.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._counters['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                **self._counters,
+                'hit_rate': round(self._counters['hits'] / lookups, 3) if lookups else None,
+                'frames': len(self._frames),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+frame_cache = FrameCache()
+
+def read_video_frame(video_filepath, frame_number, read_ahead=0):
+    """
+    Get a decoded BGR frame, decoding it through the capture pool on a cache miss.
+
+    Args:
+        video_filepath: Video filepath or URL
+        frame_number: Frame to read
+        read_ahead: Also decode and cache this many following frames, so
+            requests for neighbouring frames skip the decode
+
+    Returns:
+        (ret, frame) like cv2.VideoCapture.read(); the frame is read-only
+    """
+    frame = frame_cache.get(video_filepath, frame_number)
+    if frame is not None:
+        return True, frame
+
+    with capture_pool.capture(video_filepath, frame_number) as cap:
+        ret, frame = cap.read_frame(frame_number)
+        if not ret:
+            return False, None
+        frame_cache.put(video_filepath, frame_number, frame)
+
+        for next_number in range(frame_number + 1, frame_number + 1 + read_ahead):
+            ok, next_frame = cap.read()
+            if not ok:
+                break
+            frame_cache.put(video_filepath, next_number, next_frame)
+
+    return True, frame
+
+def iter_video_frames(video_filepath, frame_numbers):
+    """
+    Decode each of frame_numbers once, in ascending order, on a single pooled capture.
+
+    The seek planner decides per gap whether to decode through or seek, so
+    strided access (e.g. from a skip parameter) stays close to a sequential
+    decode. Frames already in the frame cache are served from it; frames
+    decoded here are not added, so long scans don't flush it.
+
+    Yields:
+        (frame_number, ret, frame) tuples
+    """
+    frame_numbers = sorted(set(frame_numbers))
+    if not frame_numbers:
+        return
+
+    with capture_pool.capture(video_filepath, frame_numbers[0]) as cap:
+        for frame_number in frame_numbers:
+            frame = frame_cache.get(video_filepath, frame_number)
+            if frame is not None:
+                yield frame_number, True, frame
+                continue
+
+            ret, frame = cap.read_frame(frame_number)
+            yield frame_number, ret, frame
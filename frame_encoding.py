@@ -0,0 +1,165 @@
+"""
+In-memory image encoding for frame endpoints.
+
+JPEG goes through simplejpeg or PyTurboJPEG when one of them is installed
+and through OpenCV otherwise; WebP and PNG always use OpenCV. Encode time is
+recorded per route label.
+"""
+import os
+import time
+import base64
+import threading
+from collections import deque, namedtuple
+import cv2
+import numpy as np
+
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+try:
+    from turbojpeg import TurboJPEG
+    _turbojpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _turbojpeg = None
+
+# 95 is what cv2.imencode used before frames went through this module
+FRAME_JPEG_QUALITY = int(os.getenv('FRAME_JPEG_QUALITY', 95))
+FRAME_WEBP_QUALITY = int(os.getenv('FRAME_WEBP_QUALITY', 80))
+# Set to 0 to always encode with OpenCV
+FRAME_FAST_JPEG = os.getenv('FRAME_FAST_JPEG', '1') != '0'
+ENCODE_STATS_SAMPLES = 512
+
+FORMATS = {
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY),
+    'png': ('.png', 'image/png', None)
+}
+
+EncodedFrame = namedtuple('EncodedFrame', ['data', 'mimetype', 'width', 'height'])
+
+def jpeg_codec():
+    """Name of the codec used for JPEG"""
+    if FRAME_FAST_JPEG and simplejpeg is not None:
+        return 'simplejpeg'
+    if FRAME_FAST_JPEG and _turbojpeg is not None:
+        return 'turbojpeg'
+    return 'opencv'
+
+def normalize_format(format):
+    format = (format or 'jpeg').lower()
+    format = 'jpeg' if format == 'jpg' else format
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported image format: {format}")
+    return format
+
+def resize_to_width(frame, max_width):
+    """Downscale a frame to at most max_width pixels wide, keeping the aspect ratio"""
+    height, width = frame.shape[:2]
+    if not max_width or width <= max_width:
+        return frame
+    new_height = max(1, int(round(height * max_width / width)))
+    return cv2.resize(frame, (int(max_width), new_height), interpolation=cv2.INTER_AREA)
+
+class EncodeStats:
+    """Encode latency per route, over the last ENCODE_STATS_SAMPLES encodes of each"""
+
+    def __init__(self):
+        self._samples = {}  # route -> deque of (milliseconds, bytes)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, milliseconds, size):
+        with self._lock:
+            if route not in self._samples:
+                self._samples[route] = deque(maxlen=ENCODE_STATS_SAMPLES)
+                self._counts[route] = 0
+            self._samples[route].append((milliseconds, size))
+            self._counts[route] += 1
+
+    def stats(self):
+        with self._lock:
+            snapshot = {route: (list(samples), self._counts[route]) for route, samples in self._samples.items()}
+        routes = {}
+        for route, (samples, count) in snapshot.items():
+            timings = np.array([ms for ms, _ in samples])
+            routes[route] = {
+                'count': count,
+                'mean_ms': round(float(timings.mean()), 3),
+                'p50_ms': round(float(np.percentile(timings, 50)), 3),
+                'p95_ms': round(float(np.percentile(timings, 95)), 3),
+                'max_ms': round(float(timings.max()), 3),
+                'mean_bytes': int(sum(size for _, size in samples) / len(samples))
+            }
+        return {'jpeg_codec': jpeg_codec(), 'routes': routes}
+
+encode_stats = EncodeStats()
+
+def _encode_jpeg(frame, quality):
+    codec = jpeg_codec()
+    if codec == 'simplejpeg':
+        return simplejpeg.encode_jpeg(np.ascontiguousarray(frame), quality=quality, colorspace='BGR')
+    if codec == 'turbojpeg':
+        return _turbojpeg.encode(np.ascontiguousarray(frame), quality=quality)
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise Exception("Could not encode frame")
+    return buffer.tobytes()
+
+def encode_frame(frame, format='jpeg', quality=None, max_width=None, route='other'):
+    """
+    Encode a BGR frame in memory.
+
+    Args:
+        frame: numpy array (BGR, or single-channel for masks)
+        format: 'jpeg' (default), 'webp' or 'png'
+        quality: 1-100, defaults to FRAME_JPEG_QUALITY / FRAME_WEBP_QUALITY
+        max_width: Downscale wider frames to this width first
+        route: Label the encode time is recorded under
+
+    Returns:
+        EncodedFrame(data, mimetype, width, height) of the encoded image
+    """
+    format = normalize_format(format)
+    started = time.perf_counter()
+    frame = resize_to_width(frame, max_width)
+    extension, mimetype, quality_flag = FORMATS[format]
+
+    if format == 'jpeg' and frame.ndim == 3:
+        data = _encode_jpeg(frame, int(quality or FRAME_JPEG_QUALITY))
+    else:
+        params = []
+        if quality_flag is not None:
+            params = [quality_flag, int(quality or (FRAME_JPEG_QUALITY if format == 'jpeg' else FRAME_WEBP_QUALITY))]
+        ok, buffer = cv2.imencode(extension, frame, params)
+        if not ok:
+            raise Exception("Could not encode frame")
+        data = buffer.tobytes()
+
+    encode_stats.record(route, (time.perf_counter() - started) * 1000, len(data))
+    height, width = frame.shape[:2]
+    return EncodedFrame(data, mimetype, width, height)
+
+def encode_frame_base64(frame, **kwargs):
+    """encode_frame, with the image as a base64 string for JSON responses"""
+    encoded = encode_frame(frame, **kwargs)
+    return encoded._replace(data=base64.b64encode(encoded.data).decode('utf-8'))
+
+def encode_options(args):
+    """
+    Encode options from request args or a JSON body: format, image_quality and max_width.
+
+    (image_quality, because `quality` already selects full/proxy frames.)
+
+    Raises:
+        ValueError: For an unsupported format or a non-numeric value
+    """
+    options = {'format': normalize_format(args.get('format'))}
+    for name, option in [('image_quality', 'quality'), ('max_width', 'max_width')]:
+        value = args.get(name)
+        if value not in (None, ''):
+            options[option] = int(value)
+    if 'quality' in options and not 1 <= options['quality'] <= 100:
+        raise ValueError("image_quality must be between 1 and 100")
+    return options
@@ -0,0 +1,173 @@
+"""
+Overhead position heatmaps.
+
+Each video's boxes are read from the bounding-box store, projected by
+their bottom-centre with the video's stored calibration and binned on a
+grid over the overhead field (DST_POINTS) with np.histogram2d. Results are
+cached per (video set, grid, filters) and reused until a video's boxes or
+calibration change.
+"""
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import cv2
+import database
+from calibration_cache import calibration_cache
+from field_projection import DST_POINTS, foot_points
+from frame_encoding import encode_frame
+
+HEATMAP_CACHE_SIZE = int(os.getenv('HEATMAP_CACHE_SIZE', 64))
+HEATMAP_MAX_BINS = int(os.getenv('HEATMAP_MAX_BINS', 400))
+
+FIELD_WIDTH = float(DST_POINTS[:, 0].max())
+FIELD_HEIGHT = float(DST_POINTS[:, 1].max())
+
+def bin_positions(points, bins_x, bins_y):
+    """
+    Count overhead points per grid cell.
+
+    Returns:
+        (bins_y, bins_x) int array, row 0 at the top of the field; points
+        off the field are dropped
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    counts, _, _ = np.histogram2d(
+        points[:, 1], points[:, 0], bins=[bins_y, bins_x], range=[[0, FIELD_HEIGHT], [0, FIELD_WIDTH]]
+    )
+    return counts.astype(np.int64)
+
+def video_positions(video_id, players=None, start_frame=None, end_frame=None):
+    """
+    Overhead foot positions of a video's players.
+
+    Returns:
+        (player_names, player_index, points): points is (N, 2) and
+        player_index indexes player_names per point
+
+    Raises:
+        LookupError: If the video has no calibration
+    """
+    calibration = calibration_cache.get(video_id)
+    if calibration is None:
+        raise LookupError(f'Video {video_id} has no homography calibration')
+    boxes = database.get_video_boxes(video_id, start_frame, end_frame)
+    frames, names, player_index, points = foot_points(boxes, players)
+    return names, player_index, calibration.project(frames, points)
+
+def render_png(counts):
+    """A heatmap as PNG bytes, colour-mapped and scaled to the overhead field size"""
+    counts = np.asarray(counts, dtype=np.float64)
+    peak = counts.max() if counts.size else 0
+    scaled = np.zeros(counts.shape, dtype=np.uint8) if peak == 0 else np.round(counts / peak * 255).astype(np.uint8)
+    image = cv2.applyColorMap(scaled, cv2.COLORMAP_JET)
+    image = cv2.resize(image, (int(FIELD_WIDTH), int(FIELD_HEIGHT)), interpolation=cv2.INTER_NEAREST)
+    return encode_frame(image, format='png', route='heatmap').data
+
+class HeatmapEngine:
+    """
+    Aggregates heatmaps over sets of videos and keeps an LRU of results.
+
+    An entry is reused only while every video's calibration fingerprint and
+    boxes signature (see database.get_video_boxes_signature) are unchanged,
+    so re-imported boxes or a new calibration are picked up on the next
+    request. Cached results are shared and must not be mutated.
+    """
+
+    def __init__(self, max_entries=HEATMAP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (signature, result)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _signature(self, video_ids):
+        signature = []
+        for video_id in video_ids:
+            calibration = calibration_cache.get(video_id)
+            signature.append((
+                video_id,
+                calibration.fingerprint if calibration else None,
+                database.get_video_boxes_signature(video_id)
+            ))
+        return tuple(signature)
+
+    def heatmap(self, video_ids, bins_x=40, bins_y=60, players=None, start_frame=None, end_frame=None, by_player=False):
+        """
+        Position counts of players across one or more videos.
+
+        Args:
+            video_ids: Videos to aggregate; each needs a calibration
+            bins_x, bins_y: Grid size over the overhead field
+            players: Optional collection of player names to keep
+            start_frame, end_frame: Optional inclusive frame range, applied to every video
+            by_player: Also return a grid per player
+
+        Returns:
+            {'video_ids', 'grid', 'total', 'max', 'counts', 'players'}, where
+            counts is a (bins_y, bins_x) int array and players maps names to
+            their grids (only with by_player)
+
+        Raises:
+            ValueError: For an empty video list or a grid out of range
+            LookupError: If a video does not exist or has no calibration
+        """
+        video_ids = sorted(set(video_ids))
+        if not video_ids:
+            raise ValueError('At least one video_id is required')
+        for bins in (bins_x, bins_y):
+            if not 1 <= bins <= HEATMAP_MAX_BINS:
+                raise ValueError(f'Grid size must be between 1 and {HEATMAP_MAX_BINS}')
+        for video_id in video_ids:
+            if not database.get_video(video_id, include_metadata=False):
+                raise LookupError(f'Video {video_id} not found')
+
+        players = tuple(sorted(players)) if players else None
+        key = (tuple(video_ids), bins_x, bins_y, players, start_frame, end_frame, bool(by_player))
+        signature = self._signature(video_ids)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return entry[1]
+            self._counters['misses'] += 1
+
+        counts = np.zeros((bins_y, bins_x), dtype=np.int64)
+        per_player = {}
+        for video_id in video_ids:
+            names, player_index, points = video_positions(video_id, players, start_frame, end_frame)
+            counts += bin_positions(points, bins_x, bins_y)
+            if by_player:
+                for i, name in enumerate(names):
+                    grid = bin_positions(points[player_index == i], bins_x, bins_y)
+                    per_player[name] = per_player[name] + grid if name in per_player else grid
+
+        result = {
+            'video_ids': video_ids,
+            'grid': {'bins_x': bins_x, 'bins_y': bins_y, 'width': FIELD_WIDTH, 'height': FIELD_HEIGHT},
+            'total': int(counts.sum()),
+            'max': int(counts.max()),
+            'counts': counts,
+            'players': per_player
+        }
+        with self._lock:
+            self._entries[key] = (signature, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, 'entries': len(self._entries)}
+
+def heatmap_json(result):
+    """A heatmap result with its grids as nested lists"""
+    return {
+        **result,
+        'counts': result['counts'].tolist(),
+        'players': {name: grid.tolist() for name, grid in result['players'].items()}
+    }
+
+heatmap_engine = HeatmapEngine()
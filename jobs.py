@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+import traceback
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import database
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+# Minimum seconds between progress writes / cancel checks for one job
+JOB_PROGRESS_INTERVAL = float(os.getenv('JOB_PROGRESS_INTERVAL', 0.5))
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested"""
+
+class JobContext:
+    """
+    Handle passed to a running job for progress reporting and cancellation.
+
+    progress() doubles as the cancellation point: once a cancel is requested
+    the next call raises JobCancelled, so a job that reports progress in its
+    main loop can be cancelled without further changes.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last_write = 0.0
+
+    def progress(self, done, total, message=None):
+        now = time.monotonic()
+        if done < total and now - self._last_write < JOB_PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        fraction = round(done / total, 4) if total else 1.0
+        database.update_job(self.job_id, progress=fraction, progress_message=message)
+        if database.is_job_cancel_requested(self.job_id):
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+
+def print_progress(label, every=0.1):
+    """
+    Progress callback for synchronous callers that logs every `every` of the work.
+
+    Returns:
+        callable(done, total, message=None) with the same signature as JobContext.progress
+    """
+    state = {'next': 0.0}
+
+    def report(done, total, message=None):
+        fraction = done / total if total else 1.0
+        if fraction >= state['next'] or done == total:
+            print(f"  ↳ {label}: {done}/{total}" + (f" ({message})" if message else ""))
+            state['next'] = fraction + every
+    return report
+
+class JobRunner:
+    """
+    Runs registered job kinds on a thread pool and records them in the jobs table.
+
+    Handlers are plain functions `handler(params, job)` returning a JSON-able
+    result, where job is a JobContext. Job rows outlive the process; jobs that
+    were queued or running when it stopped are marked 'interrupted' on start.
+    """
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.workers = workers
+        self._handlers = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._active = set()
+
+    def register(self, kind):
+        """Decorator registering a handler for a job kind"""
+        def decorator(handler):
+            self._handlers[kind] = handler
+            return handler
+        return decorator
+
+    @property
+    def kinds(self):
+        return sorted(self._handlers)
+
+    def submit(self, kind, params):
+        """
+        Queue a job.
+
+        Returns:
+            Job ID
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = database.create_job(kind, params)
+        print(f"📋 Queued job {job_id} ({kind})")
+        self._executor.submit(self._run, job_id, kind, params)
+        return job_id
+
+    def _run(self, job_id, kind, params):
+        job = database.get_job(job_id, include_result=False)
+        if job is None or job['cancel_requested']:
+            database.update_job(job_id, status='cancelled', finished_date=datetime.now().isoformat())
+            return
+
+        with self._lock:
+            self._active.add(job_id)
+        database.update_job(job_id, status='running', started_date=datetime.now().isoformat())
+        print(f"▶️ Running job {job_id} ({kind})")
+        started = time.perf_counter()
+        try:
+            result = self._handlers[kind](params, JobContext(job_id))
+            database.update_job(
+                job_id,
+                status='succeeded',
+                progress=1.0,
+                result=result,
+                finished_date=datetime.now().isoformat()
+            )
+            print(f"✅ Job {job_id} ({kind}) finished in {time.perf_counter() - started:.1f}s")
+        except JobCancelled:
+            database.update_job(job_id, status='cancelled', finished_date=datetime.now().isoformat())
+            print(f"⏹️ Job {job_id} ({kind}) cancelled")
+        except Exception as e:
+            database.update_job(
+                job_id,
+                status='failed',
+                error=str(e),
+                finished_date=datetime.now().isoformat()
+            )
+            print(f"❌ Job {job_id} ({kind}) failed: {str(e)}")
+            print(f"Full traceback: {traceback.format_exc()}")
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def cancel(self, job_id):
+        """Request cancellation; returns False if the job already finished"""
+        return database.request_job_cancel(job_id)
+
+    def recover(self):
+        """
+        Mark jobs a previous process left queued or running as interrupted;
+        they can't resume. Called once at server startup, never on import.
+        """
+        interrupted = database.mark_interrupted_jobs()
+        if interrupted:
+            print(f"Marked {interrupted} unfinished jobs from a previous run as interrupted")
+        return interrupted
+
+    def stats(self):
+        with self._lock:
+            active = sorted(self._active)
+        return {'workers': self.workers, 'active_jobs': active, 'kinds': self.kinds}
+
+job_runner = JobRunner()
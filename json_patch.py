@@ -0,0 +1,252 @@
+"""
+RFC 6902 JSON Patch applied inside SQLite with the JSON1 functions.
+
+Operations run one at a time against a JSON TEXT column of a single row,
+in the caller's transaction, so only the patch crosses the wire and the
+document is never loaded into Python. JSON Pointers are resolved against
+the stored document into JSON1 paths ($."key", $[index]). JSON1 cannot
+insert into the middle of an array, so that one case reads just that
+array back, inserts in Python and writes it with json_set.
+"""
+import os
+import json
+
+JSON_PATCH_MAX_OPERATIONS = int(os.getenv('JSON_PATCH_MAX_OPERATIONS', 1000))
+OPERATIONS = ['add', 'remove', 'replace', 'move', 'copy', 'test']
+
+class JsonPatchError(ValueError):
+    """A malformed patch, or a path that does not resolve against the document"""
+
+class JsonPatchTestFailed(JsonPatchError):
+    """A 'test' operation did not match the document"""
+
+def parse_pointer(pointer):
+    """RFC 6901 JSON Pointer -> list of reference tokens ('' is the whole document)"""
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith('/')):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    if pointer == '':
+        return []
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+def validate_operations(operations):
+    """
+    Check the shape of a patch before touching the database.
+
+    Raises:
+        JsonPatchError: If it is not a list of well-formed operations
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("A patch is a list of operations")
+    if len(operations) > JSON_PATCH_MAX_OPERATIONS:
+        raise JsonPatchError(f"At most {JSON_PATCH_MAX_OPERATIONS} operations per patch")
+    for i, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+            raise JsonPatchError(f"Operation {i} needs an op, one of {', '.join(OPERATIONS)}")
+        parse_pointer(operation.get('path'))
+        if operation['op'] in ('add', 'replace', 'test') and 'value' not in operation:
+            raise JsonPatchError(f"Operation {i} ({operation['op']}) needs a value")
+        if operation['op'] in ('move', 'copy'):
+            parse_pointer(operation.get('from'))
+    return operations
+
+def json_equal(a, b):
+    """JSON value equality: 1 == 1.0, but true != 1 and key order does not matter"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool) and a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(json_equal(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    return type(a) == type(b) and a == b
+
+def _array_index(token, length, allow_end):
+    """A token as an index into an array of length; '-' (and length itself) only when allow_end"""
+    if token == '-' and allow_end:
+        return length
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > length or (index == length and not allow_end):
+        raise JsonPatchError(f"Array index {index} out of range")
+    return index
+
+def _member_path(parent_path, token):
+    if '"' in token:
+        raise JsonPatchError(f"Keys containing '\"' are not supported: {token!r}")
+    return f'{parent_path}."{token}"'
+
+class _Document:
+    """JSON1 reads and writes of table.column for one row"""
+
+    def __init__(self, conn, table, column, row_id):
+        self.conn = conn
+        self.table = table
+        self.column = column
+        self.row_id = row_id
+
+    def select(self, expression, *params):
+        return self.conn.execute(
+            f'SELECT {expression} FROM {self.table} WHERE id = ?', (*params, self.row_id)
+        ).fetchone()
+
+    def update(self, expression, *params):
+        self.conn.execute(
+            f'UPDATE {self.table} SET {self.column} = {expression} WHERE id = ?', (*params, self.row_id)
+        )
+
+    def type_at(self, path):
+        return self.select(f'json_type({self.column}, ?)', path)[0]
+
+    def array_length(self, path):
+        return self.select(f'json_array_length({self.column}, ?)', path)[0]
+
+    def value_at(self, path):
+        """(found, value) at a JSON1 path"""
+        value_type, value = self.select(f'json_type({self.column}, ?), json_extract({self.column}, ?)', path, path)
+        if value_type is None:
+            return False, None
+        if value_type in ('object', 'array'):
+            return True, json.loads(value)
+        if value_type in ('true', 'false'):
+            return True, value_type == 'true'
+        return True, value
+
+    def resolve_parent(self, tokens):
+        """
+        JSON1 path and type of the container holding the last token.
+
+        Raises:
+            JsonPatchError: If a token on the way does not exist or is not a container
+        """
+        path = '$'
+        for token in tokens[:-1]:
+            container = self.type_at(path)
+            if container == 'object':
+                path = _member_path(path, token)
+            elif container == 'array':
+                path = f'{path}[{_array_index(token, self.array_length(path), allow_end=False)}]'
+            else:
+                raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+        container = self.type_at(path)
+        if container is None:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+        return path, container
+
+    def existing_path(self, tokens):
+        """JSON1 path of an existing value"""
+        if not tokens:
+            return '$'
+        parent_path, container = self.resolve_parent(tokens)
+        if container == 'object':
+            path = _member_path(parent_path, tokens[-1])
+            if self.type_at(path) is None:
+                raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+            return path
+        if container == 'array':
+            return f'{parent_path}[{_array_index(tokens[-1], self.array_length(parent_path), allow_end=False)}]'
+        raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+
+    def get(self, tokens):
+        return self.value_at(self.existing_path(tokens))[1]
+
+    def add(self, tokens, value):
+        value_json = json.dumps(value)
+        if not tokens:
+            self.update('json(?)', value_json)
+            return
+        parent_path, container = self.resolve_parent(tokens)
+        if container == 'object':
+            self.update(f'json_set({self.column}, ?, json(?))', _member_path(parent_path, tokens[-1]), value_json)
+        elif container == 'array':
+            length = self.array_length(parent_path)
+            index = _array_index(tokens[-1], length, allow_end=True)
+            if index == length:
+                self.update(f'json_insert({self.column}, ?, json(?))', f'{parent_path}[#]', value_json)
+            else:
+                # JSON1 has no insert-before; rewrite just this array
+                array = self.value_at(parent_path)[1]
+                array.insert(index, value)
+                self.update(f'json_set({self.column}, ?, json(?))', parent_path, json.dumps(array))
+        else:
+            raise JsonPatchError(f"Cannot add to a {container} at /{'/'.join(tokens)}")
+
+    def remove(self, tokens):
+        if not tokens:
+            raise JsonPatchError("Cannot remove the whole document")
+        self.update(f'json_remove({self.column}, ?)', self.existing_path(tokens))
+
+    def replace(self, tokens, value):
+        path = self.existing_path(tokens)
+        if path == '$':
+            self.update('json(?)', json.dumps(value))
+        else:
+            self.update(f'json_set({self.column}, ?, json(?))', path, json.dumps(value))
+
+def apply_patch(conn, table, column, row_id, operations):
+    """
+    Apply a JSON Patch to the JSON document in table.column of one row.
+
+    Runs in the caller's transaction; on an error the caller rolls back and
+    none of the operations stick. A NULL document starts as {}.
+
+    Raises:
+        JsonPatchError: Malformed operation or a path that does not resolve
+        JsonPatchTestFailed: A 'test' operation did not match
+    """
+    validate_operations(operations)
+    document = _Document(conn, table, column, row_id)
+    conn.execute(f"UPDATE {table} SET {column} = '{{}}' WHERE id = ? AND ({column} IS NULL OR {column} = '')", (row_id,))
+    if not document.select(f'json_valid({column})')[0]:
+        raise JsonPatchError("The stored document is not valid JSON")
+
+    for operation in operations:
+        op, path = operation['op'], parse_pointer(operation['path'])
+        if op == 'add':
+            document.add(path, operation['value'])
+        elif op == 'remove':
+            document.remove(path)
+        elif op == 'replace':
+            document.replace(path, operation['value'])
+        elif op == 'test':
+            if not json_equal(document.get(path), operation['value']):
+                raise JsonPatchTestFailed(f"Test failed at {operation['path']}")
+        else:
+            source = parse_pointer(operation['from'])
+            if op == 'move' and path[:len(source)] == source and len(path) > len(source):
+                raise JsonPatchError(f"Cannot move {operation['from']} into itself")
+            value = document.get(source)
+            if op == 'move':
+                if path == source:
+                    continue
+                document.remove(source)
+            document.add(path, value)
+
+def parse_version(value):
+    """A document version from an If-Match header ("3", W/"3") or a JSON body; None if absent"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        value = value[2:] if value.startswith('W/') else value
+        value = value.strip('"')
+    if isinstance(value, bool):
+        raise JsonPatchError(f"Invalid version: {value!r}")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise JsonPatchError(f"Invalid version: {value!r}")
+
+def patch_from_body(body, if_match=None):
+    """
+    (operations, expected_version) from a PATCH request: the body is a bare
+    RFC 6902 list or {'operations': [...], 'version': n}; an If-Match header
+    wins over the body's version.
+    """
+    if isinstance(body, dict):
+        operations, version = body.get('operations'), body.get('version')
+    else:
+        operations, version = body, None
+    expected_version = parse_version(if_match) if if_match else parse_version(version)
+    return validate_operations(operations), expected_version
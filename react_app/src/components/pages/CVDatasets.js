@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useContext, useRef } from 'react';
 import Layout from './Layout';
 import { GlobalContext } from '../../index';
+import { videoService } from 'services/videoService';
 import { Player } from '@remotion/player';
 import VideoPlayer from 'components/VideoPlayer';
 import './CVDatasets.css';
@@ -42,15 +43,17 @@ function CVDatasets() {
 
   const fetchVideos = async () => {
     try {
-      const response = await fetch(`${globalData.APIbaseUrl}/api/videos`);
-      const data = await response.json();
+      const data = await videoService.listVideos(
+        globalData.APIbaseUrl, ['id', 'title', 'filepath', 'size', 'width', 'height']
+      );
       
-      const videosWithParsedMetadata = data.map(video => ({
+      // Only the dimensions are read from metadata here
+      const videosWithMetadata = data.map(({ width, height, ...video }) => ({
         ...video,
-        metadata: JSON.parse(video.metadata)
+        metadata: { width, height }
       }));
       
-      setVideos(videosWithParsedMetadata);
+      setVideos(videosWithMetadata);
     } catch (error) {
       setError('Failed to fetch videos');
     } finally {
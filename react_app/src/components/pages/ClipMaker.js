@@ -85,34 +85,9 @@ function ClipMaker() {
     if (!selectedVideo) return;
     
     try {
-      // Get existing metadata
-      const metadata = selectedVideo.metadata ? JSON.parse(selectedVideo.metadata) : {};
-      const existingTags = metadata.tags || [];
-      
-      // Find the index of the first matching tag
-      const tagIndex = existingTags.findIndex(tag => 
-        tag.name === tagToDelete.name && 
-        tag.frame === tagToDelete.frame &&
-        tag.startFrame === tagToDelete.startFrame &&
-        tag.endFrame === tagToDelete.endFrame
-      );
-
-      if (tagIndex === -1) return; // Tag not found
-
-      // Create new array with the tag removed
-      const updatedTags = [
-        ...existingTags.slice(0, tagIndex),
-        ...existingTags.slice(tagIndex + 1)
-      ];
-
-      const response = await fetch(`${globalData.APIbaseUrl}/api/videos/${selectedVideo.id}/metadata`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          metadata: JSON.stringify({ ...metadata, tags: updatedTags })
-        }),
+      // Tags from /with-tags carry their video_tags id
+      const response = await fetch(`${globalData.APIbaseUrl}/api/videos/${selectedVideo.id}/tags/${tagToDelete.id}`, {
+        method: 'DELETE',
       });
 
       if (!response.ok) throw new Error('Failed to delete tag');
@@ -5,6 +5,7 @@ import { findPlayerSequences } from '../stats/statUtils';
 import './Homography.css';
 import { Player } from '@remotion/player';
 import { VideoWithBoxes } from '../templates/VideoWithBoxes';
+import { videoService } from 'services/videoService';
 
 function Homography() {
   const globalData = useContext(GlobalContext);
@@ -131,9 +132,10 @@ function Homography() {
     }
   };
 
-  const handleVideoSelect = (videoId) => {
+  const handleVideoSelect = async (videoId) => {
     const video = videos.find(v => v.id === parseInt(videoId));
-    setSelectedVideo(video);
+    // Boxes come from the bounding-box store; merge them in before use
+    setSelectedVideo(video && await videoService.withBoxes(globalData.APIbaseUrl, video));
     const videoMetadata = JSON.parse(video.metadata);
     setMetadata(videoMetadata);
   };
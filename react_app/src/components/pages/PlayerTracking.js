@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useContext, useRef } from 'react';
 import Layout from './Layout';
 import { GlobalContext } from '../../index';
+import { videoService } from 'services/videoService';
 import './PlayerTracking.css';
 import { handleTagManagement } from '../stats/tagManager';
 
@@ -47,16 +48,17 @@ function PlayerTracking() {
 
   const fetchVideos = async () => {
     try {
-      const response = await fetch(`${globalData.APIbaseUrl}/api/videos`);
-      const data = await response.json();
+      const data = await videoService.listVideos(
+        globalData.APIbaseUrl, ['id', 'title', 'filepath', 'size', 'width', 'height']
+      );
       
-      // Parse metadata for each video
-      const videosWithParsedMetadata = data.map(video => ({
+      // Only the dimensions are read from metadata here
+      const videosWithMetadata = data.map(({ width, height, ...video }) => ({
         ...video,
-        metadata: JSON.parse(video.metadata)
+        metadata: { width, height }
       }));
       
-      setVideos(videosWithParsedMetadata);
+      setVideos(videosWithMetadata);
     } catch (error) {
       setError('Failed to fetch videos');
     } finally {
@@ -541,7 +543,8 @@ function PlayerTracking() {
           body: JSON.stringify({
             video_id: selectedVideo.id,
             frame_number: frameNumber,
-            bbox: [rect.x, rect.y, rect.width, rect.height]
+            bbox: [rect.x, rect.y, rect.width, rect.height],
+            include_image: false
           })
         });
 
@@ -18,6 +18,7 @@ import { useListen } from '../hotkeys/Listen';
 import { debounce } from 'lodash';
 import { FaPencilAlt, FaSave } from 'react-icons/fa';
 import { GlobalContext } from '../../index'; 
+import { videoService } from 'services/videoService';
 import Draggable from 'react-draggable';
 import { Stage, Layer, Line, Circle } from 'react-konva';
 import { RangesSection } from '../RangesSection';
@@ -151,6 +152,11 @@ function VideoDetail() {
         setVideo(response.data);
         setMetadata(JSON.stringify(response.data.metadata, null, 2));
         setParsedMetadata(response.data.metadata);
+
+        // Boxes live in the bounding-box store, not in the metadata
+        videoService.fetchBoxes(globalData.APIbaseUrl, id)
+          .then(boxes => setBoxesData(boxes.length ? boxes : null))
+          .catch(error => console.error('Error fetching boxes:', error));
         
         // Load saved shapes if they exist
         if (response.data.metadata?.shapes) {
@@ -455,9 +461,10 @@ function VideoDetail() {
       setMetadata(metadataString);
       setParsedMetadata(newMetadata);
       
-      await axios.post(`${globalData.APIbaseUrl}/api/videos/${id}/metadata`, { 
-        metadata: metadataString 
-      });
+      // Only the shapes go over the wire
+      await axios.patch(`${globalData.APIbaseUrl}/api/videos/${id}/metadata`, [
+        { op: 'add', path: '/shapes', value: shapesData }
+      ]);
       
       setShapesSaveStatus('Saved ✅');
       setTimeout(() => setShapesSaveStatus(''), 2000);
@@ -495,17 +502,11 @@ function VideoDetail() {
 
       const data = await response.json();
       setBoxesData(data.boxes);
-      
-      // Update the metadata
-      const newMetadata = JSON.parse(metadata);
-      newMetadata.boxes = data.boxes;
-      setMetadata(JSON.stringify(newMetadata, null, 2));
-      setParsedMetadata(newMetadata);
 
-      // Save metadata automatically
-      await axios.post(`${globalData.APIbaseUrl}/api/videos/${id}/metadata`, { 
-        metadata: JSON.stringify(newMetadata, null, 2) 
-      });
+      // Save the boxes automatically
+      if (!await videoService.saveBoxes(globalData.APIbaseUrl, id, data.boxes)) {
+        throw new Error('Failed to save boxes');
+      }
 
       setLastBoxUpdate(new Date().toLocaleTimeString());
 
@@ -562,7 +563,7 @@ function VideoDetail() {
     console.log('Scale factors:', { scaleX, scaleY });
 
     // Check if we have boxes data for current frame
-    const frameBoxes = parsedMetadata?.boxes?.[currentFrame];
+    const frameBoxes = boxesData?.[currentFrame];
     console.log('Current frame:', currentFrame);
     console.log('Available boxes for frame:', frameBoxes);
     if (!frameBoxes) {
@@ -650,7 +651,7 @@ function VideoDetail() {
       }
 
       // Get current frame's boxes
-      const frameBoxes = parsedMetadata?.boxes?.[currentFrame];
+      const frameBoxes = boxesData?.[currentFrame];
       if (frameBoxes) {
         setCurrentBoxes(frameBoxes);
         setShowMissButtons(true);
@@ -662,7 +663,7 @@ function VideoDetail() {
       setClickFeedback(null);
     }, 1000);
     setFeedbackTimeout(timeout);
-  }, [currentFrame, parsedMetadata]);
+  }, [currentFrame, parsedMetadata, boxesData]);
 
   const handlePlayerButtonClick = (playerName, bbox) => {
     // Create tag as if player was clicked
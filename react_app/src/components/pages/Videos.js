@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import Layout from 'components/pages/Layout';
 import axios from 'axios';
 import { GlobalContext } from '../../index';
+import { videoService } from 'services/videoService';
 import './Videos.css';
 import Modal from 'react-modal';
 import { FaTrash } from 'react-icons/fa';
@@ -34,14 +35,7 @@ function Videos() {
 
   const fetchVideos = async () => {
     try {
-      const response = await axios.get(`${globalData.APIbaseUrl}/api/videos`);
-      
-      const videos = response.data;
-      console.log(videos);
-      videos.forEach(video => {
-        video.metadata = JSON.parse(video.metadata);
-      });
-
+      const videos = await videoService.listVideos(globalData.APIbaseUrl);
       setVideos(videos);
     } catch (error) {
       console.error('Error fetching videos:', error);
@@ -297,7 +291,7 @@ function Videos() {
                 </tr>
                 <tr className="metadata-row" onClick={() => handleVideoClick(video.id)}>
                   <td colSpan="2">
-                    {video.filepath} • {(video.size / 1024 / 1024).toFixed(2)} MB • {video.metadata?.tags?.length || 0} tags
+                    {video.filepath} • {(video.size / 1024 / 1024).toFixed(2)} MB • {video.tag_count} tags
                   </td>
                 </tr>
               </React.Fragment>
@@ -18,6 +18,7 @@ import { RenderHistory } from 'components/RenderHistory';
 import { TagsTable } from 'components/TagsTable';
 import { ClipSettings } from 'components/ClipSettings';
 import { filmService } from 'services/filmService';
+import { videoService } from 'services/videoService';
 
 export const calculateTotalDuration = (selectedTags) => {
   const tagArray = Array.from(selectedTags);
@@ -83,6 +84,9 @@ function ViewFilm() {
   const [selectedTemplate, setSelectedTemplate] = useState('VideoFirstFiveSeconds');
   const [includedClips, setIncludedClips] = useState([]);
   const playerRef = useRef(null);
+  const filmVersionRef = useRef(null);
+  const clipSettingsRef = useRef(null);
+  const patchQueueRef = useRef(Promise.resolve());
   const [renderStatus, setRenderStatus] = useState(null);
   const [renderFilename, setRenderFilename] = useState(null);
   const [tagFilter, setTagFilter] = useState('');
@@ -103,6 +107,8 @@ function ViewFilm() {
   const fetchFilm = async () => {
     try {
       const data = await filmService.fetchFilm(globalData.APIbaseUrl, id);
+      filmVersionRef.current = data.version;
+      clipSettingsRef.current = data.data?.clipSettings || null;
       setFilm(data);
     } catch (error) {
       console.error('Error fetching film:', error);
@@ -269,6 +275,17 @@ function ViewFilm() {
     fetchVideos();
   }, [id]);
 
+  // Boxes are no longer part of the listing; load them for the selected videos only
+  useEffect(() => {
+    const missing = videos.filter(video => selectedVideos.has(video.id) && !video.boxesLoaded);
+    if (!missing.length) return;
+    Promise.all(missing.map(video => videoService.withBoxes(globalData.APIbaseUrl, video)))
+      .then(loaded => {
+        const byId = new Map(loaded.map(video => [video.id, video]));
+        setVideos(prev => prev.map(video => byId.get(video.id) || video));
+      });
+  }, [videos, selectedVideos, globalData.APIbaseUrl]);
+
   useEffect(() => {
     if (film?.data) {
       if (film.data.clips) {
@@ -492,108 +509,65 @@ function ViewFilm() {
     };
   }, [previewPending, previewStartFrame]);
 
-  const saveClipSettings = useCallback(async (clipKey, settings) => {
-    try {
-      const updatedData = {
-        ...film.data,
-        clipSettings: {
-          ...(film.data?.clipSettings || {}),
-          [clipKey]: settings
-        }
-      };
-
-      const response = await fetch(`${globalData.APIbaseUrl}/api/films/${id}/data`, {
-        method: 'PUT',
-        headers: {
-          'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ data: updatedData })
-      });
+  // Clip settings are saved as JSON Patch operations on just the one clip, queued so
+  // each request carries the version the previous one returned. On a 409 another
+  // editor saved first: reload their changes and replay ours on top. Operations are
+  // built when a request is sent, from clipSettingsRef (the clip settings the server
+  // last confirmed), never from render state, so queued saves and replays build on
+  // each other instead of replacing /clipSettings. `update` is the clip's new
+  // settings, or a function from its current settings to the new ones.
+  const patchClipSettings = useCallback((clipKey, update) => {
+    let clipSettings;
+    const buildOperations = () => {
+      const current = clipSettingsRef.current;
+      clipSettings = typeof update === 'function' ? update(current?.[clipKey] || {}) : update;
+      return [
+        ...(current ? [] : [{ op: 'add', path: '/clipSettings', value: {} }]),
+        { op: 'add', path: `/clipSettings/${filmService.pointerToken(clipKey)}`, value: clipSettings }
+      ];
+    };
+    const send = () => filmService.patchFilmData(globalData.APIbaseUrl, id, buildOperations(), filmVersionRef.current);
 
-      if (response.ok) {
-        setFilm(prev => ({
-          ...prev,
-          data: updatedData
-        }));
+    patchQueueRef.current = patchQueueRef.current.then(async () => {
+      let result = await send();
+      if (result.conflict) {
+        await fetchFilm();
+        result = await send();
       }
-    } catch (error) {
-      console.error('Failed to save clip settings:', error);
-    }
-  }, [film?.data, globalData.APIbaseUrl, id]);
-
-  const handleSettingChange = useCallback(async (clipKey, setting, value) => {
-    try {
-      const newClipSettings = {
-        ...(film.data?.clipSettings || {}),
-        [clipKey]: {
-          ...(film.data?.clipSettings?.[clipKey] || {}),
-          [setting]: value
-        }
-      };
-
-      const response = await fetch(`${globalData.APIbaseUrl}/api/films/${id}/data`, {
-        method: 'PUT',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          data: {
-            ...film.data,
-            clipSettings: newClipSettings
-          }
-        }),
-      });
-
-      if (response.ok) {
-        setFilm(prev => ({
-          ...prev,
-          data: {
-            ...prev.data,
-            clipSettings: newClipSettings
-          }
-        }));
+      if (!result.ok) {
+        console.error('Failed to save clip settings');
+        return;
       }
-    } catch (error) {
+      filmVersionRef.current = result.version;
+      clipSettingsRef.current = { ...(clipSettingsRef.current || {}), [clipKey]: clipSettings };
+      setFilm(prev => ({
+        ...prev,
+        version: result.version,
+        data: {
+          ...prev.data,
+          clipSettings: {
+            ...(prev.data?.clipSettings || {}),
+            [clipKey]: clipSettings
+          }
+        }
+      }));
+    }).catch(error => {
       console.error('Error updating clip settings:', error);
-    }
-  }, [film?.data, globalData.APIbaseUrl, id]);
+    });
+    return patchQueueRef.current;
+  }, [globalData.APIbaseUrl, id]);
 
-  const handleBulkSettingChange = useCallback(async (clipKey, settings) => {
-    try {
-      const newClipSettings = {
-        ...(film.data?.clipSettings || {}),
-        [clipKey]: {
-          ...(film.data?.clipSettings?.[clipKey] || {}),
-          ...settings
-        }
-      };
+  const saveClipSettings = useCallback((clipKey, settings) => (
+    patchClipSettings(clipKey, settings)
+  ), [patchClipSettings]);
 
-      const response = await fetch(`${globalData.APIbaseUrl}/api/films/${id}/data`, {
-        method: 'PUT',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          data: {
-            ...film.data,
-            clipSettings: newClipSettings
-          }
-        }),
-      });
+  const handleSettingChange = useCallback((clipKey, setting, value) => (
+    patchClipSettings(clipKey, current => ({ ...current, [setting]: value }))
+  ), [patchClipSettings]);
 
-      if (response.ok) {
-        setFilm(prev => ({
-          ...prev,
-          data: {
-            ...prev.data,
-            clipSettings: newClipSettings
-          }
-        }));
-      }
-    } catch (error) {
-      console.error('Error updating clip settings:', error);
-    }
-  }, [film?.data, globalData.APIbaseUrl, id]);
+  const handleBulkSettingChange = useCallback((clipKey, settings) => (
+    patchClipSettings(clipKey, current => ({ ...current, ...settings }))
+  ), [patchClipSettings]);
 
   const toggleSettings = useCallback((clipKey) => {
     setExpandedSettings(prev => {
@@ -2,6 +2,7 @@ import React, { useState, useContext, useEffect } from 'react';
 import { GlobalContext } from '../../index';
 import { findPlayerSequences } from '../stats/statUtils';
 import { handleTagApproval } from '../stats/tagApproval';
+import { videoService } from 'services/videoService';
 
 function PlayerSequenceProcessor({ 
   selectedVideo, 
@@ -14,10 +15,12 @@ function PlayerSequenceProcessor({
   const [boxes, setBoxes] = useState([]);
 
   useEffect(() => {
-    const metadataText = selectedVideo?.metadata;
-    const metadata = metadataText ? JSON.parse(metadataText) : {};
-    setBoxes(metadata.boxes);
-  }, [selectedVideo]);
+    setBoxes([]);
+    if (!selectedVideo?.id) return;
+    videoService.fetchBoxes(globalData.APIbaseUrl, selectedVideo.id)
+      .then(setBoxes)
+      .catch(error => console.error('Error fetching boxes:', error));
+  }, [selectedVideo?.id, globalData.APIbaseUrl]);
 
   const processSequences = () => {
     if (!boxes || !playerName) {
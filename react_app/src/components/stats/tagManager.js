@@ -1,16 +1,9 @@
+import { videoService } from 'services/videoService';
+
 export const handleTagManagement = async (videoId, tag, APIbaseUrl) => {
   try {
-    // First fetch existing video data
-    const response = await fetch(`${APIbaseUrl}/api/videos/${videoId}`);
-    const videoData = await response.json();
-    
-    // Parse existing metadata
-    const metadata = videoData.metadata;
-    // Parse metadata if it's a string
-    if (typeof metadata === 'string') {
-      metadata = JSON.parse(metadata);
-    }
-    const existingTags = metadata.tags || [];
+    // First fetch existing tags
+    const existingTags = await videoService.fetchTags(APIbaseUrl, videoId);
     
     // Check for duplicate tag
     const isDuplicate = existingTags.some(existingTag => 
@@ -25,30 +18,13 @@ export const handleTagManagement = async (videoId, tag, APIbaseUrl) => {
     }
     
     // Add new tag
-    const updatedTags = [...existingTags, tag];
-    
-    // Update metadata with new tags
-    const updatedMetadata = {
-      ...metadata,
-      tags: updatedTags
-    };
-
-    // Save updated metadata
-    const saveResponse = await fetch(`${APIbaseUrl}/api/videos/${videoId}/metadata`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({ 
-        metadata: JSON.stringify(updatedMetadata)
-      })
-    });
+    const saved = await videoService.addTags(APIbaseUrl, videoId, [tag]);
 
-    if (!saveResponse.ok) throw new Error('Failed to save tag');
+    if (!saved) throw new Error('Failed to save tag');
     return true;
   } catch (error) {
     console.error('Error managing tags:', error);
     alert(error.message || 'Failed to add tag');
     return false;
   }
-}; 
\ No newline at end of file
+}; 
@@ -26,6 +26,22 @@ export const filmService = {
     return response.ok;
   },
 
+  // Apply JSON Patch operations server-side; returns { ok, version, conflict }
+  async patchFilmData(APIbaseUrl, id, operations, version) {
+    const response = await fetch(`${APIbaseUrl}/api/films/${id}/data`, {
+      method: 'PATCH',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ operations, version }),
+    });
+    const data = await response.json();
+    return { ok: response.ok, version: data.version, conflict: response.status === 409 };
+  },
+
+  // A key escaped for use as one JSON Pointer token (RFC 6901)
+  pointerToken(key) {
+    return String(key).replace(/~/g, '~0').replace(/\//g, '~1');
+  },
+
   async fetchVideos(APIbaseUrl) {
     const response = await fetch(`${APIbaseUrl}/api/videos/with-tags`);
     return response.json();
@@ -0,0 +1,69 @@
+export const videoService = {
+  // All videos from the lightweight listing, following X-Next-After-Id pages
+  async listVideos(APIbaseUrl, fields = ['id', 'title', 'filepath', 'size', 'tag_count']) {
+    const videos = [];
+    let afterId = null;
+    do {
+      const params = new URLSearchParams({ fields: fields.join(','), limit: 1000 });
+      if (afterId) params.set('after_id', afterId);
+      const response = await fetch(`${APIbaseUrl}/api/videos?${params}`);
+      if (!response.ok) throw new Error('Failed to fetch videos');
+      videos.push(...(await response.json()));
+      afterId = response.headers.get('X-Next-After-Id');
+    } while (afterId);
+    return videos;
+  },
+
+  async fetchTags(APIbaseUrl, videoId) {
+    const response = await fetch(`${APIbaseUrl}/api/videos/${videoId}/tags`);
+    if (!response.ok) throw new Error('Failed to fetch tags');
+    return response.json();
+  },
+
+  async addTags(APIbaseUrl, videoId, tags) {
+    const response = await fetch(`${APIbaseUrl}/api/videos/${videoId}/tags`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ tags }),
+    });
+    return response.ok;
+  },
+
+  // Per-frame boxes from frame 0 (index = frame number), from the bounding-box store
+  async fetchBoxes(APIbaseUrl, videoId) {
+    const response = await fetch(`${APIbaseUrl}/api/videos/${videoId}/boxes`);
+    if (!response.ok) throw new Error('Failed to fetch boxes');
+    const data = await response.json();
+    return data.boxes;
+  },
+
+  async saveBoxes(APIbaseUrl, videoId, boxes) {
+    const response = await fetch(`${APIbaseUrl}/api/videos/${videoId}/boxes`, {
+      method: 'PUT',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ boxes }),
+    });
+    return response.ok;
+  },
+
+  // The video with its boxes merged back into metadata, for components that read metadata.boxes
+  async withBoxes(APIbaseUrl, video) {
+    try {
+      const boxes = await this.fetchBoxes(APIbaseUrl, video.id);
+      const isString = typeof video.metadata === 'string';
+      const metadata = (isString ? JSON.parse(video.metadata) : video.metadata) || {};
+      const merged = { ...metadata, boxes };
+      return { ...video, metadata: isString ? JSON.stringify(merged) : merged, boxesLoaded: true };
+    } catch (error) {
+      console.error('Error fetching boxes:', error);
+      return { ...video, boxesLoaded: true };
+    }
+  },
+
+  async deleteTag(APIbaseUrl, videoId, tagId) {
+    const response = await fetch(`${APIbaseUrl}/api/videos/${videoId}/tags/${tagId}`, {
+      method: 'DELETE',
+    });
+    return response.ok;
+  },
+};
@@ -0,0 +1,107 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from inference_sdk import InferenceHTTPClient
+from frame_encoding import encode_frame_base64
+
+ROBOFLOW_API_URL = os.getenv('ROBOFLOW_API_URL', 'https://detect.roboflow.com')
+ROBOFLOW_API_KEY = os.getenv('ROBOFLOW_API_KEY', 'pH2eX46dBGLw2Gh1ofek')
+ROBOFLOW_MODEL_ID = os.getenv('ROBOFLOW_MODEL_ID', 'classify-frisbee/3')
+ROBOFLOW_MAX_IN_FLIGHT = int(os.getenv('ROBOFLOW_MAX_IN_FLIGHT', 8))
+
+class RoboflowClassifier:
+    """
+    Classifies image crops with one shared InferenceHTTPClient.
+
+    Crops are JPEG-encoded in memory and sent as base64, so nothing touches
+    the working directory. Up to max_in_flight inference requests run at once
+    on a thread pool. Point api_url at a local stub server to test it.
+    """
+
+    def __init__(self, api_url=ROBOFLOW_API_URL, api_key=ROBOFLOW_API_KEY,
+                 model_id=ROBOFLOW_MODEL_ID, max_in_flight=ROBOFLOW_MAX_IN_FLIGHT):
+        self.model_id = model_id
+        self.max_in_flight = max_in_flight
+        # Always speak the hosted (v0) protocol, even to a non-Roboflow URL
+        self.client = InferenceHTTPClient(api_url=api_url, api_key=api_key).select_api_v0()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='roboflow')
+        self._lock = threading.Lock()
+        self._counters = {'requests': 0, 'errors': 0}
+
+    def classify(self, frame):
+        """
+        Classify one image (blocking).
+
+        Args:
+            frame: numpy array of the image (BGR)
+
+        Returns:
+            dict of Roboflow results plus the base64 JPEG under 'image'
+        """
+        image_base64 = encode_frame_base64(frame, route='roboflow').data
+
+        with self._lock:
+            self._counters['requests'] += 1
+        try:
+            result = self.client.infer(image_base64, model_id=self.model_id)
+        except Exception:
+            with self._lock:
+                self._counters['errors'] += 1
+            raise
+
+        result['image'] = image_base64
+        return result
+
+    def _classify_then(self, frame, on_result):
+        result = self.classify(frame)
+        on_result(result)
+        return result
+
+    def submit(self, frame, on_result=None):
+        """
+        Queue one image for classification and return a Future for its result.
+
+        on_result, if given, is called with the result on the worker thread
+        before the Future completes.
+        """
+        if on_result is None:
+            return self._executor.submit(self.classify, frame)
+        return self._executor.submit(self._classify_then, frame, on_result)
+
+    def classify_many(self, frames):
+        """Classify several images concurrently, returning results in input order"""
+        return list(self._executor.map(self.classify, frames))
+
+    def iter_classified(self, items, window=None, submit=None):
+        """
+        Stream (key, frame) pairs through the thread pool with bounded buffering.
+
+        At most `window` requests (default 4 x max_in_flight) are queued ahead of
+        the consumer, so a long range never holds every crop in memory.
+        `submit` replaces self.submit for turning an item into a Future, e.g.
+        to answer some items from a cache.
+
+        Yields:
+            (key, future) pairs in input order; call future.result() for the
+            classification or its exception
+        """
+        window = window or self.max_in_flight * 4
+        submit = submit or self.submit
+        pending = deque()
+        for key, frame in items:
+            pending.append((key, submit(frame)))
+            if len(pending) >= window:
+                key, future = pending.popleft()
+                future.exception()  # wait without raising
+                yield key, future
+        while pending:
+            key, future = pending.popleft()
+            future.exception()
+            yield key, future
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, 'model_id': self.model_id, 'max_in_flight': self.max_in_flight}
+
+roboflow_classifier = RoboflowClassifier()
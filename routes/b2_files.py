@@ -13,13 +13,15 @@ B2_BUCKET_NAME = 'remotion-videos'
 
 b2_bucket = None
 
-if B2_KEY_ID and B2_APP_KEY:
-    # Initialize B2 connection if credentials exist
-    try:
-        b2_api.authorize_account("production", B2_KEY_ID, B2_APP_KEY)
-        b2_bucket = b2_api.get_bucket_by_name(B2_BUCKET_NAME)
-    except Exception as e:
-        print(f"Warning: Could not initialize B2 bucket: {str(e)}")
+def init_b2_files():
+    """Connect to the bucket if credentials exist; called once at app startup"""
+    global b2_bucket
+    if B2_KEY_ID and B2_APP_KEY:
+        try:
+            b2_api.authorize_account("production", B2_KEY_ID, B2_APP_KEY)
+            b2_bucket = b2_api.get_bucket_by_name(B2_BUCKET_NAME)
+        except Exception as e:
+            print(f"Warning: Could not initialize B2 bucket: {str(e)}")
 
 @b2_bp.route('/files', methods=['GET'])
 def get_b2_files():
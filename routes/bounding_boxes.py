@@ -1,9 +1,12 @@
 from flask import Blueprint, jsonify, request, render_template
 from flask_restx import Api, Resource, fields, Namespace
+import database_bounding_box
 from database_bounding_box import (
     get_db_connection,
     get_frame_bounding_boxes,
     get_player_tracking,
+    get_boxes_in_region,
+    summarize_region_presence,
     export_video_bounding_boxes,
     import_bounding_boxes_json,
     add_video,
@@ -11,6 +14,8 @@ from database_bounding_box import (
     add_frame,
     add_bounding_box
 )
+from boxes_stream import iter_json_array, iter_file_chunks, DEFAULT_CHUNK_SIZE
+from b2 import check_file_exists_in_b2, sam_bucket
 
 bp = Blueprint('bounding_boxes', __name__, url_prefix='/bounding-boxes')
 api = Api(bp, doc='/docs', version='1.0', 
@@ -59,7 +64,7 @@ class VideoList(Resource):
     @api.marshal_list_with(video_model)
     def get(self):
         """List all videos in the database"""
-        conn = get_db_connection('bounding_boxes.db')
+        conn = get_db_connection(database_bounding_box.BOUNDING_BOXES_DB)
         try:
             videos = conn.execute('SELECT * FROM videos').fetchall()
             return [dict(v) for v in videos]
@@ -71,14 +76,14 @@ class FrameBoxes(Resource):
     @api.marshal_list_with(bbox_model)
     def get(self, video_id, frame_number):
         """Get bounding boxes for a specific frame"""
-        return get_frame_bounding_boxes('bounding_boxes.db', video_id, frame_number)
+        return get_frame_bounding_boxes(database_bounding_box.BOUNDING_BOXES_DB, video_id, frame_number)
 
 @api.route('/api/players')
 class PlayerList(Resource):
     @api.marshal_list_with(player_model)
     def get(self):
         """List all players in the database"""
-        conn = get_db_connection('bounding_boxes.db')
+        conn = get_db_connection(database_bounding_box.BOUNDING_BOXES_DB)
         try:
             players = conn.execute('SELECT * FROM players').fetchall()
             return [dict(p) for p in players]
@@ -95,32 +100,90 @@ class PlayerTracking(Resource):
         if not video_id:
             api.abort(400, "video_id parameter required")
         
-        return get_player_tracking('bounding_boxes.db', video_id, player_name)
+        return get_player_tracking(database_bounding_box.BOUNDING_BOXES_DB, video_id, player_name)
 
 @api.route('/api/videos/<int:video_id>/export')
 class VideoExport(Resource):
     def get(self, video_id):
         """Export all bounding boxes for a video"""
-        return export_video_bounding_boxes('bounding_boxes.db', video_id)
+        return export_video_bounding_boxes(database_bounding_box.BOUNDING_BOXES_DB, video_id)
 
 @api.route('/api/videos/<int:video_id>/import')
 class VideoImport(Resource):
     @api.expect(api.model('ImportData', {
         'boxes_data': fields.Raw(required=True, description='Bounding box data in JSON format')
     }))
+    @api.param('stream', 'Parse the request body incrementally instead of loading it into memory')
+    @api.param('b2_file', 'Stream this boxes.json file from the SAM bucket instead of reading the request body')
+    @api.param('batch_size', 'Number of frames inserted per executemany batch')
     def post(self, video_id):
         """Import bounding boxes for a video"""
-        if not request.is_json:
-            api.abort(400, "Content-Type must be application/json")
-        
-        boxes_data = request.get_json()
-        import_bounding_boxes_json('bounding_boxes.db', video_id, boxes_data)
-        return {'status': 'success'}
+        batch_size = request.args.get('batch_size', type=int, default=1000)
+        b2_file = request.args.get('b2_file')
+        stream = request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+        if b2_file:
+            if not check_file_exists_in_b2(b2_file, sam_bucket)[0]:
+                api.abort(404, f"{b2_file} not found in B2")
+            downloaded_file = sam_bucket.download_file_by_name(b2_file)
+            boxes_data = iter_json_array(downloaded_file.response.iter_content(chunk_size=DEFAULT_CHUNK_SIZE))
+        elif stream:
+            boxes_data = iter_json_array(iter_file_chunks(request.stream))
+        else:
+            if not request.is_json:
+                api.abort(400, "Content-Type must be application/json")
+            boxes_data = request.get_json()
+
+        try:
+            stats = import_bounding_boxes_json(database_bounding_box.BOUNDING_BOXES_DB, video_id, boxes_data, batch_size=batch_size)
+        except ValueError as e:
+            api.abort(400, f"Invalid boxes JSON: {str(e)}")
+        return {'status': 'success', 'stats': stats}
+
+@api.route('/api/videos/<int:video_id>/region')
+class VideoRegion(Resource):
+    @api.param('x1', 'Left edge of the rectangle in video pixels', required=True)
+    @api.param('y1', 'Top edge of the rectangle in video pixels', required=True)
+    @api.param('x2', 'Right edge of the rectangle in video pixels', required=True)
+    @api.param('y2', 'Bottom edge of the rectangle in video pixels', required=True)
+    @api.param('start_frame', 'First frame of the window (inclusive)')
+    @api.param('end_frame', 'Last frame of the window (inclusive)')
+    @api.param('mode', 'intersects (default), contains, or feet (bottom-centre inside)')
+    @api.param('players', 'Comma-separated player names to keep')
+    @api.param('include_boxes', 'Also return every matching box')
+    def get(self, video_id):
+        """Which players were inside a rectangle during a frame window, from the spatial index"""
+        region = {key: request.args.get(key, type=float) for key in ('x1', 'y1', 'x2', 'y2')}
+        if any(value is None for value in region.values()):
+            api.abort(400, "x1, y1, x2 and y2 parameters required")
+        start_frame = request.args.get('start_frame', type=int)
+        end_frame = request.args.get('end_frame', type=int)
+        mode = request.args.get('mode', 'intersects')
+        players = [name.strip() for name in request.args.get('players', '').split(',') if name.strip()]
+
+        try:
+            boxes = get_boxes_in_region(
+                database_bounding_box.BOUNDING_BOXES_DB, video_id, start_frame=start_frame, end_frame=end_frame,
+                mode=mode, players=players or None, **region
+            )
+        except ValueError as e:
+            api.abort(400, str(e))
+
+        result = {
+            'video_id': video_id,
+            'region': region,
+            'frame_range': {'start': start_frame, 'end': end_frame},
+            'mode': mode,
+            'players': summarize_region_presence(boxes)
+        }
+        if request.args.get('include_boxes', '').lower() in ('1', 'true', 'yes'):
+            result['boxes'] = boxes
+        return result
 
 # UI Routes
 @bp.route('/', methods=['GET'])
 def index():
-    conn = get_db_connection('bounding_boxes.db')
+    conn = get_db_connection(database_bounding_box.BOUNDING_BOXES_DB)
     try:
         videos = conn.execute('SELECT * FROM videos').fetchall()
         players = conn.execute('SELECT * FROM players').fetchall()
@@ -134,7 +197,7 @@ def index():
 
 @bp.route('/videos/<int:video_id>', methods=['GET'])
 def video_detail(video_id):
-    conn = get_db_connection('bounding_boxes.db')
+    conn = get_db_connection(database_bounding_box.BOUNDING_BOXES_DB)
     try:
         video = conn.execute('SELECT * FROM videos WHERE video_id = ?', (video_id,)).fetchone()
         if not video:
@@ -151,7 +214,7 @@ def video_detail(video_id):
 
 @bp.route('/players/<string:player_name>', methods=['GET'])
 def player_detail(player_name):
-    conn = get_db_connection('bounding_boxes.db')
+    conn = get_db_connection(database_bounding_box.BOUNDING_BOXES_DB)
     try:
         player = conn.execute('SELECT * FROM players WHERE name = ?', (player_name,)).fetchone()
         if not player:
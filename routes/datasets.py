@@ -1,134 +1,258 @@
 from flask import Blueprint, jsonify, request
 import traceback
 import os
-from routes.videos import get_video, extract_frame_with_box, classify_frame_with_roboflow
+import time
+from routes.videos import get_video
+from crop_extraction import crop_to_box
+from frame_cache import iter_video_frames
+from roboflow_classifier import roboflow_classifier
+from classification_cache import classification_cache, bbox_key
+import database
+from jobs import job_runner, print_progress
+from routes.jobs import job_accepted, wants_async
 
 datasets_bp = Blueprint('datasets', __name__)
 
-@datasets_bp.route('/analyze-frames', methods=['GET'])
-def analyze_frames():
-    try:
-        print("\n=== Starting analyze_frames ===")
-        video_id = request.args.get('video_id', type=int)
-        start_frame = request.args.get('start_frame', type=int, default=0)
-        end_frame = request.args.get('end_frame', type=int)
-        skip = request.args.get('skip', type=int, default=0)  # 0 means no skip
-        
-        print(f"Parameters: video_id={video_id}, start_frame={start_frame}, end_frame={end_frame}, skip={skip}")
-        
-        if not video_id:
-            return jsonify({'error': 'Missing video_id'}), 400
+def analyze_frame_range(video_id, start_frame=0, end_frame=None, skip=0, job=None):
+    """
+    Classify every player's crop in a frame range and flag who is holding the frisbee.
 
-        # Get video info
-        video = get_video(video_id)
-        if not video:
-            return jsonify({'error': 'Video not found'}), 404
-        print(f"Found video: {video['filepath']}")
+    Args:
+        video_id: Video ID
+        start_frame, end_frame: Frame range; end_frame defaults to the last frame with boxes
+        skip: Number of frames to skip between samples (0 means no skip)
+        job: JobContext when running as a background job
 
-        # Get boxes data from metadata
-        video_metadata = video.get('metadata', {})
-        boxes_data = video_metadata.get('boxes', [])
-        
-        print(f"Found {len(boxes_data)} total frames in boxes data")
-        
-        if not boxes_data:
-            return jsonify({'error': 'No boxes data found for video'}), 404
-
-        # Limit to frame range
-        if end_frame is None:
-            end_frame = len(boxes_data) - 1
-            print(f"No end_frame specified, using {end_frame}")
-            
-        if start_frame > end_frame or start_frame >= len(boxes_data):
-            print(f"Invalid frame range: start={start_frame}, end={end_frame}, total frames={len(boxes_data)}")
-            return jsonify({'error': 'Invalid frame range'}), 400
-
-        results = []
-        holding_summary = []
-        print(f"\nProcessing frames {start_frame} to {end_frame}" + (f" (skipping every {skip} frames)" if skip else ""))
-        
-        frame_count = 0
-        # Process each frame in range
-        for frame_num in range(start_frame, min(end_frame + 1, len(boxes_data))):
-            # Skip frames based on skip parameter
-            if skip > 0 and frame_count > 0 and frame_count % (skip + 1) != 0:
-                frame_count += 1
-                continue
-                
-            frame_count += 1
+    Raises:
+        LookupError: If the video or its boxes data does not exist
+        ValueError: If the frame range is invalid
+    """
+    # Get video info
+    video = get_video(video_id, include_metadata=False)
+    if not video:
+        raise LookupError('Video not found')
+    print(f"Found video: {video['filepath']}")
+
+    # Frames with boxes, from the bounding-box store
+    span = database.get_video_box_span(video_id)
+    if not span:
+        raise LookupError('No boxes data found for video')
+    last_frame = span[1]
+    print(f"Found boxes for frames {span[0]} to {last_frame}")
+
+    # Limit to frame range
+    if end_frame is None:
+        end_frame = last_frame
+        print(f"No end_frame specified, using {end_frame}")
+
+    if start_frame > end_frame or start_frame > last_frame:
+        print(f"Invalid frame range: start={start_frame}, end={end_frame}, last frame with boxes={last_frame}")
+        raise ValueError('Invalid frame range')
+
+    # Only the requested range is read; frames without boxes are empty
+    range_end = min(end_frame, last_frame)
+    frames_with_boxes = database.get_video_boxes(video_id, start_frame, range_end)
+    boxes_data = {frame_num: frames_with_boxes.get(frame_num, {}) for frame_num in range(start_frame, range_end + 1)}
+
+    results = []
+    holding_summary = []
+    print(f"\nProcessing frames {start_frame} to {end_frame}" + (f" (skipping every {skip} frames)" if skip else ""))
+
+    # Frames to process, honouring skip
+    frame_numbers = [
+        frame_num
+        for i, frame_num in enumerate(range(start_frame, range_end + 1))
+        if skip == 0 or i % (skip + 1) == 0
+    ]
+
+    # Results from earlier runs over this range; frames whose boxes are all
+    # cached don't need decoding or a network call
+    cached_results = classification_cache.range(video_id, start_frame, end_frame)
+
+    def cached_for(frame_num, bbox):
+        return cached_results.get((frame_num, bbox_key(bbox, pad_crop=5)))
+
+    def needs_decode(frame_num):
+        return any(
+            cached_for(frame_num, box_data['bbox']) is None
+            for box_data in boxes_data[frame_num].values()
+        )
+
+    decoded_frames = iter_video_frames(
+        video['filepath'],
+        [frame_num for frame_num in frame_numbers if boxes_data[frame_num] and needs_decode(frame_num)]
+    )
+
+    started = time.perf_counter()
+    counts = {'frames_decoded': 0, 'crops': 0, 'cached': 0}
+
+    def iter_crops():
+        """Decode each uncached frame once, in order, and cut every player's crop from it"""
+        for frame_num in frame_numbers:
             frame_boxes = boxes_data[frame_num]
             print(f"\nFrame {frame_num}: Found {len(frame_boxes)} boxes")
-            
+
             frame_results = {
                 'frame': frame_num,
                 'players': {}
             }
-            
-            # Process each box in frame
+            results.append(frame_results)
+
+            if not frame_boxes:
+                continue
+            frame = None
+            if needs_decode(frame_num):
+                _, ret, frame = next(decoded_frames)
+                if not ret:
+                    print(f"  ↳ Error reading frame {frame_num}")
+                    continue
+                counts['frames_decoded'] += 1
+
             for player_name, box_data in frame_boxes.items():
                 bbox = box_data['bbox']
+                cached = cached_for(frame_num, bbox)
+                if cached is not None:
+                    counts['cached'] += 1
+                    yield (frame_results, player_name, bbox), (None, cached, frame_num, bbox)
+                    continue
                 print(f"  ↳ Processing {player_name}: bbox={bbox}")
-                
                 try:
-                    # Extract frame with box
-                    frame = extract_frame_with_box(
-                        video['filepath'],
-                        frame_num,
-                        bbox[0], bbox[1], bbox[2], bbox[3],
-                        crop=True,
-                        pad_crop=5
-                    )
-                    print(f"  ↳ Successfully extracted frame")
-                    
-                    # Classify with Roboflow
-                    classification = classify_frame_with_roboflow(frame)
-                    
-                    # Find frisbee confidence
-                    frisbee_conf = next(
-                        (pred['confidence'] for pred in classification['predictions'] 
-                         if pred['class'] == 'frisbee'), 
-                        0.0
-                    )
-                    
-                    # Determine if holding based on threshold
-                    is_holding = frisbee_conf > 0.3
-                    print(f"  ↳ Frisbee confidence: {frisbee_conf:.2f}, is_holding: {is_holding}")
-                    
-                    if is_holding:
-                        holding_summary.append(f"frame {frame_num}: {player_name} is holding the frisbee ({frisbee_conf:.2f} confidence)")
-                    
-                    frame_results['players'][player_name] = {
-                        'bbox': bbox,
-                        'is_holding': is_holding,
-                        'frisbee_confidence': frisbee_conf,
-                        'classification': {
-                            'predictions': classification['predictions']
-                        }
-                    }
-                    
+                    crop = crop_to_box(frame, bbox, pad_crop=5)
                 except Exception as e:
                     print(f"  ↳ Error processing frame {frame_num}, player {player_name}: {str(e)}")
-                    print(f"  ↳ Full traceback: {traceback.format_exc()}")
                     continue
+                counts['crops'] += 1
+                yield (frame_results, player_name, bbox), (crop, None, frame_num, bbox)
 
-            results.append(frame_results)
+    def classify(item):
+        crop, cached, frame_num, bbox = item
+        if cached is not None:
+            return classification_cache.hit(cached)
+        return classification_cache.submit(crop, video_id, frame_num, bbox, pad_crop=5)
+
+    total_boxes = sum(len(boxes_data[frame_num]) for frame_num in frame_numbers)
+    progress = job.progress if job else print_progress("Classifying crops")
+
+    # Crops are classified concurrently; results come back in submission order
+    try:
+        classified = roboflow_classifier.iter_classified(iter_crops(), submit=classify)
+        for done, ((frame_results, player_name, bbox), future) in enumerate(classified):
+            progress(done, total_boxes, f"frame {frame_results['frame']}")
+            frame_num = frame_results['frame']
+            try:
+                classification = future.result()
+
+                # Find frisbee confidence
+                frisbee_conf = next(
+                    (pred['confidence'] for pred in classification['predictions'] 
+                     if pred['class'] == 'frisbee'), 
+                    0.0
+                )
+
+                # Determine if holding based on threshold
+                is_holding = frisbee_conf > 0.3
+                print(f"  ↳ Frame {frame_num}, {player_name}: frisbee confidence {frisbee_conf:.2f}, is_holding: {is_holding}")
+
+                if is_holding:
+                    holding_summary.append(f"frame {frame_num}: {player_name} is holding the frisbee ({frisbee_conf:.2f} confidence)")
+
+                frame_results['players'][player_name] = {
+                    'bbox': bbox,
+                    'is_holding': is_holding,
+                    'frisbee_confidence': frisbee_conf,
+                    'classification': {
+                        'predictions': classification['predictions']
+                    }
+                }
+
+            except Exception as e:
+                print(f"  ↳ Error processing frame {frame_num}, player {player_name}: {str(e)}")
+                print(f"  ↳ Full traceback: {traceback.format_exc()}")
+                continue
+
+    finally:
+        # Hand the capture back to the pool and write new results through
+        decoded_frames.close()
+        classification_cache.flush()
+    progress(total_boxes, total_boxes)
+    seconds = time.perf_counter() - started
+    frames_decoded, crop_count = counts['frames_decoded'], counts['crops']
+    throughput = {
+        'frames_decoded': frames_decoded,
+        'crops': crop_count,
+        'cached': counts['cached'],
+        'seconds': round(seconds, 3),
+        'frames_per_sec': round(frames_decoded / seconds, 2) if seconds > 0 else None,
+        'crops_per_sec': round(crop_count / seconds, 2) if seconds > 0 else None
+    }
+
+    print(f"\nProcessing complete: {len(results)} total results")
+    print(f"Found {len(holding_summary)} frames with players holding frisbee")
+    print(f"Throughput: {throughput['frames_per_sec']} frames/sec, {throughput['crops_per_sec']} crops/sec")
+    return {
+        'video_id': video_id,
+        'frame_range': {
+            'start': start_frame,
+            'end': end_frame,
+            'skip': skip
+        },
+        'total_processed': len(results),
+        'throughput': throughput,
+        'holding_summary': holding_summary,
+        'results': results
+    }
 
-        print(f"\nProcessing complete: {len(results)} total results")
-        print(f"Found {len(holding_summary)} frames with players holding frisbee")
-        return jsonify({
-            'video_id': video_id,
-            'frame_range': {
-                'start': start_frame,
-                'end': end_frame,
-                'skip': skip
-            },
-            'total_processed': len(results),
-            'holding_summary': holding_summary,
-            'results': results
-        }), 200
+@job_runner.register('analyze-frames')
+def analyze_frames_job(params, job):
+    return analyze_frame_range(**params, job=job)
 
+@datasets_bp.route('/analyze-frames', methods=['GET'])
+def analyze_frames():
+    try:
+        print("\n=== Starting analyze_frames ===")
+        video_id = request.args.get('video_id', type=int)
+        start_frame = request.args.get('start_frame', type=int, default=0)
+        end_frame = request.args.get('end_frame', type=int)
+        skip = request.args.get('skip', type=int, default=0)  # 0 means no skip
+        
+        print(f"Parameters: video_id={video_id}, start_frame={start_frame}, end_frame={end_frame}, skip={skip}")
+        
+        if not video_id:
+            return jsonify({'error': 'Missing video_id'}), 400
+
+        params = {'video_id': video_id, 'start_frame': start_frame, 'end_frame': end_frame, 'skip': skip}
+        if wants_async():
+            return job_accepted(job_runner.submit('analyze-frames', params))
+        return jsonify(analyze_frame_range(**params)), 200
+
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         print(f"\n=== Error in analyze_frames ===")
         print(f"Error message: {str(e)}")
         print(f"Full traceback: {traceback.format_exc()}")
-        return jsonify({'error': str(e)}), 400 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 400
+
+@datasets_bp.route('/classification-cache', methods=['GET'])
+def get_classification_cache_stats():
+    return jsonify(classification_cache.stats()), 200
+
+@datasets_bp.route('/classification-cache', methods=['DELETE'])
+def invalidate_classification_cache():
+    """
+    Drop cached classification results, e.g. after the Roboflow model version changes.
+
+    Query params:
+        model_id: only drop results from this model (e.g. classify-frisbee/3)
+        video_id: only drop results for this video
+    """
+    try:
+        model_id = request.args.get('model_id')
+        video_id = request.args.get('video_id', type=int)
+        classification_cache.flush()
+        deleted = database.delete_cached_classifications(model_id=model_id, video_id=video_id)
+        print(f"Invalidated {deleted} cached classifications (model_id={model_id}, video_id={video_id})")
+        return jsonify({'deleted': deleted, 'model_id': model_id, 'video_id': video_id}), 200
+    except Exception as e:
+        print(f"Error invalidating classification cache: {str(e)}")
+        return jsonify({'error': str(e)}), 500
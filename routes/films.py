@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 import database
+from json_patch import JsonPatchError, JsonPatchTestFailed, parse_version, patch_from_body
 
 films_bp = Blueprint('films', __name__)
 
@@ -67,15 +68,46 @@ def delete_film(film_id):
 
 @films_bp.route('/<int:film_id>/data', methods=['PUT'])
 def update_film_data(film_id):
+    """Replace the data; with a 'version' (or If-Match) only if the film is still at that version"""
     try:
         data = request.json.get('data')
         if data is None:
             return jsonify({'error': 'Data is required'}), 400
+        expected_version = parse_version(request.headers.get('If-Match') or request.json.get('version'))
             
-        success = database.update_film_data(film_id, data)
-        if not success:
+        version = database.update_film_data(film_id, data, expected_version=expected_version)
+        if not version:
             return jsonify({'error': 'Film not found'}), 404
             
-        return jsonify({'message': 'Film data updated successfully'}), 200
+        return jsonify({'message': 'Film data updated successfully', 'version': version}), 200
+    except database.VersionConflict as e:
+        return jsonify({'error': str(e), 'version': e.current_version}), 409
+    except JsonPatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@films_bp.route('/<int:film_id>/data', methods=['PATCH'])
+def patch_film_data(film_id):
+    """
+    Apply a JSON Patch (RFC 6902) to the film data server-side.
+
+    Body: a list of operations, or {'operations': [...], 'version': n}. With a
+    version (or an If-Match header) the patch only applies if the film is
+    still at that version, else 409 with the current one. A failed 'test'
+    operation is also a 409; nothing is written unless every operation applies.
+    """
+    try:
+        operations, expected_version = patch_from_body(request.get_json(silent=True), request.headers.get('If-Match'))
+        version = database.patch_film_data(film_id, operations, expected_version=expected_version)
+        if version is None:
+            return jsonify({'error': 'Film not found'}), 404
+        return jsonify({'version': version}), 200
+    except database.VersionConflict as e:
+        return jsonify({'error': str(e), 'version': e.current_version}), 409
+    except JsonPatchTestFailed as e:
+        return jsonify({'error': str(e)}), 409
+    except JsonPatchError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500 
\ No newline at end of file
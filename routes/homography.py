@@ -1,46 +1,202 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, make_response, request, jsonify
+import json
 import numpy as np
-import cv2
+import database
+from calibration_cache import calibration_cache
+from heatmaps import heatmap_engine, heatmap_json, render_png
+from field_projection import homography_matrix, project_trajectories, transform_points as project_points
 
 homography_bp = Blueprint('homography', __name__)
 
-# Destination points (overhead view)
-DST_POINTS = np.float32([
-    [0, 0],          # Top-left
-    [400, 0],        # Top-right
-    [400, 600],      # Bottom-right
-    [0, 600]         # Bottom-left
-])
+def _keyframes_json(calibration):
+    return [{
+        'frame': keyframe['frame'],
+        'matrix': keyframe['matrix'],
+        'fieldPoints': keyframe['field_points'],
+        'interpolate': keyframe['interpolate']
+    } for keyframe in (calibration.keyframes if calibration else [])]
+
+def _video_calibration(video_id):
+    """
+    The stored calibration of a video.
+
+    Raises:
+        LookupError: If the video has no calibration
+    """
+    calibration = calibration_cache.get(video_id)
+    if calibration is None:
+        raise LookupError('Video has no homography calibration; send fieldPoints or calibrate it first')
+    return calibration
 
 @homography_bp.route('/transform', methods=['POST'])
 def transform_points():
+    """
+    Project image points onto the overhead field.
+
+    JSON body:
+        points: [[x, y], ...]
+        fieldPoints: Four field corners, or
+        video_id: A calibrated video, with frame (one frame for all points) or
+            frames (one per point) picking the homography
+    """
     try:
         data = request.json
-        if not data or 'points' not in data or 'fieldPoints' not in data:
-            return jsonify({'error': 'Missing required data (points or fieldPoints)'}), 400
-
-        # Get points and field corners from request
-        points = np.array(data['points'])
-        field_points = np.array(data['fieldPoints'], dtype=np.float32)
-        
-        if len(field_points) != 4:
-            return jsonify({'error': 'Field points must contain exactly 4 corner points'}), 400
-            
-        # Calculate homography matrix using the field points
-        H = cv2.getPerspectiveTransform(field_points, DST_POINTS)
-        
-        # Reshape points to (N, 1, 2) format for cv2.perspectiveTransform
-        points_reshaped = points.reshape(-1, 1, 2).astype(np.float32)
-        
-        # Transform points
-        transformed_points = cv2.perspectiveTransform(points_reshaped, H)
-        
-        # Convert back to regular array format
-        transformed_points = transformed_points.reshape(-1, 2).tolist()
+        if not data or 'points' not in data or ('fieldPoints' not in data and 'video_id' not in data):
+            return jsonify({'error': 'Missing required data (points, and fieldPoints or video_id)'}), 400
+
+        if 'fieldPoints' in data:
+            if len(data['fieldPoints']) != 4:
+                return jsonify({'error': 'Field points must contain exactly 4 corner points'}), 400
+            # Homography for these field corners, solved once and cached
+            transformed_points = project_points(data['points'], homography_matrix(data['fieldPoints']))
+        else:
+            calibration = _video_calibration(int(data['video_id']))
+            points = np.asarray(data['points'], dtype=np.float64).reshape(-1, 2)
+            frames = data.get('frames', [data.get('frame', 0)] * len(points))
+            if len(frames) != len(points):
+                return jsonify({'error': 'frames must have one entry per point'}), 400
+            transformed_points = calibration.project(frames, points)
 
         return jsonify({
-            'transformed_points': transformed_points
+            'transformed_points': transformed_points.tolist()
         }), 200
 
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@homography_bp.route('/videos/<int:video_id>/calibration', methods=['GET'])
+def get_calibration(video_id):
+    try:
+        if not database.get_video(video_id, include_metadata=False):
+            return jsonify({'error': 'Video not found'}), 404
+        return jsonify({'video_id': video_id, 'keyframes': _keyframes_json(calibration_cache.get(video_id))}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@homography_bp.route('/videos/<int:video_id>/calibration', methods=['PUT'])
+def set_calibration(video_id):
+    """
+    Store a video's calibration, replacing any earlier one.
+
+    JSON body: {keyframes: [{frame, fieldPoints | matrix, interpolate}, ...]}, or
+    {fieldPoints} / {matrix} for a static calibration
+    """
+    try:
+        data = request.json or {}
+        keyframes = data.get('keyframes')
+        if keyframes is None:
+            keyframes = [{'frame': 0, 'fieldPoints': data.get('fieldPoints'), 'matrix': data.get('matrix')}]
+        calibration = calibration_cache.set(video_id, keyframes)
+        if calibration is None:
+            return jsonify({'error': 'Video not found'}), 404
+        print(f"📐 Calibrated video {video_id} with {len(calibration.keyframes)} keyframe(s)")
+        return jsonify({'video_id': video_id, 'keyframes': _keyframes_json(calibration)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error saving calibration: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@homography_bp.route('/videos/<int:video_id>/calibration', methods=['DELETE'])
+def delete_calibration(video_id):
+    try:
+        if not calibration_cache.delete(video_id):
+            return jsonify({'error': 'Video not found'}), 404
+        return jsonify({'message': 'Calibration deleted'}), 200
     except Exception as e:
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@homography_bp.route('/videos/<int:video_id>/trajectories', methods=['POST'])
+def video_trajectories(video_id):
+    """
+    Overhead trajectories of every player over a frame range.
+
+    Boxes are read from the bounding-box store and projected by their
+    bottom-centre in one call. The response is NDJSON, one line per player:
+    {"player": name, "frames": [...], "points": [[x, y], ...]}.
+
+    JSON body:
+        fieldPoints: Optional four [x, y] field corners in video pixels;
+            without them the video's stored calibration is used
+        start_frame, end_frame: Optional inclusive frame range
+        players: Optional list of player names
+    """
+    try:
+        data = request.json or {}
+        players = set(data['players']) if data.get('players') else None
+
+        if not database.get_video(video_id, include_metadata=False):
+            return jsonify({'error': 'Video not found'}), 404
+        H = homography_matrix(data['fieldPoints']) if 'fieldPoints' in data else _video_calibration(video_id)
+        boxes = database.get_video_boxes(video_id, data.get('start_frame'), data.get('end_frame'))
+        trajectories = list(project_trajectories(boxes, H, players))
+        print(f"📐 Projecting {sum(len(frame_boxes) for frame_boxes in boxes.values())} boxes over {len(boxes)} frames for video {video_id}")
+
+        def generate():
+            for player_name, frames, points in trajectories:
+                yield json.dumps({
+                    'player': player_name,
+                    'frames': frames.tolist(),
+                    'points': points.astype(float).round(2).tolist()
+                }) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error projecting trajectories: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@homography_bp.route('/heatmap', methods=['GET'])
+def heatmap():
+    """
+    Overhead position heatmap across one or more calibrated videos.
+
+    Query params:
+        video_ids: Comma-separated video ids
+        players: Optional comma-separated player names
+        start_frame, end_frame: Optional frame range, applied to every video
+        bins_x, bins_y: Grid size (default 40 x 60)
+        by_player: 1 to also return a grid per player (JSON only)
+        format: json (default) or png
+    """
+    try:
+        video_ids = [int(video_id) for video_id in request.args.get('video_ids', '').split(',') if video_id.strip()]
+        players = [player.strip() for player in request.args.get('players', '').split(',') if player.strip()]
+        output_format = request.args.get('format', 'json').lower()
+        if output_format not in ('json', 'png'):
+            return jsonify({'error': f'Unsupported format: {output_format}'}), 400
+
+        result = heatmap_engine.heatmap(
+            video_ids,
+            bins_x=request.args.get('bins_x', type=int, default=40),
+            bins_y=request.args.get('bins_y', type=int, default=60),
+            players=players or None,
+            start_frame=request.args.get('start_frame', type=int),
+            end_frame=request.args.get('end_frame', type=int),
+            by_player=output_format == 'json' and request.args.get('by_player') in ('1', 'true')
+        )
+
+        if output_format == 'png':
+            response = make_response(render_png(result['counts']))
+            response.headers['Content-Type'] = 'image/png'
+            response.headers['X-Heatmap-Total'] = str(result['total'])
+            return response
+        return jsonify(heatmap_json(result)), 200
+
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error building heatmap: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@homography_bp.route('/heatmap/cache', methods=['GET'])
+def heatmap_cache_stats():
+    return jsonify(heatmap_engine.stats()), 200
@@ -0,0 +1,69 @@
+from flask import Blueprint, request, jsonify
+import database
+from jobs import job_runner
+
+jobs_bp = Blueprint('jobs', __name__)
+
+def wants_async():
+    """Whether the caller asked for a background job (?async=true, or "async": true in a JSON body)"""
+    value = request.args.get('async')
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get('async')
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def job_accepted(job_id):
+    """202 response for a queued job, shared by routes with an async=true mode"""
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f"/api/jobs/{job_id}"
+    }), 202
+
+@jobs_bp.route('', methods=['POST'])
+def submit_job():
+    try:
+        data = request.json or {}
+        kind = data.get('kind')
+        if not kind:
+            return jsonify({'error': 'Missing job kind', 'kinds': job_runner.kinds}), 400
+        job_id = job_runner.submit(kind, data.get('params', {}))
+        return job_accepted(job_id)
+    except ValueError as e:
+        return jsonify({'error': str(e), 'kinds': job_runner.kinds}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('', methods=['GET'])
+def list_jobs():
+    try:
+        jobs = database.list_jobs(
+            status=request.args.get('status'),
+            kind=request.args.get('kind'),
+            limit=request.args.get('limit', type=int, default=50)
+        )
+        return jsonify({'jobs': jobs, 'runner': job_runner.stats()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    try:
+        include_result = request.args.get('result', 'true').lower() != 'false'
+        job = database.get_job(job_id, include_result=include_result)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    try:
+        job = database.get_job(job_id, include_result=False)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        if not job_runner.cancel(job_id):
+            return jsonify({'error': f"Job already {job['status']}"}), 409
+        return jsonify({'message': 'Cancellation requested', 'job_id': job_id}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,26 +1,40 @@
 import os
 import json
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify, make_response, send_file
 from datetime import datetime
 import database
 from b2 import b2_api, bucket, check_file_exists_in_b2, sam_bucket
 from database import add_video, get_video, get_tables, get_table_data, execute_query, update_video_metadata, commit_query
 import cv2
-import base64
 import numpy as np
-from io import BytesIO
-from PIL import Image
 import requests
 import urllib.parse
 import ell
 import traceback
-from tqdm import tqdm
-from inference_sdk import InferenceHTTPClient
+from boxes_cache import boxes_cache, get_boxes_data, get_boxes_index
+from video_capture_pool import capture_pool, video_source
+from video_mirror import video_mirror
+from video_proxies import proxy_store
+from frame_encoding import encode_frame, encode_frame_base64, encode_options, encode_stats
+from json_patch import JsonPatchError, JsonPatchTestFailed, parse_version, patch_from_body
+from frame_batches import (
+    CONTACT_SHEET_TILE_WIDTH, OUTPUTS as BATCH_OUTPUTS, contact_sheet, draw_box, pack_multipart, pack_zip,
+    parse_items, render_items
+)
+from seek_planner import seek_planner
+from frame_cache import frame_cache, read_video_frame, FRAME_CACHE_READ_AHEAD
+from roboflow_classifier import roboflow_classifier
+from classification_cache import classification_cache
+from trajectories import collect_frames_for_batch, pair_catches_with_throws
+from crop_extraction import crop_to_box, extract_crops
+from jobs import job_runner, print_progress
+from routes.jobs import job_accepted, wants_async
 
 videos_bp = Blueprint('videos', __name__)
 
-# Initialize ell with storage for versioning
-ell.init(store='./logdir', autocommit=True)
+def init_ell():
+    """Initialize ell with storage for versioning; called once at app startup"""
+    ell.init(store='./logdir', autocommit=True)
 
 @ell.simple(model="gpt-4o", temperature=0.75)
 def analyze_play(dictation: str, notes: str, frame: int):
@@ -32,12 +46,31 @@ Only return the JSON objects, no other text.
 Do not start it with ```json or ``` or anything like that. If you do the world will explode.
 """
 
+VIDEO_LIST_MAX_LIMIT = 1000
+
 @videos_bp.route('/', methods=['GET'])
 def get_videos():
+    """
+    List videos without their metadata (fetch /api/videos/<id> for that).
+
+    Query params:
+        fields: Comma-separated columns and summaries, see database.VIDEO_LIST_FIELDS
+        limit: Page size (default 100, at most VIDEO_LIST_MAX_LIMIT)
+        after_id: Return videos after this id; the next page's value is in
+            the X-Next-After-Id header, which is absent on the last page
+    """
     try:
-        data, columns = get_table_data('videos')
-        videos = [dict(zip(columns, row)) for row in data]
-        return jsonify(videos), 200
+        fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+        limit = min(max(1, request.args.get('limit', type=int, default=100)), VIDEO_LIST_MAX_LIMIT)
+        after_id = request.args.get('after_id', type=int)
+
+        videos, next_after_id = database.list_videos(fields or None, limit=limit, after_id=after_id)
+        response = jsonify(videos)
+        if next_after_id is not None:
+            response.headers['X-Next-After-Id'] = str(next_after_id)
+        return response, 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -69,39 +102,52 @@ def add_new_video():
             filepath=filepath,
             metadata=metadata
         )
+
+        # Build the preview proxy and thumbnails in the background
+        proxy_job_id = job_runner.submit('video-proxies', {'video_id': video_id})
         
         return jsonify({
             'message': 'Video added successfully',
             'video_id': video_id,
             'title': data['title'],
-            'url': filepath
+            'url': filepath,
+            'proxy_job_id': proxy_job_id
         }), 201
     except Exception as e:
         print(f"Error adding video: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@videos_bp.route('/export-dataset', methods=['POST'])
-def export_dataset():
-    try:
-        data = request.json
-        video_id = data['videoId']
-        boxes = data['boxes']
-        
-        # Create dataset directory if it doesn't exist
-        dataset_dir = 'player_crops'
-        os.makedirs(dataset_dir, exist_ok=True)
-        
-        # Get video path
-        video = get_video(video_id)
-        if not video:
-            return jsonify({'error': 'Video not found'}), 404
-            
-        # Open video
-        cap = cv2.VideoCapture(video.get('filepath'))
+def export_dataset_crops(video_id, boxes, job=None):
+    """
+    Save the tagged boxes of a video as crops plus a CSV index in player_crops/.
+
+    Args:
+        video_id: Video ID
+        boxes: List of {'frame', 'x', 'y', 'width', 'height', 'tag'} dicts
+        job: JobContext when running as a background job
+
+    Raises:
+        LookupError: If the video does not exist
+    """
+    # Create dataset directory if it doesn't exist
+    dataset_dir = 'player_crops'
+    os.makedirs(dataset_dir, exist_ok=True)
+    
+    # Get video path
+    video = get_video(video_id)
+    if not video:
+        raise LookupError('Video not found')
         
-        # Process each box
-        processed_images = []
-        for box in boxes:
+    # Open video
+    cap = cv2.VideoCapture(video_source(video.get('filepath')))
+    progress = job.progress if job else print_progress("Exporting dataset")
+    
+    # Process each box
+    processed_images = []
+    try:
+        for done, box in enumerate(boxes):
+            progress(done, len(boxes), f"frame {box['frame']}")
+
             # Seek to frame
             cap.set(cv2.CAP_PROP_POS_FRAMES, box['frame'])
             ret, frame = cap.read()
@@ -124,29 +170,132 @@ def export_dataset():
                 'tag': tag,
                 'frame': box['frame']
             })
-            
-        # Create CSV
-        csv_rows = ['filename,tag,frame']
-        for img in processed_images:
-            csv_rows.append(f"{img['filename']},{img['tag']},{img['frame']}")
-            
-        csv_path = os.path.join(dataset_dir, f'dataset_{video_id}.csv')
-        with open(csv_path, 'w') as f:
-            f.write('\n'.join(csv_rows))
-            
+    finally:
         cap.release()
         
-        return jsonify({
-            'message': 'Dataset exported successfully',
-            'total_images': len(processed_images),
-            'csv_path': csv_path
-        }), 200
+    # Create CSV
+    csv_rows = ['filename,tag,frame']
+    for img in processed_images:
+        csv_rows.append(f"{img['filename']},{img['tag']},{img['frame']}")
         
+    csv_path = os.path.join(dataset_dir, f'dataset_{video_id}.csv')
+    with open(csv_path, 'w') as f:
+        f.write('\n'.join(csv_rows))
+    progress(len(boxes), len(boxes))
+    
+    return {
+        'message': 'Dataset exported successfully',
+        'total_images': len(processed_images),
+        'csv_path': csv_path
+    }
+
+@job_runner.register('export-dataset')
+def export_dataset_job(params, job):
+    return export_dataset_crops(params['video_id'], params['boxes'], job=job)
+
+@videos_bp.route('/export-dataset', methods=['POST'])
+def export_dataset():
+    try:
+        data = request.json
+        video_id = data['videoId']
+        boxes = data['boxes']
+
+        if wants_async():
+            return job_accepted(job_runner.submit('export-dataset', {'video_id': video_id, 'boxes': boxes}))
+        return jsonify(export_dataset_crops(video_id, boxes)), 200
+        
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         print(f"Error exporting dataset: {str(e)}")
         print(f"Full traceback: {traceback.format_exc()}")
         return jsonify({'error': str(e)}), 400
 
+def build_video_proxies(video_id, job=None):
+    """
+    Build the proxy and sprite sheets of a video.
+
+    Raises:
+        LookupError: If the video does not exist
+    """
+    video = get_video(video_id)
+    if not video:
+        raise LookupError('Video not found')
+    progress = job.progress if job else print_progress("Building proxies")
+    manifest = proxy_store.build(video['filepath'], progress=progress)
+    return {'video_id': video_id, **manifest}
+
+@job_runner.register('video-proxies')
+def video_proxies_job(params, job):
+    return build_video_proxies(params['video_id'], job=job)
+
+@videos_bp.route('/<int:video_id>/proxies', methods=['POST'])
+def generate_video_proxies(video_id):
+    try:
+        if wants_async():
+            return job_accepted(job_runner.submit('video-proxies', {'video_id': video_id}))
+        return jsonify(build_video_proxies(video_id)), 200
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        print(f"Error building proxies: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@videos_bp.route('/<int:video_id>/proxies', methods=['GET'])
+def get_video_proxies(video_id):
+    video = get_video(video_id)
+    if not video:
+        return jsonify({'error': 'Video not found'}), 404
+    manifest = proxy_store.manifest(video['filepath'])
+    if not manifest:
+        return jsonify({'error': 'Proxies have not been built'}), 404
+    return jsonify(manifest), 200
+
+@videos_bp.route('/<int:video_id>/proxy', methods=['GET'])
+def get_video_proxy(video_id):
+    """The proxy video itself, for scrubbing in the browser"""
+    video = get_video(video_id)
+    if not video:
+        return jsonify({'error': 'Video not found'}), 404
+    proxy_path = proxy_store.proxy_path(video['filepath'])
+    if not proxy_path:
+        return jsonify({'error': 'Proxies have not been built'}), 404
+    return send_file(os.path.abspath(proxy_path), conditional=True)
+
+@videos_bp.route('/<int:video_id>/sprites/<int:sheet>', methods=['GET'])
+def get_video_sprite_sheet(video_id, sheet):
+    video = get_video(video_id)
+    if not video:
+        return jsonify({'error': 'Video not found'}), 404
+    sprite_path = proxy_store.sprite_path(video['filepath'], sheet)
+    if not sprite_path:
+        return jsonify({'error': 'Sprite sheet not found'}), 404
+    response = send_file(os.path.abspath(sprite_path), mimetype='image/jpeg', conditional=True)
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+@videos_bp.route('/<int:video_id>/thumbnail', methods=['GET'])
+def get_video_thumbnail(video_id):
+    """The sprite thumbnail at or before ?frame=, without touching the source video"""
+    try:
+        frame_number = request.args.get('frame', type=int, default=0)
+        video = get_video(video_id)
+        if not video:
+            return jsonify({'error': 'Video not found'}), 404
+
+        thumbnail = proxy_store.thumbnail(video['filepath'], frame_number)
+        if thumbnail is None:
+            return jsonify({'error': 'Proxies have not been built'}), 404
+        thumbnail_frame, image = thumbnail
+
+        encoded = encode_frame(image, route='thumbnail', **encode_options(request.args))
+        response = make_response(encoded.data)
+        response.headers['Content-Type'] = encoded.mimetype
+        response.headers['X-Thumbnail-Frame'] = str(thumbnail_frame)
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
 @videos_bp.route('/with-tags', methods=['GET'])
 def get_videos_with_tags():
     try:
@@ -155,24 +304,18 @@ def get_videos_with_tags():
         FROM videos v
         """
         data, columns = execute_query(query)
+        # Tags come from video_tags; the metadata blobs are passed through unparsed
+        tags_by_video = database.get_tags_by_video()
         videos = []
         for row in data:
             video_dict = dict(zip(columns, row))
-            # Extract tags from metadata if it exists
-            tags = []
-            if video_dict['metadata']:
-                try:
-                    metadata = json.loads(video_dict['metadata'])
-                    tags = metadata.get('tags', [])
-                except json.JSONDecodeError:
-                    tags = []
-            video_dict['tags'] = tags
+            video_dict['tags'] = tags_by_video.get(video_dict['id'], [])
             videos.append(video_dict)
         return jsonify(videos), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def extract_frame_with_box(video_filepath, frame_number, x, y, w, h, crop=False, pad_crop=0, make_dataset=False, player_name='unknown', video_id=None):
+def extract_frame_with_box(video_filepath, frame_number, x, y, w, h, crop=False, pad_crop=0, make_dataset=False, player_name='unknown', video_id=None, quality='full'):
     """
     Extract a frame from a video with optional box drawing and cropping.
     
@@ -185,6 +328,9 @@ def extract_frame_with_box(video_filepath, frame_number, x, y, w, h, crop=False,
         make_dataset: Whether to save the frame to dataset
         player_name: Name of player for dataset saving
         video_id: Video ID for dataset saving
+        quality: 'proxy' reads the frame from the low-resolution proxy when one
+            has been built (the box is scaled to match); dataset crops always
+            use the full-resolution frame
     
     Returns:
         numpy array: The processed frame
@@ -192,10 +338,14 @@ def extract_frame_with_box(video_filepath, frame_number, x, y, w, h, crop=False,
     try:
         print(f"Getting frame {frame_number} with box [{x}, {y}, {w}, {h}], crop={crop}, pad={pad_crop}, make_dataset={make_dataset}")
 
-        cap = cv2.VideoCapture(urllib.parse.quote(video_filepath, safe=':/?='))
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-        ret, frame = cap.read()
-        cap.release()
+        proxy = proxy_store.read_frame(video_filepath, frame_number) if quality == 'proxy' and not make_dataset else None
+        if proxy and proxy[0]:
+            ret, frame, scale = proxy
+            x, y, w, h = x * scale, y * scale, w * scale, h * scale
+            pad_crop = int(round(pad_crop * scale))
+        else:
+            # Decoded frames are shared through the frame cache, so treat them as read-only
+            ret, frame = read_video_frame(video_filepath, frame_number, read_ahead=FRAME_CACHE_READ_AHEAD)
 
         if not ret:
             raise Exception('Could not read frame')
@@ -208,17 +358,9 @@ def extract_frame_with_box(video_filepath, frame_number, x, y, w, h, crop=False,
         
         print(f"Drawing box at: pos=({x_px},{y_px}), size=({w_px},{h_px})")
 
-        height, width = frame.shape[:2]
-
         if crop:
-            # Calculate padded coordinates with bounds checking
-            x1 = max(0, x_px - pad_crop)
-            y1 = max(0, y_px - pad_crop)
-            x2 = min(width, x_px + w_px + pad_crop)
-            y2 = min(height, y_px + h_px + pad_crop)
-            
             # Extract the padded region
-            cropped_frame = frame[y1:y2, x1:x2]
+            cropped_frame = crop_to_box(frame, [x_px, y_px, w_px, h_px], pad_crop)
             
             if make_dataset and video_id is not None:
                 # Create dataset directory if it doesn't exist
@@ -234,11 +376,7 @@ def extract_frame_with_box(video_filepath, frame_number, x, y, w, h, crop=False,
             frame = cropped_frame
         else:
             # Draw rectangle on full frame
-            color = (0, 255, 0)  # Green in BGR
-            thickness = 2
-            start_point = (x_px, y_px)
-            end_point = (x_px + w_px, y_px + h_px)
-            frame = cv2.rectangle(frame, start_point, end_point, color, thickness)
+            frame = draw_box(frame, [x_px, y_px, w_px, h_px])
 
         return frame
 
@@ -260,6 +398,8 @@ def get_frame_with_box(video_id):
         make_dataset = request.args.get('make_dataset', type=bool, default=False)
         name_prefix = request.args.get('name_prefix', default='')
         player_name = request.args.get('player_name', default='unknown')
+        quality = request.args.get('quality', default='full')
+        options = encode_options(request.args)
         
         if frame_number is None or any(v is None for v in [x, y, w, h]):
             return jsonify({'error': 'Missing required parameters: frame, x, y, w, h'}), 400
@@ -279,13 +419,13 @@ def get_frame_with_box(video_id):
             pad_crop=pad_crop,
             make_dataset=make_dataset,
             player_name=full_player_name,
-            video_id=video_id
+            video_id=video_id,
+            quality=quality
         )
 
-        # Convert to JPEG
-        _, buffer = cv2.imencode('.jpg', frame)
-        response = make_response(buffer.tobytes())
-        response.headers['Content-Type'] = 'image/jpeg'
+        encoded = encode_frame(frame, route='frame-with-box', **options)
+        response = make_response(encoded.data)
+        response.headers['Content-Type'] = encoded.mimetype
         
         return response
 
@@ -294,299 +434,317 @@ def get_frame_with_box(video_id):
         print(f"Full traceback: {traceback.format_exc()}")
         return jsonify({'error': str(e)}), 400
 
-def collect_frames_for_batch(boxes_data, frame_range, player_name, catch_throw_ranges=None, skip=0, name_prefix='', is_throw_sequence=True):
+@videos_bp.route('/<int:video_id>/frames-with-boxes', methods=['POST'])
+def get_frames_with_boxes(video_id):
     """
-    Collect frames for batch processing.
-    
-    Args:
-        boxes_data: Dictionary of frame boxes
-        frame_range: Tuple of (start_frame, end_frame)
-        player_name: Name of player to track
-        catch_throw_ranges: List of catch/throw ranges for checking exclusions
-        skip: Number of frames to skip
-        name_prefix: Prefix for player name in output
-        is_throw_sequence: If True, this is a throw sequence. If False, it's outside throw sequences
-    
-    Returns:
-        List of tuples (frame_number, player_name, bbox)
-    """
-    frame_data = []
-    frame_count = 0
-    start_frame, end_frame = frame_range
-    
-    for frame in range(start_frame, end_frame + 1):
-        # Apply skip logic
-        if skip > 0 and frame_count > 0 and frame_count % (skip + 1) != 0:
-            frame_count += 1
-            continue
-            
-        if frame < len(boxes_data):
-            frame_boxes = boxes_data[frame]
-            
-            if is_throw_sequence:
-                # For throw sequences, only get the specific player
-                if player_name in frame_boxes:
-                    box_data = frame_boxes[player_name]
-                    suffix = '' if is_throw_sequence else '_non_throw'
-                    frame_data.append((
-                        frame,
-                        f"{name_prefix}{player_name}{suffix}",
-                        box_data['bbox']
-                    ))
-            else:
-                # For non-throw sequences, get all players not in sequences
-                for p_name, box_data in frame_boxes.items():
-                    # Check if this player is in a catch/throw sequence
-                    is_in_sequence = False
-                    if catch_throw_ranges:
-                        is_in_sequence = any(
-                            r['player'] == p_name and 
-                            r['range'][0] <= frame <= r['range'][1] 
-                            for r in catch_throw_ranges
-                        )
-                    
-                    if not is_in_sequence:
-                        suffix = '' if is_throw_sequence else '_non_throw'
-                        frame_data.append((
-                            frame,
-                            f"{name_prefix}{p_name}{suffix}",
-                            box_data['bbox']
-                        ))
-        
-        frame_count += 1
-    
-    return frame_data
+    Batch version of frame-with-box: render many (frame, bbox, crop, pad_crop)
+    items of one video in one response, decoding each distinct frame once.
 
-@videos_bp.route('/<int:video_id>/player-trajectories', methods=['GET'])
-def get_player_trajectories(video_id):
-    print(f"Getting player trajectories for video {video_id}")
+    Body: items, output ('zip' default, 'multipart' or 'contact-sheet'),
+    quality ('full' or 'proxy'), columns and tile_width for contact sheets,
+    plus the format / image_quality / max_width encode options.
+    """
     try:
-        print(f"\n=== Getting trajectories for video {video_id} ===")
-        start_frame = request.args.get('start_frame', type=int, default=0)
-        make_dataset = request.args.get('make_dataset', type=bool, default=False)
-        skip = request.args.get('skip', type=int, default=0)
-        invert = request.args.get('invert', type=bool, default=False)
-        name_prefix = request.args.get('name_prefix', default='')
+        data = request.json or {}
+        items = parse_items(data.get('items'))
+        output = data.get('output', 'zip')
+        if output not in BATCH_OUTPUTS:
+            return jsonify({'error': f"output must be one of {', '.join(BATCH_OUTPUTS)}"}), 400
+        options = encode_options(data)
 
         video = get_video(video_id)
         if not video:
             return jsonify({'error': 'Video not found'}), 404
 
-        video_metadata = video.get('metadata')
-        tags = video_metadata.get('tags', [])
-        print(f"Found {len(tags)} total tags")
+        source, scale = video['filepath'], 1
+        if data.get('quality') == 'proxy':
+            manifest = proxy_store.manifest(video['filepath'])
+            if manifest:
+                source = proxy_store.proxy_path(video['filepath'])
+                scale = manifest['proxy']['width'] / manifest['width']
+
+        images = render_items(source, items, scale)
+        missing = sum(1 for image in images if image is None)
+
+        if output == 'contact-sheet':
+            sheet, layout = contact_sheet(
+                images,
+                columns=data.get('columns'),
+                tile_width=int(data.get('tile_width', CONTACT_SHEET_TILE_WIDTH))
+            )
+            encoded = encode_frame(sheet, route='frames-with-boxes', **options)
+            body, mimetype = encoded.data, encoded.mimetype
+        elif output == 'multipart':
+            body, mimetype = pack_multipart(items, images, **options)
+        else:
+            body, mimetype = pack_zip(items, images, **options)
+
+        response = make_response(body)
+        response.headers['Content-Type'] = mimetype
+        response.headers['X-Frames-Decoded'] = str(len({item['frame'] for item in items}))
+        response.headers['X-Items-Missing'] = str(missing)
+        if output == 'contact-sheet':
+            response.headers['X-Contact-Sheet-Layout'] = json.dumps(layout)
+        return response
 
-        # Find max frame from tags
-        max_frame = max((tag.get('frame', 0) for tag in tags), default=0)
-        end_frame = request.args.get('end_frame', type=int, default=max_frame)
-        
-        print(f"Frame range: {start_frame} to {end_frame} (max tag frame: {max_frame}), make_dataset={make_dataset}, skip={skip}, invert={invert}, name_prefix={name_prefix}")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in frames-with-boxes route: {str(e)}")
+        print(f"Full traceback: {traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
+def build_player_trajectories(video_id, start_frame=0, end_frame=None, make_dataset=False, skip=0, invert=False, name_prefix='', workers=None, job=None):
+    """
+    Catch->throw trajectories for a video, or with invert=True the boxes outside them.
+
+    Args:
+        video_id: Video ID
+        start_frame, end_frame: Frame range; end_frame defaults to the last tagged frame
+        make_dataset: Also save player crops to the dataset directory
+        skip: Number of frames to skip between samples
+        invert: Collect boxes outside (buffered) catch/throw sequences instead
+        name_prefix: Prefix for player names in the output
+        workers: Worker processes for dataset crop extraction (default CROP_WORKERS)
+        job: JobContext when running as a background job
+
+    Returns:
+        dict with 'trajectories' (or 'frame_data' when inverted) and 'frame_range'
+
+    Raises:
+        LookupError: If the video or its boxes data does not exist
+    """
+    print(f"\n=== Getting trajectories for video {video_id} ===")
+    video = get_video(video_id, include_metadata=False)
+    if not video:
+        raise LookupError('Video not found')
+
+    tags = database.get_video_tags(video_id)
+    print(f"Found {len(tags)} total tags")
+
+    # Find max frame from tags
+    max_frame = max((tag.get('frame', 0) for tag in tags), default=0)
+    if end_frame is None:
+        end_frame = max_frame
 
-        # Filter tags by frame range
+    print(f"Frame range: {start_frame} to {end_frame} (max tag frame: {max_frame}), make_dataset={make_dataset}, skip={skip}, invert={invert}, name_prefix={name_prefix}")
+
+    # Pair catches with throws; the whole-game pairing comes from the
+    # possession index, a sub-range is paired over its own tags
+    if start_frame > 0 or end_frame < max_frame:
         if start_frame > 0:
             tags = [tag for tag in tags if tag.get('frame', 0) >= start_frame]
         if end_frame < max_frame:
             tags = [tag for tag in tags if tag.get('frame', 0) <= end_frame]
         print(f"After frame range filter: {len(tags)} tags")
+        sequences = pair_catches_with_throws(tags)
+    else:
+        sequences = database.get_possession_sequences(video_id, tags)
+    print(f"Found {len(sequences)} catch/throw sequences")
+
+    boxes_data = get_boxes_data(video['filepath'])
+    if boxes_data is None:
+        raise LookupError('No boxes data found for this video')
+    print(f"Loaded boxes data: {len(boxes_data)} frames")
+
+    # If inverting, first collect all catch/throw ranges with buffer
+    catch_throw_ranges = []
+    if invert:
+        buffer_frames = 30  # frames to skip before/after catch/throw
+        print("\n=== Collecting catch/throw ranges with buffer ===")
+        for sequence in sequences:
+            buffered_start = max(0, sequence['catch_frame'] - buffer_frames)
+            buffered_end = sequence['throw_frame'] + buffer_frames
+            print(f"  ↳ Adding buffered range: {buffered_start} to {buffered_end} for {sequence['player']}")
+            catch_throw_ranges.append({
+                'player': sequence['player'],
+                'range': (buffered_start, buffered_end)
+            })
 
-        video_filename = video['filepath'].split('/')[-1]
-        base_filename = video_filename.replace('.mp4', '')
-        boxes_filename = f"{base_filename}.boxes.json"
-        print(f"Looking for boxes file: {boxes_filename}")
+    trajectories = []
+    if invert:
+        # Process frames outside catch/throw ranges
+        all_frames = set(range(start_frame or 0, (end_frame or len(boxes_data))))
+        print(f"\n=== Processing inverted frames ===")
+        print(f"Total frames: {len(all_frames)}")
+
+
+        frame_data = collect_frames_for_batch(
+            boxes_data,
+            (min(all_frames), max(all_frames)),
+            None,  # No specific player for inverted mode
+            catch_throw_ranges=catch_throw_ranges,  # Pass the ranges
+            skip=skip,
+            name_prefix=name_prefix,
+            is_throw_sequence=False
+        )
 
-        if not check_file_exists_in_b2(boxes_filename, sam_bucket)[0]:
-            return jsonify({'error': 'No boxes data found for this video'}), 404
+        if make_dataset:
+            if frame_data:
+                batch_extract_frames(
+                    video['filepath'],
+                    frame_data,
+                    pad_crop=5,
+                    video_id=video_id,
+                    progress=job.progress if job else None,
+                    workers=workers
+                )
+
+        # For inverted mode, we don't return trajectory data
+        return {
+            'message': f'Processed {len(all_frames)} frames outside catch/throw sequences',
+            'frame_data': frame_data,
+            'frame_range': {
+                'start': start_frame,
+                'end': end_frame
+            }
+        }
+    else:
+        # Catch/throw trajectory processing
+        for sequence_number, sequence in enumerate(sequences):
+            if job:
+                job.progress(sequence_number, len(sequences), f"sequence {sequence_number + 1} of {len(sequences)}")
+            player_name = sequence['player']
+            catch_frame = sequence['catch_frame']
+            throw_frame = sequence['throw_frame']
+            print(f"\nFound catch by {player_name} at frame {catch_frame}, throw at frame {throw_frame}")
+
+            # Limit to 15 frames after catch
+            throw_frame = min(throw_frame, catch_frame + 15)
+            print(f"  ↳ Limited to frame {throw_frame} (15 frames after catch)")
+
+            # Skip if throw is outside requested range
+            if end_frame is not None and throw_frame > end_frame:
+                print(f"  ↳ Skipping: throw frame {throw_frame} > end frame {end_frame}")
+                continue
 
-        downloaded_file = sam_bucket.download_file_by_name(boxes_filename)
-        file_data = BytesIO()
-        downloaded_file.save(file_data)
-        file_data.seek(0)
-        boxes_data = json.loads(file_data.read().decode('utf-8'))
-        print(f"Loaded boxes data: {len(boxes_data)} frames")
-
-        # If inverting, first collect all catch/throw ranges with buffer
-        catch_throw_ranges = []
-        if invert:
-            buffer_frames = 30  # frames to skip before/after catch/throw
-            print("\n=== Collecting catch/throw ranges with buffer ===")
-            for i, tag in enumerate(tags):
-                tag_name = tag.get('name', '')
-                if 'catch' in tag_name.lower():
-                    player_name = tag_name.split(' catch')[0].strip()
-                    catch_frame = tag.get('frame')
-                    print(f"\nFound catch by {player_name} at frame {catch_frame}")
-                    
-                    # Look for next throw by same player
-                    for next_tag in tags[i+1:]:
-                        next_tag_name = next_tag.get('name', '')
-                        if ('throw' in next_tag_name.lower() and 
-                            next_tag_name.startswith(player_name)):
-                            throw_frame = next_tag.get('frame')
-                            # Add buffer to range
-                            buffered_start = max(0, catch_frame - buffer_frames)
-                            buffered_end = throw_frame + buffer_frames
-                            print(f"  ↳ Found throw at frame {throw_frame}")
-                            print(f"  ↳ Adding buffered range: {buffered_start} to {buffered_end} for {player_name}")
-                            catch_throw_ranges.append({
-                                'player': player_name,
-                                'range': (buffered_start, buffered_end)
-                            })
-                            break
-
-        trajectories = []
-        if invert:
-            # Process frames outside catch/throw ranges
-            all_frames = set(range(start_frame or 0, (end_frame or len(boxes_data))))
-            print(f"\n=== Processing inverted frames ===")
-            print(f"Total frames: {len(all_frames)}")
-            
+            player_boxes = []
+            frame_count = 0  # Counter for skip logic
+            for frame in range(catch_frame, throw_frame + 1):
+                # Skip frames based on skip parameter
+                if skip > 0 and frame_count > 0 and frame_count % (skip + 1) != 0:
+                    frame_count += 1
+                    continue
+
+                if frame < len(boxes_data):
+                    frame_boxes = boxes_data[frame]
+                    print(f"  ↳ Frame {frame} has {len(frame_boxes)} boxes")
+                    print(f"  ↳ Boxes: {frame_boxes}")
+
+                    if player_name in frame_boxes:
+                        box_data = frame_boxes[player_name]
+                        print(f"  ↳ Found box for {player_name}: {box_data}")
+                        bbox = box_data['bbox']
+
+                        # Create dataset image if requested
+                        if make_dataset:
+                            try:
+                                extract_frame_with_box(
+                                    video['filepath'],
+                                    frame,
+                                    bbox[0], bbox[1], bbox[2], bbox[3],
+                                    crop=True,
+                                    pad_crop=5,
+                                    make_dataset=True,
+                                    player_name=f"{name_prefix}{player_name}",
+                                    video_id=video_id
+                                )
+                                print(f"  ↳ Created dataset image for frame {frame}")
+                            except Exception as e:
+                                print(f"  ↳ Error creating dataset image for frame {frame}: {str(e)}")
+
+                        player_boxes.append({
+                            'frame': frame,
+                            'bbox': bbox
+                        })
+
+                frame_count += 1
+
+            if player_boxes:
+                print(f"  ↳ Found {len(player_boxes)} boxes for trajectory")
+
+                # Update frame URLs
+                for box in player_boxes:
+                    bbox = box['bbox']
+                    box['frame_url'] = f"/videos/{video_id}/frame-with-box?frame={box['frame']}&x={bbox[0]}&y={bbox[1]}&w={bbox[2]}&h={bbox[3]}&player_name={name_prefix}{player_name}"
+
+                if make_dataset:
+                    frame_data = collect_frames_for_batch(
+                        boxes_data,
+                        (catch_frame, throw_frame),
+                        player_name,
+                        skip=skip,
+                        name_prefix=name_prefix,
+                        is_throw_sequence=True
+                    )
 
-            frame_data = collect_frames_for_batch(
-                boxes_data,
-                (min(all_frames), max(all_frames)),
-                None,  # No specific player for inverted mode
-                catch_throw_ranges=catch_throw_ranges,  # Pass the ranges
-                skip=skip,
-                name_prefix=name_prefix,
-                is_throw_sequence=False
-            )
+                    if frame_data:
+                        batch_extract_frames(
+                            video['filepath'],
+                            frame_data,
+                            pad_crop=5,
+                            video_id=video_id,
+                            workers=workers
+                        )
 
-            if make_dataset:
-                if frame_data:
-                    batch_extract_frames(
-                        video['filepath'],
-                        frame_data,
-                        pad_crop=5,
-                        video_id=video_id
-                    )
-            
-            # For inverted mode, we don't return trajectory data
-            return jsonify({
-                'message': f'Processed {len(all_frames)} frames outside catch/throw sequences',
-                'frame_data': frame_data,
-                'frame_range': {
-                    'start': start_frame,
-                    'end': end_frame
-                }
-            }), 200
-        else:
-            # Original catch/throw trajectory processing
-            for i, tag in enumerate(tags):
-                tag_name = tag.get('name', '')
-                if 'catch' in tag_name.lower():
-                    player_name = tag_name.split(' catch')[0].strip()
-                    catch_frame = tag.get('frame')
-                    print(f"\nFound catch by {player_name} at frame {catch_frame}")
-                    
-                    # Look for next throw by same player within frame range
-                    for next_tag in tags[i+1:]:
-                        next_tag_name = next_tag.get('name', '')
-                        if ('throw' in next_tag_name.lower() and 
-                            next_tag_name.startswith(player_name)):
-                            throw_frame = next_tag.get('frame')
-                            print(f"  ↳ Found matching throw at frame {throw_frame}")
-                            
-                            # Limit to 15 frames after catch
-                            throw_frame = min(throw_frame, catch_frame + 15)
-                            print(f"  ↳ Limited to frame {throw_frame} (15 frames after catch)")
-
-                            # Skip if throw is outside requested range
-                            if end_frame is not None and throw_frame > end_frame:
-                                print(f"  ↳ Skipping: throw frame {throw_frame} > end frame {end_frame}")
-                                continue
-
-                            player_boxes = []
-                            frame_count = 0  # Counter for skip logic
-                            for frame in range(catch_frame, throw_frame + 1):
-                                # Skip frames based on skip parameter
-                                if skip > 0 and frame_count > 0 and frame_count % (skip + 1) != 0:
-                                    frame_count += 1
-                                    continue
-                                    
-                                if frame < len(boxes_data):
-                                    frame_boxes = boxes_data[frame]
-                                    print(f"  ↳ Frame {frame} has {len(frame_boxes)} boxes")
-                                    print(f"  ↳ Boxes: {frame_boxes}")
-                                    
-                                    if player_name in frame_boxes:
-                                        box_data = frame_boxes[player_name]
-                                        print(f"  ↳ Found box for {player_name}: {box_data}")
-                                        bbox = box_data['bbox']
-                                        
-                                        # Create dataset image if requested
-                                        if make_dataset:
-                                            try:
-                                                extract_frame_with_box(
-                                                    video['filepath'],
-                                                    frame,
-                                                    bbox[0], bbox[1], bbox[2], bbox[3],
-                                                    crop=True,
-                                                    pad_crop=5,
-                                                    make_dataset=True,
-                                                    player_name=f"{name_prefix}{player_name}",
-                                                    video_id=video_id
-                                                )
-                                                print(f"  ↳ Created dataset image for frame {frame}")
-                                            except Exception as e:
-                                                print(f"  ↳ Error creating dataset image for frame {frame}: {str(e)}")
-                                        
-                                        player_boxes.append({
-                                            'frame': frame,
-                                            'bbox': bbox
-                                        })
-                                
-                                frame_count += 1
-                            
-                            if player_boxes:
-                                print(f"  ↳ Found {len(player_boxes)} boxes for trajectory")
-                                
-                                # Update frame URLs
-                                for box in player_boxes:
-                                    bbox = box['bbox']
-                                    box['frame_url'] = f"/videos/{video_id}/frame-with-box?frame={box['frame']}&x={bbox[0]}&y={bbox[1]}&w={bbox[2]}&h={bbox[3]}&player_name={name_prefix}{player_name}"
-                                
-                                if make_dataset:
-                                    frame_data = collect_frames_for_batch(
-                                        boxes_data,
-                                        (catch_frame, throw_frame),
-                                        player_name,
-                                        skip=skip,
-                                        name_prefix=name_prefix,
-                                        is_throw_sequence=True
-                                    )
-                                    
-                                    if frame_data:
-                                        batch_extract_frames(
-                                            video['filepath'],
-                                            frame_data,
-                                            pad_crop=5,
-                                            video_id=video_id
-                                        )
-
-                                trajectories.append({
-                                    'player': player_name,
-                                    'start_frame': catch_frame,
-                                    'end_frame': throw_frame,
-                                    'boxes': player_boxes
-                                })
-                            else:
-                                print(f"  ↳ Warning: No boxes found for this trajectory")
-                            break
-
-            print(f"\nFound {len(trajectories)} total trajectories")
-            return jsonify({
-                'trajectories': trajectories,
-                'frame_range': {
-                    'start': start_frame,
-                    'end': end_frame
-                }
-            }), 200
+                trajectories.append({
+                    'player': player_name,
+                    'start_frame': catch_frame,
+                    'end_frame': throw_frame,
+                    'boxes': player_boxes
+                })
+            else:
+                print(f"  ↳ Warning: No boxes found for this trajectory")
+
+        print(f"\nFound {len(trajectories)} total trajectories")
+        return {
+            'trajectories': trajectories,
+            'frame_range': {
+                'start': start_frame,
+                'end': end_frame
+            }
+        }
 
+@job_runner.register('player-trajectories')
+def player_trajectories_job(params, job):
+    return build_player_trajectories(**params, job=job)
+
+@videos_bp.route('/<int:video_id>/player-trajectories', methods=['GET'])
+def get_player_trajectories(video_id):
+    print(f"Getting player trajectories for video {video_id}")
+    try:
+        params = {
+            'video_id': video_id,
+            'start_frame': request.args.get('start_frame', type=int, default=0),
+            'end_frame': request.args.get('end_frame', type=int),
+            'make_dataset': request.args.get('make_dataset', type=bool, default=False),
+            'skip': request.args.get('skip', type=int, default=0),
+            'invert': request.args.get('invert', type=bool, default=False),
+            'name_prefix': request.args.get('name_prefix', default=''),
+            'workers': request.args.get('workers', type=int)
+        }
+        if wants_async():
+            return job_accepted(job_runner.submit('player-trajectories', params))
+        return jsonify(build_player_trajectories(**params)), 200
+
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         print(f"Error getting player trajectories: {str(e)}")
         print(f"Full traceback: {traceback.format_exc()}")
         return jsonify({'error': str(e)}), 400
 
+@videos_bp.route('/<int:video_id>/possession-sequences', methods=['GET'])
+def get_video_possession_sequences(video_id):
+    try:
+        video = get_video(video_id, include_metadata=False)
+        if not video:
+            return jsonify({'error': 'Video not found'}), 404
+        return jsonify(database.get_possession_sequences(video_id)), 200
+    except Exception as e:
+        print(f"Error getting possession sequences: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @videos_bp.route('/<int:video_id>', methods=['GET'])
 def get_video_info(video_id):
     video = get_video(video_id)
@@ -597,6 +755,7 @@ def get_video_info(video_id):
 
 @videos_bp.route('/<int:video_id>/metadata', methods=['POST'])
 def save_video_metadata(video_id):
+    """Replace the metadata; with a 'version' (or If-Match) only if the video is still at that version"""
     try:
         metadata = request.json.get('metadata')
         if not metadata:
@@ -604,13 +763,179 @@ def save_video_metadata(video_id):
 
         # Parse the metadata string into a Python dictionary
         metadata_dict = json.loads(metadata)
+        expected_version = parse_version(request.headers.get('If-Match') or request.json.get('version'))
 
         # Update the video metadata in the database
-        update_video_metadata(video_id, metadata_dict)
+        version = update_video_metadata(video_id, metadata_dict, expected_version=expected_version)
+        if version is None:
+            return jsonify({'error': 'Video not found'}), 404
 
-        return jsonify({'message': 'Metadata saved successfully'}), 200
+        return jsonify({'message': 'Metadata saved successfully', 'version': version}), 200
     except json.JSONDecodeError:
         return jsonify({'error': 'Invalid JSON in metadata'}), 400
+    except database.VersionConflict as e:
+        return jsonify({'error': str(e), 'version': e.current_version}), 409
+    except JsonPatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@videos_bp.route('/<int:video_id>/metadata', methods=['PATCH'])
+def patch_video_metadata(video_id):
+    """
+    Apply a JSON Patch (RFC 6902) to the metadata server-side.
+
+    Body: a list of operations, or {'operations': [...], 'version': n}. With a
+    version (or an If-Match header) the patch only applies if the video is
+    still at that version, else 409 with the current one. A failed 'test'
+    operation is also a 409; nothing is written unless every operation applies.
+    """
+    try:
+        operations, expected_version = patch_from_body(request.get_json(silent=True), request.headers.get('If-Match'))
+        version = database.patch_video_metadata(video_id, operations, expected_version=expected_version)
+        if version is None:
+            return jsonify({'error': 'Video not found'}), 404
+        return jsonify({'version': version}), 200
+    except database.VersionConflict as e:
+        return jsonify({'error': str(e), 'version': e.current_version}), 409
+    except JsonPatchTestFailed as e:
+        return jsonify({'error': str(e)}), 409
+    except JsonPatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def tags_from_request(data):
+    """A JSON body holding one tag object or {'tags': [...]}"""
+    tags = data.get('tags', [data]) if isinstance(data, dict) else None
+    if not tags or not all(isinstance(tag, dict) for tag in tags):
+        raise ValueError('Expected a tag object or {"tags": [...]}')
+    return tags
+
+def tags_expected_version(data=None):
+    """The If-Match header, else a {'tags': [...], 'version': n} body's version; None if neither"""
+    if request.headers.get('If-Match'):
+        return parse_version(request.headers.get('If-Match'))
+    if isinstance(data, dict) and 'tags' in data:
+        return parse_version(data.get('version'))
+    return None
+
+@videos_bp.route('/<int:video_id>/tags', methods=['GET'])
+def get_video_tags(video_id):
+    try:
+        if not get_video(video_id, include_metadata=False):
+            return jsonify({'error': 'Video not found'}), 404
+        tags = database.get_video_tags(
+            video_id,
+            start_frame=request.args.get('start_frame', type=int),
+            end_frame=request.args.get('end_frame', type=int),
+            name=request.args.get('name')
+        )
+        return jsonify(tags), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@videos_bp.route('/<int:video_id>/tags', methods=['POST'])
+def add_video_tags(video_id):
+    """
+    Append one tag, or {'tags': [...]}, without rewriting the video's metadata.
+    With an If-Match header (or {'tags': [...], 'version': n}) only if the
+    video is still at that version, else 409 with the current one.
+    """
+    try:
+        tags = tags_from_request(request.json)
+        expected_version = tags_expected_version(request.json)
+        if not get_video(video_id, include_metadata=False):
+            return jsonify({'error': 'Video not found'}), 404
+        return jsonify(database.add_video_tags(video_id, tags, expected_version=expected_version)), 201
+    except database.VersionConflict as e:
+        return jsonify({'error': str(e), 'version': e.current_version}), 409
+    except (ValueError, JsonPatchError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@videos_bp.route('/<int:video_id>/tags/<int:tag_id>', methods=['PUT'])
+def update_video_tag(video_id, tag_id):
+    """Replace one tag; with an If-Match header only if the video is still at that version"""
+    try:
+        tag = request.json
+        if not isinstance(tag, dict):
+            return jsonify({'error': 'Expected a tag object'}), 400
+        updated = database.update_video_tag(video_id, tag_id, tag, expected_version=tags_expected_version())
+        if updated is None:
+            return jsonify({'error': 'Tag not found'}), 404
+        return jsonify(updated), 200
+    except database.VersionConflict as e:
+        return jsonify({'error': str(e), 'version': e.current_version}), 409
+    except JsonPatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@videos_bp.route('/<int:video_id>/tags/<int:tag_id>', methods=['DELETE'])
+def delete_video_tag(video_id, tag_id):
+    """Delete one tag; with an If-Match header only if the video is still at that version"""
+    try:
+        if not database.delete_video_tag(video_id, tag_id, expected_version=tags_expected_version()):
+            return jsonify({'error': 'Tag not found'}), 404
+        return jsonify({'message': 'Tag deleted successfully'}), 200
+    except database.VersionConflict as e:
+        return jsonify({'error': str(e), 'version': e.current_version}), 409
+    except JsonPatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@videos_bp.route('/<int:video_id>/boxes', methods=['GET'])
+def get_video_boxes(video_id):
+    """
+    A video's boxes for a frame range, from the bounding-box store.
+
+    Query params:
+        start_frame: First frame (default 0)
+        end_frame: Last frame (default the last frame with boxes)
+
+    Returns {'start_frame', 'end_frame', 'boxes'} where boxes[i] is the
+    {player: {'bbox': [x, y, w, h], 'frame'}} dict of frame start_frame + i,
+    the layout metadata['boxes'] used to have.
+    """
+    try:
+        if not get_video(video_id, include_metadata=False):
+            return jsonify({'error': 'Video not found'}), 404
+        start_frame = max(0, request.args.get('start_frame', type=int, default=0))
+        end_frame = request.args.get('end_frame', type=int)
+        span = database.get_video_box_span(video_id)
+        if span:
+            end_frame = span[1] if end_frame is None else min(end_frame, span[1])
+
+        boxes = []
+        if span and end_frame >= start_frame:
+            frames = database.get_video_boxes(video_id, start_frame, end_frame)
+            boxes = [frames.get(frame_number, {}) for frame_number in range(start_frame, end_frame + 1)]
+        return jsonify({
+            'video_id': video_id,
+            'start_frame': start_frame,
+            'end_frame': start_frame + len(boxes) - 1 if boxes else None,
+            'boxes': boxes
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@videos_bp.route('/<int:video_id>/boxes', methods=['PUT'])
+def set_video_boxes(video_id):
+    """Replace a video's boxes with a boxes.json per-frame array, sent as is or as {'boxes': [...]}"""
+    try:
+        data = request.json
+        boxes = data.get('boxes') if isinstance(data, dict) else data
+        if not isinstance(boxes, list):
+            return jsonify({'error': 'Expected a list of per-frame boxes'}), 400
+        stats = database.set_video_boxes(video_id, boxes)
+        if stats is None:
+            return jsonify({'error': 'Video not found'}), 404
+        return jsonify({'message': 'Boxes saved successfully', 'stats': stats}), 200
+    except (KeyError, TypeError, IndexError, AttributeError) as e:
+        return jsonify({'error': f"Invalid boxes: {str(e)}"}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -627,9 +952,8 @@ def delete_video(video_id):
     else:
         print(f"b2 file_id not found for Video: {video}")
 
-    # Delete from database
-    query = "DELETE FROM videos WHERE id = ?"
-    commit_query(query, (video_id,))
+    # Delete from database, with the video's tags
+    database.delete_video_records(video_id)
 
     return jsonify({'message': 'Video deleted successfully'}), 200
 
@@ -654,35 +978,19 @@ def get_first_frame():
         if not video_url:
             return jsonify({'error': 'No video URL provided'}), 400
             
-        # Download video file or access it
-        import urllib.parse
-        cap = cv2.VideoCapture(urllib.parse.quote(video_url, safe=':/?='))
-        
-        # Read the first frame
-        ret, frame = cap.read()
-        cap.release()
+        # Read the first frame from a pooled capture
+        with capture_pool.capture(video_url, 0) as cap:
+            ret, frame = cap.read_frame(0)
         
         if not ret:
             return jsonify({'error': 'Could not read frame'}), 400
-            
-        # Convert BGR to RGB
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Convert to PIL Image
-        pil_image = Image.fromarray(frame_rgb)
-        
-        # Save to bytes
-        img_io = BytesIO()
-        pil_image.save(img_io, 'JPEG', quality=70)
-        img_io.seek(0)
-        
-        # Convert to base64
-        img_base64 = base64.b64encode(img_io.getvalue()).decode()
+
+        encoded = encode_frame_base64(frame, route='first-frame', **{'quality': 70, **encode_options(request.json)})
         
         return jsonify({
-            'image': img_base64,
-            'width': pil_image.width,
-            'height': pil_image.height
+            'image': encoded.data,
+            'width': encoded.width,
+            'height': encoded.height
         }), 200
         
     except Exception as e:
@@ -758,59 +1066,46 @@ def get_b2_video_info():
         video_url = request.json.get('url')
         frame_number = request.json.get('frame_number', 0)  # Default to first frame
         
+        quality = request.json.get('quality', 'full')
+        
         if not video_url:
             return jsonify({'error': 'No video URL provided'}), 400
-            
-        # Download video file or access it
-        import urllib.parse
-        cap = cv2.VideoCapture(urllib.parse.quote(video_url, safe=':/?='))
-        
-        if not cap.isOpened():
-            return jsonify({'error': 'Could not open video'}), 400
-        
-        # Get video properties
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        duration = frame_count / fps if fps > 0 else 0
-
-        # Set frame position and read frame
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-        ret, frame = cap.read()
+
+        # With quality=proxy the frame comes from the proxy (scaled by
+        # frame_scale); properties are still those of the source video
+        manifest = proxy_store.manifest(video_url) if quality == 'proxy' else None
+        proxy = proxy_store.read_frame(video_url, frame_number) if manifest else None
+        if proxy and proxy[0]:
+            ret, frame, frame_scale = proxy
+            frame_count = manifest['frame_count']
+            fps = manifest['fps']
+            width = manifest['width']
+            height = manifest['height']
+            duration = frame_count / fps if fps > 0 else 0
+        else:
+            frame_scale = 1
+            # Access the video through a pooled capture
+            with capture_pool.capture(video_url, frame_number) as cap:
+                if not cap.is_opened():
+                    return jsonify({'error': 'Could not open video'}), 400
+                
+                # Get video properties
+                frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                duration = frame_count / fps if fps > 0 else 0
+
+                # Read the requested frame
+                ret, frame = cap.read_frame(frame_number)
         
         if not ret:
-            cap.release()
             return jsonify({'error': 'Could not read frame'}), 400
 
-        # Convert frame to jpg and base64
-        temp_jpg = "temp_frame.jpg"
-        cv2.imwrite(temp_jpg, frame)
-        with open(temp_jpg, 'rb') as f:
-            img_bytes = f.read()
-        os.remove(temp_jpg)  # Clean up
-        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-        
-        cap.release()
+        img_base64 = encode_frame_base64(frame, route='b2-info', **encode_options(request.json)).data
 
-        # Look for boxes.json file - remove .mp4 if present
-        video_filename = video_url.split('/')[-1]
-        base_filename = video_filename.replace('.mp4', '')  # Remove .mp4 extension
-        boxes_filename = f"{base_filename}.boxes.json"
-        
-        boxes_data = None
-        exists, file_info = check_file_exists_in_b2(boxes_filename, sam_bucket)
-        if exists:
-            print(f"Downloading boxes data from B2: {boxes_filename}")
-            downloaded_file = sam_bucket.download_file_by_name(boxes_filename)
-            
-            # Create a BytesIO object to read the file contents
-            file_data = BytesIO()
-            downloaded_file.save(file_data)
-            file_data.seek(0)  # Reset position to start of file
-            
-            # Parse JSON from the file data
-            boxes_data = json.loads(file_data.read().decode('utf-8'))
+        # Look for the SAM boxes.json file that belongs to this video
+        boxes_data = get_boxes_data(video_url)
         
         return jsonify({
             'frame_count': frame_count,
@@ -819,7 +1114,8 @@ def get_b2_video_info():
             'height': height,
             'duration': round(duration, 2),
             'boxes_data': boxes_data,
-            'frame_image': img_base64
+            'frame_image': img_base64,
+            'frame_scale': frame_scale
         }), 200
         
     except Exception as e:
@@ -839,21 +1135,13 @@ def analyze_frame_with_clip():
             }), 400
 
         # Extract frame from video
-        cap = cv2.VideoCapture(urllib.parse.quote(data['video_url'], safe=':/?='))
-        cap.set(cv2.CAP_PROP_POS_FRAMES, data['frame_number'])
-        ret, frame = cap.read()
-        cap.release()
+        ret, frame = read_video_frame(data['video_url'], data['frame_number'])
 
         if not ret:
             return jsonify({'error': 'Could not read frame'}), 400
 
-        # Convert frame to jpg and base64
-        temp_jpg = "temp_frame.jpg"
-        cv2.imwrite(temp_jpg, frame)
-        with open(temp_jpg, 'rb') as f:
-            img_bytes = f.read()
-        os.remove(temp_jpg)  # Clean up
-        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
+        # Full quality: this is the image the detector sees
+        img_base64 = encode_frame_base64(frame, route='clip-analysis').data
 
 
         response = requests.post(
@@ -880,25 +1168,44 @@ def get_boxes():
     try:
         video_url = request.json.get('video_url')
         frame_number = request.json.get('frame_number')  # Now optional
+        start_frame = request.json.get('start_frame')
+        end_frame = request.json.get('end_frame')
+        encoding = request.json.get('encoding', 'json')  # 'json' or 'binary'
         
         if not video_url:
             return jsonify({'error': 'No video URL provided'}), 400
-            
-        # Get base filename without .mp4
-        video_filename = video_url.split('/')[-1]
-        base_filename = video_filename.replace('.mp4', '')
-        boxes_filename = f"{base_filename}.boxes.json"
-        
-        # Get boxes data from B2
-        print(f"Checking if boxes file exists in B2: {boxes_filename}")
-        if check_file_exists_in_b2(boxes_filename, sam_bucket)[0]:
-            print(f"  ↳ Boxes file found in B2: {boxes_filename}")
-            downloaded_file = sam_bucket.download_file_by_name(boxes_filename)
-            file_data = BytesIO()
-            downloaded_file.save(file_data)
-            file_data.seek(0)
-            boxes_data = json.loads(file_data.read().decode('utf-8'))
-            
+        if encoding not in ('json', 'binary'):
+            return jsonify({'error': 'encoding must be json or binary'}), 400
+
+        # Binary responses are served from the columnar sidecar (float32 bboxes only)
+        if encoding == 'binary':
+            boxes_index = get_boxes_index(video_url)
+            if boxes_index is None:
+                return jsonify({'error': 'No boxes data found for this video'}), 404
+
+            start_frame = start_frame if start_frame is not None else 0
+            end_frame = end_frame if end_frame is not None else boxes_index.frame_count - 1
+            print(f"  ↳ Returning boxes for frames {start_frame} to {end_frame} as binary")
+            response = make_response(boxes_index.slice(start_frame, end_frame))
+            response.headers['Content-Type'] = 'application/octet-stream'
+            response.headers['X-Total-Frames'] = str(boxes_index.frame_count)
+            return response
+
+        # Get boxes data from the local boxes cache (backed by B2)
+        boxes_data = get_boxes_data(video_url)
+        if boxes_data is not None:
+            # JSON frame ranges are slices of the parsed file, exactly as stored
+            if start_frame is not None or end_frame is not None:
+                start_frame = max(start_frame if start_frame is not None else 0, 0)
+                end_frame = end_frame if end_frame is not None else len(boxes_data) - 1
+                print(f"  ↳ Returning boxes for frames {start_frame} to {end_frame}")
+                return jsonify({
+                    'boxes': boxes_data[start_frame:max(end_frame + 1, start_frame)],
+                    'start_frame': start_frame,
+                    'end_frame': min(end_frame, len(boxes_data) - 1),
+                    'total_frames': len(boxes_data)
+                }), 200
+
             # If frame_number is specified, return just that frame
             if frame_number is not None:
                 if frame_number < len(boxes_data):
@@ -924,6 +1231,51 @@ def get_boxes():
         print(f"Error getting boxes data: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
+@videos_bp.route('/boxes-cache', methods=['GET'])
+def get_boxes_cache_stats():
+    return jsonify(boxes_cache.stats()), 200
+
+@videos_bp.route('/capture-pool', methods=['GET'])
+def get_capture_pool_stats():
+    return jsonify(capture_pool.stats()), 200
+
+@videos_bp.route('/frame-cache', methods=['GET'])
+def get_frame_cache_stats():
+    return jsonify(frame_cache.stats()), 200
+
+@videos_bp.route('/seek-planner', methods=['GET'])
+def get_seek_planner_stats():
+    return jsonify(seek_planner.stats()), 200
+
+@videos_bp.route('/video-mirror', methods=['GET'])
+def get_video_mirror_stats():
+    return jsonify(video_mirror.stats()), 200
+
+@videos_bp.route('/<int:video_id>/mirror', methods=['POST'])
+def mirror_video(video_id):
+    """Start mirroring a video locally ahead of frame extraction"""
+    try:
+        video = get_video(video_id)
+        if not video:
+            return jsonify({'error': 'Video not found'}), 404
+
+        local_path = video_mirror.local_path(video['filepath'])
+        return jsonify({
+            'video_id': video_id,
+            'mirrored': local_path is not None,
+            'local_path': local_path
+        }), 200 if local_path else 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@videos_bp.route('/encode-stats', methods=['GET'])
+def get_encode_stats():
+    return jsonify(encode_stats.stats()), 200
+
+@videos_bp.route('/roboflow-stats', methods=['GET'])
+def get_roboflow_stats():
+    return jsonify(roboflow_classifier.stats()), 200
+
 @videos_bp.route('/process-dictation', methods=['POST'])
 def process_dictation():
     try:
@@ -942,7 +1294,15 @@ def process_dictation():
         print(f"Error in process_dictation: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
-def batch_extract_frames(video_filepath, frame_data, pad_crop=5, video_id=None):
+def batch_extract_frames(video_filepath, frame_data, pad_crop=5, video_id=None, progress=None, workers=None):
+    """
+    Save padded player crops for many (frame_number, player_name, bbox) entries, decoding frames in order.
+
+    Args:
+        progress: callable(done, total, message) for progress reporting, e.g.
+            JobContext.progress; defaults to printing every 10%
+        workers: Worker processes to split the frames across (default CROP_WORKERS)
+    """
     try:
         if not frame_data:
             return
@@ -950,75 +1310,27 @@ def batch_extract_frames(video_filepath, frame_data, pad_crop=5, video_id=None):
         total_frames = len(frame_data)
         print(f"\nStarting batch extraction of {total_frames} frames")
         
-        # Sort by frame number for sequential access
-        frame_data.sort(key=lambda x: x[0])
-        
-        # Create dataset directory
-        dataset_dir = 'player_crops'
-        os.makedirs(dataset_dir, exist_ok=True)
-
-        cap = cv2.VideoCapture(urllib.parse.quote(video_filepath, safe=':/?='))
-        if not cap.isOpened():
-            raise Exception("Could not open video")
-
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        
-        current_frame = -1
-        successful_crops = 0
-        failed_crops = 0
-        
-        # Create progress bar
-        pbar = tqdm(frame_data, desc="Extracting frames", unit="frame")
-        
-        for frame_number, player_name, bbox in pbar:
-            # Update progress bar description
-            pbar.set_description(f"Processing frame {frame_number} for {player_name}")
-            
-            # Skip to next required frame
-            if frame_number != current_frame + 1:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-            
-            ret, frame = cap.read()
-            if not ret:
-                failed_crops += 1
-                pbar.write(f"❌ Error reading frame {frame_number}")
-                continue
-                
-            current_frame = frame_number
-            
-            try:
-                # Crop with padding
-                x, y, w, h = map(int, bbox)
-                x1 = max(0, x - pad_crop)
-                y1 = max(0, y - pad_crop)
-                x2 = min(width, x + w + pad_crop)
-                y2 = min(height, y + h + pad_crop)
-                
-                cropped = frame[y1:y2, x1:x2]
-                
-                # Save cropped image
-                filename = f"{player_name}_{video_id}_{frame_number}.jpg"
-                filepath = os.path.join(dataset_dir, filename)
-                cv2.imwrite(filepath, cropped)
-                
-                successful_crops += 1
-                pbar.write(f"✅ Saved crop for {player_name} at frame {frame_number}")
-                
-            except Exception as e:
-                failed_crops += 1
-                pbar.write(f"❌ Error processing frame {frame_number}: {str(e)}")
-                continue
-                
-        cap.release()
-        pbar.close()
+        progress = progress or print_progress("Extracting frames")
+        stats = extract_crops(
+            video_filepath,
+            frame_data,
+            pad_crop=pad_crop,
+            video_id=video_id,
+            workers=workers,
+            progress=progress,
+            # Only consult the frame cache here; a full-game scan would flush it
+            cached_frame=lambda frame_number: frame_cache.get(video_filepath, frame_number)
+        )
+        progress(total_frames, total_frames)
         
         # Print summary
         print(f"\nBatch extraction complete:")
         print(f"  ↳ Total frames processed: {total_frames}")
-        print(f"  ↳ Successful crops: {successful_crops}")
-        print(f"  ↳ Failed crops: {failed_crops}")
-        print(f"  ↳ Success rate: {(successful_crops/total_frames)*100:.1f}%")
+        print(f"  ↳ Successful crops: {stats['successful']}")
+        print(f"  ↳ Failed crops: {stats['failed']}")
+        print(f"  ↳ Success rate: {(stats['successful']/total_frames)*100:.1f}%")
+        print(f"  ↳ {stats['workers']} worker(s), {stats['segments']} segment(s), {stats['seconds']}s")
+        return stats
 
     except Exception as e:
         print(f"Error in batch extraction: {str(e)}")
@@ -1076,37 +1388,7 @@ def classify_frame_with_roboflow(frame):
         dict containing classification results and base64 image
     """
     try:
-        # Convert frame to base64
-        _, buffer = cv2.imencode('.jpg', frame)
-        image_base64 = base64.b64encode(buffer).decode('utf-8')
-
-        # Save frame temporarily
-        temp_jpg = "temp_frame.jpg"
-        cv2.imwrite(temp_jpg, frame)
-
-        # Initialize Roboflow client
-        client = InferenceHTTPClient(
-            api_url="https://detect.roboflow.com",
-            api_key="pH2eX46dBGLw2Gh1ofek"
-        )
-
-        try:
-            result = client.infer(temp_jpg, model_id="classify-frisbee/3")
-            
-            # Clean up temp file
-            os.remove(temp_jpg)
-            
-            # Add base64 image to result
-            result['image'] = image_base64
-            
-            return result
-
-        except Exception as e:
-            # Clean up temp file even if there's an error
-            if os.path.exists(temp_jpg):
-                os.remove(temp_jpg)
-            raise e
-
+        return roboflow_classifier.classify(frame)
     except Exception as e:
         print(f"Error in Roboflow classification: {str(e)}")
         print(f"Full traceback: {traceback.format_exc()}")
@@ -1121,9 +1403,17 @@ def roboflow_classify():
         frame_number = data.get('frame_number')
         bbox = data.get('bbox')  # Should be [x, y, width, height]
         
+        # The base64 crop is returned unless the caller opts out with include_image: false
+        include_image = str(data.get('include_image', True)).lower() in ('1', 'true', 'yes')
+
         if not all([video_id, frame_number is not None, bbox]):
             return jsonify({'error': 'Missing required fields'}), 400
 
+        # A result cached for this crop needs no seek or decode unless the image is wanted
+        cached = classification_cache.lookup(video_id, frame_number, bbox, pad_crop=5)
+        if cached is not None and not include_image:
+            return jsonify(cached), 200
+
         # Get video info
         video = get_video(video_id)
         if not video:
@@ -1141,9 +1431,16 @@ def roboflow_classify():
         except Exception as e:
             return jsonify({'error': f'Failed to extract frame: {str(e)}'}), 400
 
-        # Run classification
+        # Run classification, reusing an earlier result for the same crop
         try:
-            result = classify_frame_with_roboflow(frame)
+            if cached is not None:
+                result = cached
+            else:
+                result = classification_cache.classify(frame, video_id, frame_number, bbox, pad_crop=5)
+            if not include_image:
+                result = {k: v for k, v in result.items() if k != 'image'}
+            elif 'image' not in result:
+                result = {**result, 'image': encode_frame_base64(frame, route='roboflow-classify').data}
             return jsonify(result), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 400
@@ -1160,10 +1457,9 @@ def get_video_dimensions(video_id):
         if not video:
             return jsonify({'error': 'Video not found'}), 404
             
-        cap = cv2.VideoCapture(video.get('filepath'))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        cap.release()
+        with capture_pool.capture(video.get('filepath')) as cap:
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
         return jsonify({
             'width': width,
@@ -0,0 +1,188 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import subprocess
+from bisect import bisect_right
+
+KEYFRAME_CACHE_DIR = os.getenv('KEYFRAME_CACHE_DIR', 'keyframe_cache')
+KEYFRAME_PROBE_TIMEOUT = float(os.getenv('KEYFRAME_PROBE_TIMEOUT', 600))
+# Gaps up to this many frames are decoded through when keyframes are unknown
+READ_THROUGH_MAX_GAP = int(os.getenv('READ_THROUGH_MAX_GAP', 12))
+# A seek costs about this many frames of decoding on top of the keyframe run-up
+SEEK_COST_FRAMES = int(os.getenv('SEEK_COST_FRAMES', 4))
+
+def parse_packet_listing(output):
+    """
+    Keyframe display indexes from `ffprobe -show_entries packet=pts,flags -of csv=p=0` output.
+
+    Packets are listed in decode order; sorting by pts gives display order, so
+    a keyframe's rank is the frame number OpenCV uses for it.
+    """
+    packets = []
+    for line in output.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) < 2 or not fields[0].lstrip('-').isdigit():
+            continue
+        packets.append((int(fields[0]), 'K' in fields[1]))
+    packets.sort()
+    return [index for index, (_, is_key) in enumerate(packets) if is_key]
+
+class KeyframeIndex:
+    """Sorted keyframe frame numbers of one video"""
+
+    def __init__(self, keyframes):
+        self.keyframes = sorted(keyframes)
+
+    def keyframe_at_or_before(self, frame_number):
+        i = bisect_right(self.keyframes, frame_number) - 1
+        return self.keyframes[i] if i >= 0 else 0
+
+    def read_through(self, position, target):
+        """
+        Whether moving a decoder that will return `position` next to `target`
+        is cheaper by decoding forward than by seeking.
+
+        A seek decodes from the keyframe at or before target, so it only wins
+        when that keyframe lies past position by more than the seek overhead.
+        """
+        if target < position or position < 0:
+            return False
+        keyframe = self.keyframe_at_or_before(target)
+        return target - position <= (target - keyframe) + SEEK_COST_FRAMES
+
+def read_through_without_index(position, target):
+    """Fallback decision when a video's keyframes are not known (yet)"""
+    return position >= 0 and 0 <= target - position <= READ_THROUGH_MAX_GAP
+
+class SeekPlanner:
+    """
+    Per-video keyframe indexes, probed once with ffprobe and cached in memory
+    and on disk (KEYFRAME_CACHE_DIR, keyed by video source).
+
+    Probing reads every packet header, so it runs on a background thread;
+    until it finishes (or if ffprobe is missing) the gap heuristic is used.
+    Only local files are probed: for a remote URL it would mean streaming the
+    whole video, so URLs use the gap heuristic until the video mirror
+    resolves them to a local copy.
+    """
+
+    def __init__(self, cache_dir=KEYFRAME_CACHE_DIR, ffprobe=None):
+        self.cache_dir = cache_dir
+        self.ffprobe = ffprobe or shutil.which('ffprobe')
+        self._indexes = {}  # source -> KeyframeIndex, or None if probing failed
+        self._probing = set()
+        self._lock = threading.Lock()
+        self._counters = {'probes': 0, 'probe_failures': 0, 'disk_hits': 0, 'read_through': 0, 'seeks': 0}
+
+    def _cache_path(self, source):
+        digest = hashlib.sha1(source.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _version(self, source):
+        """Local files are re-probed when they change; remote URLs are keyed by name"""
+        if os.path.exists(source):
+            stat = os.stat(source)
+            return [stat.st_size, int(stat.st_mtime)]
+        return None
+
+    def _read_disk(self, source):
+        path = self._cache_path(source)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('source') != source or cached.get('version') != self._version(source):
+            return None
+        return KeyframeIndex(cached['keyframes'])
+
+    def _probe(self, source):
+        if not self.ffprobe:
+            return None
+        with self._lock:
+            self._counters['probes'] += 1
+        try:
+            completed = subprocess.run(
+                [self.ffprobe, '-v', 'error', '-select_streams', 'v:0',
+                 '-show_entries', 'packet=pts,flags', '-of', 'csv=p=0', source],
+                capture_output=True, text=True, timeout=KEYFRAME_PROBE_TIMEOUT
+            )
+            keyframes = parse_packet_listing(completed.stdout) if completed.returncode == 0 else []
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"Keyframe probe failed for {source}: {str(e)}")
+            keyframes = []
+        if not keyframes:
+            with self._lock:
+                self._counters['probe_failures'] += 1
+            return None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(source)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'source': source, 'version': self._version(source), 'keyframes': keyframes}, f)
+        os.replace(tmp_path, path)
+        print(f"Probed {len(keyframes)} keyframes for {source}")
+        return KeyframeIndex(keyframes)
+
+    def _probe_and_store(self, source):
+        try:
+            index = self._probe(source)
+        finally:
+            with self._lock:
+                self._probing.discard(source)
+        with self._lock:
+            self._indexes[source] = index
+        return index
+
+    def index(self, source, wait=False):
+        """
+        KeyframeIndex for a video source, or None if not known (yet) or remote.
+
+        Args:
+            wait: Probe on this thread instead of in the background
+        """
+        if '://' in source:
+            return None
+        with self._lock:
+            if source in self._indexes:
+                return self._indexes[source]
+
+        index = self._read_disk(source)
+        if index is not None:
+            with self._lock:
+                self._counters['disk_hits'] += 1
+                self._indexes[source] = index
+            return index
+
+        if wait:
+            return self._probe_and_store(source)
+        with self._lock:
+            if source in self._probing:
+                return None
+            self._probing.add(source)
+        threading.Thread(target=self._probe_and_store, args=(source,), daemon=True).start()
+        return None
+
+    def read_through(self, source, position, target):
+        """Whether a decoder at `position` should read forward to `target` instead of seeking"""
+        index = self.index(source)
+        decision = index.read_through(position, target) if index else read_through_without_index(position, target)
+        with self._lock:
+            self._counters['read_through' if decision else 'seeks'] += 1
+        return decision
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counters,
+                'indexed_videos': sum(1 for index in self._indexes.values() if index),
+                'probing': len(self._probing),
+                'ffprobe': self.ffprobe
+            }
+
+seek_planner = SeekPlanner()
@@ -0,0 +1,82 @@
+import os
+import json
+import pytest
+
+pytest.importorskip('b2sdk')
+from b2sdk.v2.exception import FileNotPresent
+from boxes_cache import BoxesCache
+
+BOXES = [{'A': {'bbox': [1, 2, 3, 4]}}]
+
+class FakeDownload:
+    def __init__(self, data):
+        self.data = data
+
+    def save_to(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.data)
+
+class FakeFileVersion:
+    def __init__(self, size):
+        self.upload_timestamp = 1
+        self.id_ = 'file-1'
+        self.size = size
+
+class FakeBucket:
+    """One boxes file; counts lookups, set error to make them fail"""
+
+    def __init__(self):
+        self.data = json.dumps(BOXES).encode('utf-8')
+        self.error = None
+        self.lookups = 0
+
+    def get_file_info_by_name(self, filename):
+        self.lookups += 1
+        if self.error:
+            raise self.error
+        return FakeFileVersion(len(self.data))
+
+    def get_download_url(self, filename):
+        return f'https://f005.backblazeb2.com/file/sam-videos/{filename}'
+
+    def download_file_by_name(self, filename):
+        return FakeDownload(self.data)
+
+@pytest.fixture
+def bucket():
+    return FakeBucket()
+
+def test_b2_errors_serve_the_cached_copy(tmp_path, bucket):
+    cache = BoxesCache(cache_dir=str(tmp_path), revalidate_seconds=0, bucket=bucket)
+    assert cache.get('game.boxes.json') == BOXES
+
+    bucket.error = ConnectionError('B2 unreachable')
+    assert cache.get('game.boxes.json') == BOXES
+    # A new process with only the disk copy
+    assert BoxesCache(cache_dir=str(tmp_path), revalidate_seconds=0, bucket=bucket).get('game.boxes.json') == BOXES
+    assert os.path.exists(tmp_path / 'game.boxes.json')
+    assert cache.stats()['b2_errors'] == 1
+
+    with pytest.raises(ConnectionError):
+        cache.get('other.boxes.json')
+
+def test_files_gone_from_b2_are_dropped(tmp_path, bucket):
+    cache = BoxesCache(cache_dir=str(tmp_path), revalidate_seconds=0, bucket=bucket)
+    assert cache.get('game.boxes.json') == BOXES
+
+    bucket.error = FileNotPresent(file_id_or_name='game.boxes.json')
+    assert cache.get('game.boxes.json') is None
+    assert not os.path.exists(tmp_path / 'game.boxes.json')
+    assert cache.stats()['not_found'] == 1
+
+def test_index_builds_reuse_the_validated_file(tmp_path, bucket):
+    cache = BoxesCache(cache_dir=str(tmp_path), bucket=bucket)
+    index = cache.get_index('game.boxes.json')
+    assert index.frame_count == 1
+    assert bucket.lookups == 1
+    assert cache.get('game.boxes.json') == BOXES and bucket.lookups == 1
+
+def test_budget_counts_parsed_size(tmp_path, bucket):
+    cache = BoxesCache(cache_dir=str(tmp_path), bucket=bucket)
+    cache.get('game.boxes.json')
+    assert cache.stats()['bytes'] > len(bucket.data)
@@ -0,0 +1,35 @@
+import pytest
+from boxes_index import BoxesIndex, build_boxes_index
+
+@pytest.fixture
+def boxes_data():
+    """Boxes in the SAM boxes.json format, with some empty frames"""
+    return [
+        {},
+        {'John Doe': {'bbox': [100.5, 200, 50, 100]}, 'Jane Smith': {'bbox': [300, 400, 60, 120]}},
+        {},
+        {'Jane Smith': {'bbox': [310, 405, 60, 120]}},
+        {'John Doe': {'bbox': [110, 210, 50, 100]}}
+    ]
+
+def test_index_round_trip(boxes_data):
+    """Test that the sidecar reproduces every frame"""
+    index = BoxesIndex(build_boxes_index(boxes_data))
+    assert index.frame_count == 5
+    assert index.frames(0, 4) == boxes_data
+
+def test_index_slice(boxes_data):
+    """Test slicing a frame range into a standalone sidecar"""
+    index = BoxesIndex(build_boxes_index(boxes_data))
+    sliced = BoxesIndex(index.slice(2, 3))
+    assert sliced.start_frame == 2
+    assert sliced.frame_count == 2
+    assert sliced.frames(2, 3) == boxes_data[2:4]
+    assert sliced.frames(3, 3) == boxes_data[3:4]
+
+def test_index_slice_out_of_range(boxes_data):
+    """Test that ranges past the end are clamped"""
+    index = BoxesIndex(build_boxes_index(boxes_data))
+    assert index.frames(4, 100) == boxes_data[4:]
+    assert BoxesIndex(index.slice(10, 20)).frame_count == 0
+    assert index.frames(3, 1) == []
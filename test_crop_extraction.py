@@ -0,0 +1,61 @@
+import os
+import sys
+import pytest
+import crop_extraction
+import database
+from crop_extraction import extract_crops, split_segments
+
+@pytest.fixture
+def video_path(make_video):
+    """A short video whose frames differ, so crops of different frames differ"""
+    return make_video(60, step=4, label=True)
+
+def frame_data():
+    entries = []
+    for frame_number in range(0, 60, 2):
+        entries.append((frame_number, 'A', [5, 5, 40, 50]))
+        entries.append((frame_number, 'B', [60, 20, 50, 60]))
+    return entries[::-1]
+
+def read_outputs(directory):
+    return {name: open(os.path.join(directory, name), 'rb').read() for name in sorted(os.listdir(directory))}
+
+def test_segments_cut_between_frames():
+    entries = sorted(frame_data())
+    segments = split_segments(entries, 7)
+    assert sum(segments, []) == entries
+    for left, right in zip(segments, segments[1:]):
+        assert left[-1][0] != right[0][0]
+
+def test_process_pool_matches_serial(video_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(crop_extraction, 'CROP_MIN_SEGMENT', 8)
+    serial_dir, parallel_dir = str(tmp_path / 'serial'), str(tmp_path / 'parallel')
+
+    serial = extract_crops(video_path, frame_data(), video_id=1, dataset_dir=serial_dir, workers=1)
+    progress = []
+    parallel = extract_crops(
+        video_path, frame_data(), video_id=1, dataset_dir=parallel_dir, workers=2,
+        progress=lambda done, total, message=None: progress.append(done)
+    )
+
+    assert serial['successful'] == parallel['successful'] == 60
+    assert parallel['workers'] == 2 and parallel['segments'] > 2
+    assert progress[-1] == 60
+    assert read_outputs(serial_dir) == read_outputs(parallel_dir)
+
+def test_spawned_workers_leave_server_jobs_alone(db, video_path, tmp_path, monkeypatch):
+    # Workers re-import __main__ as __mp_main__; stand in for app.py with a script importing the server modules
+    server = tmp_path / 'server.py'
+    server.write_text('import database\nimport database_bounding_box\nfrom jobs import job_runner\n')
+    monkeypatch.setattr(sys.modules['__main__'], '__spec__', None, raising=False)
+    monkeypatch.setattr(sys.modules['__main__'], '__file__', str(server), raising=False)
+    monkeypatch.setenv('DATABASE_FILE', str(tmp_path / 'videos.db'))
+    monkeypatch.setenv('BOUNDING_BOXES_DB', str(tmp_path / 'bounding_boxes.db'))
+    monkeypatch.setattr(crop_extraction, 'CROP_MIN_SEGMENT', 8)
+    job_id = database.create_job('dataset', {})
+    database.update_job(job_id, status='running')
+
+    result = extract_crops(video_path, frame_data(), video_id=1, dataset_dir=str(tmp_path / 'crops'), workers=2)
+
+    assert result['workers'] == 2 and result['successful'] == 60
+    assert database.get_job(job_id)['status'] == 'running'
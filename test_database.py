@@ -0,0 +1,196 @@
+import json
+import sqlite3
+import threading
+import pytest
+import database
+import database_bounding_box
+from json_patch import JsonPatchError
+
+def test_connections_use_wal_and_are_reused(db):
+    with db.db_connection() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == int(db.DATABASE_BUSY_TIMEOUT * 1000)
+        first = conn
+    with db.db_connection() as conn:
+        assert conn is first
+
+def test_block_commits_or_rolls_back(db):
+    video_id = db.add_video('Game', 0, 'game.mp4', {'tags': []})
+    with pytest.raises(RuntimeError):
+        with db.db_connection() as conn:
+            conn.execute("UPDATE videos SET title = 'Changed' WHERE id = ?", (video_id,))
+            raise RuntimeError('abort')
+    assert db.get_video(video_id)['title'] == 'Game'
+
+    db.update_video_metadata(video_id, {'tags': [{'name': 'catch', 'frame': 1, 'player': 'A'}]})
+    assert db.get_video(video_id)['metadata']['tags'][0]['player'] == 'A'
+
+def test_reads_run_while_a_write_is_open(db):
+    video_id = db.add_video('Game', 0, 'game.mp4', None)
+    writer = db.get_db_connection()
+    writer.execute("UPDATE videos SET title = 'Pending' WHERE id = ?", (video_id,))
+
+    titles = []
+    reader = threading.Thread(target=lambda: titles.append(db.get_video(video_id)['title']))
+    reader.start()
+    reader.join(timeout=2)
+    writer.commit()
+    writer.close()
+    assert titles == ['Game']
+
+def test_init_db_moves_tags_out_of_metadata(db):
+    tags = [{'name': 'Alex catch', 'frame': 10}, {'name': 'Alex throw', 'frame': 20}]
+    with db.db_connection() as conn:
+        conn.execute("INSERT INTO videos (title, size, filepath, metadata) VALUES ('Old', 0, 'old.mp4', ?)",
+                     (json.dumps({'tags': tags, 'width': 1920}),))
+        conn.execute('PRAGMA user_version = 0')
+    db.init_db()
+
+    with db.db_connection() as conn:
+        metadata = json.loads(conn.execute("SELECT metadata FROM videos WHERE title = 'Old'").fetchone()[0])
+    assert metadata == {'width': 1920}
+    video = db.get_video(1)
+    assert [{k: v for k, v in tag.items() if k != 'id'} for tag in video['metadata']['tags']] == tags
+    [sequence] = db.get_possession_sequences(1)
+    assert (sequence['player'], sequence['catch_frame'], sequence['throw_frame']) == ('Alex', 10, 20)
+
+def test_tag_crud_keeps_ids(db):
+    video_id = db.add_video('Game', 0, 'game.mp4', {'tags': [{'name': 'catch', 'frame': 5}]})
+    [first] = db.get_video_tags(video_id)
+    [second] = db.add_video_tags(video_id, [{'name': 'score', 'frame': 50}])
+    assert [tag['id'] for tag in db.get_video_tags(video_id)] == [first['id'], second['id']]
+    assert db.get_video_tags(video_id, start_frame=10, end_frame=60) == [second]
+
+    assert db.update_video_tag(video_id, second['id'], {'name': 'drop', 'frame': 51})['name'] == 'drop'
+    assert db.update_video_tag(video_id + 1, second['id'], {'name': 'drop'}) is None
+
+    # Saving the whole metadata back keeps ids of tags that were sent with them
+    metadata = db.get_video(video_id)['metadata']
+    metadata['tags'] = metadata['tags'][1:] + [{'name': 'new', 'frame': 70}]
+    db.update_video_metadata(video_id, metadata)
+    tags = db.get_video_tags(video_id)
+    assert [tag['name'] for tag in tags] == ['drop', 'new'] and tags[0]['id'] == second['id']
+
+    assert db.delete_video_tag(video_id, second['id'])
+    assert not db.delete_video_tag(video_id, second['id'])
+    assert db.get_tags_by_video() == {video_id: [tags[1]]}
+
+def test_list_videos_pages_by_id(db):
+    for i in range(5):
+        db.add_video(f"Game {i}", i, f"game{i}.mp4", {'tags': [{'name': 'catch', 'frame': 1}] * i, 'width': 1280})
+
+    videos, next_after_id = db.list_videos(['title', 'tag_count', 'width', 'has_boxes'], limit=2)
+    assert videos == [{'title': 'Game 0', 'tag_count': 0, 'width': 1280, 'has_boxes': False},
+                      {'title': 'Game 1', 'tag_count': 1, 'width': 1280, 'has_boxes': False}]
+    videos, next_after_id = db.list_videos(['id'], limit=2, after_id=next_after_id)
+    assert [video['id'] for video in videos] == [3, 4]
+    videos, next_after_id = db.list_videos(limit=2, after_id=next_after_id)
+    assert next_after_id is None and videos[0]['tag_count'] == 4 and 'metadata' not in videos[0]
+
+    with pytest.raises(ValueError):
+        db.list_videos(['metadata'])
+
+BOXES = [{}, {'Alex': {'bbox': [1, 2, 3, 4]}}, {}, {'Alex': {'bbox': [5, 6, 7, 8]}, 'Sam': {'bbox': [9, 9, 9, 9]}}]
+
+def test_init_db_moves_boxes_to_the_box_store(db):
+    with db.db_connection() as conn:
+        conn.execute("INSERT INTO videos (title, size, filepath, metadata) VALUES ('Old', 0, 'https://x/old.mp4', ?)",
+                     (json.dumps({'boxes': BOXES, 'width': 1920}),))
+        conn.execute('PRAGMA user_version = 1')
+    db.init_db()
+
+    video = db.get_video(1)
+    assert 'boxes' not in video['metadata'] and video['metadata']['width'] == 1920
+    assert db.get_video_box_span(1) == (1, 3)
+    frames = db.get_video_boxes(1, start_frame=2, end_frame=3)
+    assert list(frames) == [3] and frames[3]['Sam'] == {'bbox': [9, 9, 9, 9], 'frame': 3}
+    assert db.list_videos(['id', 'has_boxes'])[0] == [{'id': 1, 'has_boxes': True}]
+
+def test_boxes_migration_can_be_rerun_and_skips_failed_videos(db, monkeypatch):
+    with db.db_connection() as conn:
+        for title in ('Done', 'Locked', 'Todo'):
+            conn.execute("INSERT INTO videos (title, size, filepath, metadata) VALUES (?, 0, ?, ?)",
+                         (title, f'{title}.mp4', json.dumps({'boxes': BOXES})))
+    # 'Done' was imported before a crash, but its metadata was never stripped
+    db._store_video_boxes(1, 'Done.mp4', {}, BOXES)
+
+    import_boxes = database_bounding_box.import_bounding_boxes_json
+    def import_or_fail(db_path, video_id, boxes_data, **kwargs):
+        if video_id == database_bounding_box.get_linked_video_ids(db_path, [2]).get(2):
+            raise sqlite3.OperationalError('database is locked')
+        return import_boxes(db_path, video_id, boxes_data, **kwargs)
+    monkeypatch.setattr(database_bounding_box, 'import_bounding_boxes_json', import_or_fail)
+    with db.db_connection() as conn:
+        db._migrate_boxes_out_of_metadata(conn)
+
+    assert 'boxes' not in db.get_video(1)['metadata'] and 'boxes' not in db.get_video(3)['metadata']
+    assert db.get_video(2)['metadata']['boxes'] == BOXES
+    assert db.get_video_boxes(1) == db.get_video_boxes(3) and len(db.get_video_boxes(1)[3]) == 2
+    assert len(database_bounding_box.get_all_bounding_boxes(database_bounding_box.BOUNDING_BOXES_DB)) == 6
+
+def test_first_boot_migrates_boxes_without_an_existing_box_store(tmp_path, monkeypatch):
+    legacy = sqlite3.connect(tmp_path / 'videos.db')
+    legacy.execute('CREATE TABLE videos (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, '
+                   'size INTEGER NOT NULL, filepath TEXT NOT NULL, metadata TEXT)')
+    legacy.execute("INSERT INTO videos (title, size, filepath, metadata) VALUES ('Old', 0, 'old.mp4', ?)",
+                   (json.dumps({'boxes': BOXES}),))
+    legacy.commit()
+    legacy.close()
+    monkeypatch.setattr(database, 'DATABASE_FILE', str(tmp_path / 'videos.db'))
+    monkeypatch.setattr(database_bounding_box, 'BOUNDING_BOXES_DB', str(tmp_path / 'bounding_boxes.db'))
+
+    database.init_db()
+    try:
+        assert 'boxes' not in database.get_video(1)['metadata']
+        assert database.get_video_box_span(1) == (1, 3)
+    finally:
+        database.connection_pool.close_all()
+
+def test_metadata_saves_replace_boxes_only_when_sent(db):
+    video_id = db.add_video('Game', 0, 'game.mp4', {'boxes': BOXES})
+    db.update_video_metadata(video_id, {'width': 640})
+    assert set(db.get_video_boxes(video_id)) == {1, 3}
+    db.update_video_metadata(video_id, {'width': 640, 'boxes': BOXES[:2]})
+    assert set(db.get_video_boxes(video_id)) == {1}
+
+    db.delete_video_records(video_id)
+    assert db.get_video_box_span(video_id) is None
+
+def test_versions_guard_concurrent_writes(db):
+    video_id = db.add_video('Game', 0, 'game.mp4', {'width': 640})
+    version = db.get_video(video_id)['version']
+
+    version = db.patch_video_metadata(video_id, [{'op': 'replace', 'path': '/width', 'value': 1280}], version)
+    with pytest.raises(db.VersionConflict) as conflict:
+        db.update_video_metadata(video_id, {'width': 320}, expected_version=version - 1)
+    assert conflict.value.current_version == version
+
+    # A failed patch writes nothing, version included
+    with pytest.raises(JsonPatchError):
+        db.patch_video_metadata(video_id, [{'op': 'add', 'path': '/height', 'value': 720},
+                                           {'op': 'remove', 'path': '/missing'}])
+    with pytest.raises(JsonPatchError):
+        db.patch_video_metadata(video_id, [{'op': 'add', 'path': '/tags/-', 'value': {}}])
+    video = db.get_video(video_id)
+    assert video['metadata'] == {'width': 1280, 'tags': []} and video['version'] == version
+
+    [tag] = db.add_video_tags(video_id, [{'name': 'catch', 'frame': 1}])
+    assert db.get_video(video_id)['version'] == version + 1
+
+    # Tag edits against a stale version write nothing
+    with pytest.raises(db.VersionConflict):
+        db.add_video_tags(video_id, [{'name': 'throw', 'frame': 2}], expected_version=version)
+    with pytest.raises(db.VersionConflict):
+        db.update_video_tag(video_id, tag['id'], {'name': 'drop', 'frame': 1}, expected_version=version)
+    with pytest.raises(db.VersionConflict):
+        db.delete_video_tag(video_id, tag['id'], expected_version=version)
+    assert db.get_video_tags(video_id) == [tag] and db.get_video(video_id)['version'] == version + 1
+    assert db.update_video_tag(video_id, tag['id'], {'name': 'drop', 'frame': 1}, expected_version=version + 1)
+    assert db.delete_video_tag(video_id, tag['id'], expected_version=version + 2)
+    assert db.get_video(video_id)['version'] == version + 3
+
+    film_id = db.create_film('Film', '2026-01-01')
+    assert db.patch_film_data(film_id, [{'op': 'add', 'path': '/clips', 'value': []}], 0) == 1
+    assert db.update_film_data(film_id, {'clips': [1]}, expected_version=1) == 2
+    assert db.get_film_by_id(film_id)['data'] == {'clips': [1]}
+    assert db.patch_film_data(film_id + 1, []) is None
@@ -4,6 +4,8 @@ import tempfile
 import pytest
 from pathlib import Path
 from database_bounding_box import *
+from boxes_stream import iter_json_array, iter_file_chunks
+import io
 
 @pytest.fixture
 def db_path():
@@ -216,4 +218,111 @@ def test_json_export_import(db_path, video_id, bounding_boxes):
         assert box['x'] == pytest.approx(120)  # 100 + 2 * 10
         assert box['y'] == pytest.approx(110)  # 100 + 2 * 5
         assert box['width'] == 50
-        assert box['height'] == 100 
\ No newline at end of file
+        assert box['height'] == 100
+
+
+def test_json_import_is_idempotent(db_path, video_id):
+    """Test that re-importing the same data respects the UNIQUE constraints"""
+    boxes_data = [
+        {},
+        {'John Doe': {'bbox': [10, 20, 30, 40]}, 'Jane Smith': {'bbox': [50, 60, 70, 80]}},
+        {'John Doe': {'bbox': [11, 21, 31, 41]}},
+    ]
+
+    stats = import_bounding_boxes_json(db_path, video_id, boxes_data, batch_size=1)
+    assert stats['frames'] == 2
+    assert stats['boxes'] == 3
+    assert stats['players'] == 2
+
+    boxes_data[2]['John Doe']['bbox'] = [12, 22, 32, 42]
+    import_bounding_boxes_json(db_path, video_id, boxes_data)
+
+    conn = get_db_connection(db_path)
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM frames').fetchone()[0] == 2
+        assert conn.execute('SELECT COUNT(*) FROM bounding_boxes').fetchone()[0] == 3
+        assert conn.execute('SELECT COUNT(*) FROM players').fetchone()[0] == 2
+    finally:
+        conn.close()
+
+    track_data = get_player_tracking(db_path, video_id=video_id, player_name="John Doe")
+    assert [pos['frame_number'] for pos in track_data] == [1, 2]
+    assert track_data[1]['x'] == pytest.approx(12)
+
+def test_iter_json_array_rejects_anything_but_one_array():
+    chunks = lambda text: [text[i:i + 3].encode('utf-8') for i in range(0, len(text), 3)]
+    assert list(iter_json_array(chunks(' [{"a": 1}, 12.5, []] \n '))) == [{'a': 1}, 12.5, []]
+    assert list(iter_json_array(chunks('[]'))) == []
+    for text in ('[1, 2] [3]', '[1],', '[1]x', '[1,]', '{"a": 1}', '[1, 2'):
+        with pytest.raises(ValueError):
+            list(iter_json_array(chunks(text)))
+
+def test_streamed_json_import(db_path, video_id, bounding_boxes):
+    """Test importing an incrementally parsed boxes.json stream"""
+    json_data = export_video_bounding_boxes(db_path, video_id)
+    stream = io.BytesIO(json.dumps(json_data).encode('utf-8'))
+
+    new_video_id = add_video(
+        db_path=db_path,
+        filename="test_game2.mp4",
+        duration=120.5,
+        total_frames=3000,
+        frame_rate=25.0,
+        width=1920,
+        height=1080
+    )
+    stats = import_bounding_boxes_json(
+        db_path, new_video_id, iter_json_array(iter_file_chunks(stream, chunk_size=256)), batch_size=2
+    )
+    assert stats['frames'] == 5
+    assert stats['boxes'] == 15
+
+    imported_boxes = get_frame_bounding_boxes(db_path, video_id=new_video_id, frame_number=4)
+    assert len(imported_boxes) == 3
+    for box in imported_boxes:
+        assert box['x'] == pytest.approx(140)
+        assert box['y'] == pytest.approx(120)
+
+def test_spatial_index_follows_inserts_replaces_and_deletes(db_path, video_id, bounding_boxes):
+    conn = get_db_connection(db_path)
+    try:
+        count = lambda table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        assert count('bounding_boxes_rtree') == count('bounding_boxes') == 15
+
+        # Re-importing overwrites boxes with INSERT OR REPLACE; stale entries must go
+        import_bounding_boxes_json(db_path, video_id, [{'John Doe': {'bbox': [900, 900, 10, 10]}}])
+        assert count('bounding_boxes_rtree') == count('bounding_boxes') == 15
+        assert conn.execute('SELECT min_x FROM bounding_boxes_rtree WHERE min_frame = 0 AND min_x > 800').fetchone()
+
+        delete_video_bounding_boxes(db_path, video_id)
+        assert count('bounding_boxes_rtree') == 0
+    finally:
+        conn.close()
+
+def test_spatial_index_is_backfilled(db_path, video_id, bounding_boxes):
+    conn = get_db_connection(db_path)
+    try:
+        conn.execute('DROP TABLE bounding_boxes_rtree')
+        conn.commit()
+    finally:
+        conn.close()
+    init_db(db_path)
+    assert len(get_boxes_in_region(db_path, video_id, 0, 0, 2000, 2000)) == 15
+
+def test_region_query(db_path, video_id, bounding_boxes):
+    # Boxes are 50x100 at (100 + 10f, 100 + 5f) for frames 0-4
+    boxes = get_boxes_in_region(db_path, video_id, 0, 0, 145, 200, start_frame=1, end_frame=3)
+    assert {box['frame_number'] for box in boxes} == {1, 2, 3}
+    assert summarize_region_presence(boxes)['John Doe'] == {'frames': 3, 'first_frame': 1, 'last_frame': 3}
+
+    # Fully inside only for x + 50 <= 170, i.e. frames 0-2
+    contained = get_boxes_in_region(db_path, video_id, 170, 210, 90, 90, mode='contains', players=['Jane Smith'])
+    assert [(box['frame_number'], box['name']) for box in contained] == [(0, 'Jane Smith'), (1, 'Jane Smith'), (2, 'Jane Smith')]
+
+    # Feet at (125 + 10f, 200 + 5f)
+    feet = get_boxes_in_region(db_path, video_id, 140, 205, 160, 220, mode='feet', players=['Bob Wilson'])
+    assert [box['frame_number'] for box in feet] == [2, 3]
+
+    assert get_boxes_in_region(db_path, video_id + 1, 0, 0, 2000, 2000) == []
+    with pytest.raises(ValueError):
+        get_boxes_in_region(db_path, video_id, 0, 0, 1, 1, mode='nearby')
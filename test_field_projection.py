@@ -0,0 +1,109 @@
+import json
+import numpy as np
+import cv2
+import pytest
+import database
+import field_projection
+from calibration_cache import calibration_cache
+from field_projection import DST_POINTS, Calibration, homography_matrix, parse_keyframes, project_trajectories
+
+FIELD = [[100, 50], [500, 60], [620, 400], [0, 380]]
+
+def test_homography_is_solved_once_per_field():
+    field_projection._homography_for_key.cache_clear()
+    H = homography_matrix(FIELD)
+    assert homography_matrix(np.array(FIELD, dtype=np.float32)) is H
+    assert field_projection._homography_for_key.cache_info().misses == 1
+    assert np.allclose(H, cv2.getPerspectiveTransform(np.float32(FIELD), DST_POINTS))
+    with pytest.raises(ValueError):
+        homography_matrix(FIELD[:3])
+
+def test_trajectories_match_per_point_transform():
+    boxes = {
+        3: {'A': {'bbox': [10, 20, 30, 40]}},
+        1: {'A': {'bbox': [100, 120, 20, 60]}, 'B': {'bbox': [300, 200, 10, 10]}},
+        2: {'B': {'bbox': [310, 210, 10, 10]}}
+    }
+    H = homography_matrix(FIELD)
+    trajectories = {player: (frames.tolist(), points) for player, frames, points in project_trajectories(boxes, H)}
+    assert {player: frames for player, (frames, _) in trajectories.items()} == {'A': [1, 3], 'B': [1, 2]}
+
+    for player, (frames, points) in trajectories.items():
+        for frame, point in zip(frames, points):
+            x, y, w, h = boxes[frame][player]['bbox']
+            expected = cv2.perspectiveTransform(np.float32([[[x + w / 2, y + h]]]), H)[0, 0]
+            assert np.allclose(point, expected, atol=1e-3)
+
+    only_b = list(project_trajectories(boxes, H, players={'B'}))
+    assert [player for player, _, _ in only_b] == ['B']
+    assert list(project_trajectories({}, H)) == []
+
+def test_trajectories_endpoint_streams_one_line_per_player(client):
+    video_id = database.add_video('Game', 0, 'game.mp4', {})
+    database.set_video_boxes(video_id, [
+        {'A': {'bbox': [100, 100, 20, 40], 'frame': 0}},
+        {'A': {'bbox': [110, 100, 20, 40], 'frame': 1}, 'B': {'bbox': [300, 200, 20, 40], 'frame': 1}},
+        {'B': {'bbox': [310, 200, 20, 40], 'frame': 2}}
+    ])
+
+    response = client.post(f'/api/homography/videos/{video_id}/trajectories', json={'fieldPoints': FIELD, 'start_frame': 1})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert {line['player']: line['frames'] for line in lines} == {'A': [1], 'B': [1, 2]}
+    assert all(len(line['points']) == len(line['frames']) for line in lines)
+
+    assert client.post('/api/homography/videos/999/trajectories', json={'fieldPoints': FIELD}).status_code == 404
+    assert client.post(f'/api/homography/videos/{video_id}/trajectories', json={'fieldPoints': FIELD[:2]}).status_code == 400
+
+def test_calibration_interpolates_between_keyframes_and_holds_at_the_ends():
+    moved = [[x + 40, y] for x, y in FIELD]
+    keyframes = parse_keyframes([
+        {'frame': 100, 'fieldPoints': moved},
+        {'frame': 0, 'fieldPoints': FIELD},
+        {'frame': 200, 'matrix': np.eye(3).tolist(), 'interpolate': False},
+        {'frame': 300, 'matrix': (2 * np.eye(3)).tolist()}
+    ])
+    assert [keyframe['frame'] for keyframe in keyframes] == [0, 100, 200, 300]
+    calibration = Calibration(keyframes)
+    H0, H1 = (homography_matrix(points) / homography_matrix(points)[2, 2] for points in (FIELD, moved))
+
+    assert np.allclose(calibration.matrix_at(0), H0)
+    assert np.allclose(calibration.matrix_at(50), (H0 + H1) / 2)
+    assert np.allclose(calibration.matrix_at(250), np.eye(3))
+    assert np.allclose(calibration.matrix_at(5000), np.eye(3))
+
+    frames = [0, 50, 100]
+    points = [[300, 200]] * 3
+    expected = [cv2.perspectiveTransform(np.float32([[p]]), calibration.matrix_at(f))[0, 0] for f, p in zip(frames, points)]
+    assert np.allclose(calibration.project(frames, points), expected, atol=1e-3)
+
+    with pytest.raises(ValueError):
+        parse_keyframes([{'frame': 0, 'matrix': np.eye(3).tolist()}, {'frame': 0, 'fieldPoints': FIELD}])
+    with pytest.raises(ValueError):
+        parse_keyframes([{'frame': 0}])
+
+def test_calibration_is_stored_and_used_by_projection(client):
+    video_id = database.add_video('Game', 0, 'game.mp4', {})
+    database.set_video_boxes(video_id, [{'A': {'bbox': [100, 100, 20, 40], 'frame': 0}}])
+    url = f'/api/homography/videos/{video_id}/calibration'
+
+    assert client.get(url).get_json()['keyframes'] == []
+    assert client.post(f'/api/homography/videos/{video_id}/trajectories', json={}).status_code == 404
+    assert client.put(url, json={'fieldPoints': FIELD[:3]}).status_code == 400
+    assert client.put(url, json={'fieldPoints': FIELD}).status_code == 200
+
+    calibration_cache.invalidate()
+    keyframes = client.get(url).get_json()['keyframes']
+    assert len(keyframes) == 1 and keyframes[0]['fieldPoints'] == FIELD
+
+    stored = client.post(f'/api/homography/videos/{video_id}/trajectories', json={}).get_data(as_text=True)
+    sent = client.post(f'/api/homography/videos/{video_id}/trajectories', json={'fieldPoints': FIELD}).get_data(as_text=True)
+    assert stored == sent
+
+    transformed = client.post('/api/homography/transform', json={'video_id': video_id, 'points': [[110, 140]]}).get_json()
+    assert np.allclose(transformed['transformed_points'], json.loads(sent)['points'], atol=0.01)
+
+    assert client.delete(url).status_code == 200
+    assert client.get(url).get_json()['keyframes'] == []
+    assert client.put('/api/homography/videos/999/calibration', json={'fieldPoints': FIELD}).status_code == 404
@@ -0,0 +1,60 @@
+import io
+import json
+import zipfile
+import pytest
+import frame_batches
+from frame_batches import contact_sheet, pack_multipart, pack_zip, parse_items, render_items
+
+@pytest.fixture
+def video_path(make_video):
+    """40 frames whose brightness encodes the frame number"""
+    return make_video(40, step=5)
+
+def test_parse_items_accepts_both_box_forms():
+    items = parse_items([
+        {'frame': 3, 'bbox': [1, 2, 3, 4], 'crop': True, 'pad_crop': 2},
+        {'frame': '5', 'x': 1, 'y': 2, 'w': 3, 'h': 4}
+    ])
+    assert items[1] == {'frame': 5, 'bbox': [1.0, 2.0, 3.0, 4.0], 'crop': False, 'pad_crop': 0}
+    with pytest.raises(ValueError):
+        parse_items([{'frame': 1, 'x': 1}])
+    with pytest.raises(ValueError):
+        parse_items([])
+
+def test_render_decodes_each_frame_once_in_order(video_path, monkeypatch):
+    items = parse_items([
+        {'frame': 30, 'bbox': [10, 10, 20, 30], 'crop': True, 'pad_crop': 5},
+        {'frame': 4, 'bbox': [10, 10, 20, 30], 'crop': True},
+        {'frame': 30, 'bbox': [50, 40, 20, 20]},
+        {'frame': 99, 'bbox': [0, 0, 5, 5]}
+    ])
+    decoded = []
+    iter_video_frames = frame_batches.iter_video_frames
+    monkeypatch.setattr(frame_batches, 'iter_video_frames',
+                        lambda path, frames: (decoded.append(sorted(frames)), iter_video_frames(path, frames))[1])
+
+    images = render_items(video_path, items)
+    assert decoded == [[4, 30, 99]]
+    assert images[0].shape == (40, 30, 3) and abs(int(images[0].mean()) - 150) <= 2
+    assert images[1].shape == (30, 20, 3) and abs(int(images[1].mean()) - 20) <= 2
+    assert images[2].shape == (120, 160, 3) and tuple(images[2][40, 60]) == (0, 255, 0)
+    assert images[3] is None
+
+def test_packing(video_path):
+    items = parse_items([{'frame': 1, 'bbox': [0, 0, 30, 20], 'crop': True}, {'frame': 2, 'bbox': [0, 0, 10, 10]}])
+    images = render_items(video_path, items) + [None]
+    items.append({'frame': 99, 'bbox': [0, 0, 1, 1], 'crop': True, 'pad_crop': 0})
+
+    body, mimetype = pack_zip(items, images)
+    archive = zipfile.ZipFile(io.BytesIO(body))
+    index = json.loads(archive.read('index.json'))
+    assert mimetype == 'application/zip'
+    assert [entry['file'] for entry in index] == ['000_frame1.jpeg', '001_frame2.jpeg', None]
+
+    body, mimetype = pack_multipart(items, images, format='png')
+    boundary = mimetype.split('boundary=')[1].encode()
+    assert body.count(b'--' + boundary) == 4 and body.count(b'image/png') == 2
+
+    sheet, layout = contact_sheet(images, columns=2, tile_width=80)
+    assert sheet.shape == (2 * 60, 160, 3)
+    assert layout['tiles'][0] == [25, 20, 30, 20] and layout['tiles'][2] is None
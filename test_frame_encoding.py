@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+import pytest
+import frame_encoding
+from frame_encoding import encode_frame, encode_frame_base64, encode_options, encode_stats
+
+@pytest.fixture
+def frame():
+    frame = np.zeros((90, 160, 3), dtype=np.uint8)
+    frame[:, :80] = (255, 0, 0)
+    return frame
+
+@pytest.mark.parametrize('format, mimetype', [('jpeg', 'image/jpeg'), ('webp', 'image/webp'), ('png', 'image/png')])
+def test_encode_round_trip(frame, format, mimetype):
+    encoded = encode_frame(frame, format=format, route='test')
+    assert encoded.mimetype == mimetype
+    decoded = cv2.imdecode(np.frombuffer(encoded.data, np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == frame.shape
+    assert np.abs(decoded.astype(int) - frame).mean() < 3
+
+def test_max_width_and_quality(frame):
+    small = encode_frame(frame, max_width=40, quality=50)
+    assert (small.width, small.height) == (40, 22)
+    assert encode_frame(frame, quality=95).data != encode_frame(frame, quality=20).data
+
+def test_opencv_fallback_matches_imencode(frame, monkeypatch):
+    monkeypatch.setattr(frame_encoding, 'FRAME_FAST_JPEG', False)
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    assert encode_frame(frame, quality=70).data == buffer.tobytes()
+    # The default quality is the one plain cv2.imencode used
+    assert encode_frame(frame).data == cv2.imencode('.jpg', frame)[1].tobytes()
+
+def test_base64_and_stats(frame):
+    encode_frame_base64(frame, route='stats-test')
+    stats = encode_stats.stats()['routes']['stats-test']
+    assert stats['count'] == 1 and stats['mean_bytes'] > 0
+
+def test_encode_options():
+    assert encode_options({'format': 'jpg', 'image_quality': '80', 'quality': 'proxy', 'max_width': ''}) == {'format': 'jpeg', 'quality': 80}
+    with pytest.raises(ValueError):
+        encode_options({'format': 'gif'})
+    with pytest.raises(ValueError):
+        encode_options({'image_quality': 0})
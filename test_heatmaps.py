@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+import database
+import database_bounding_box
+from calibration_cache import calibration_cache
+from heatmaps import HeatmapEngine, bin_positions
+
+# Field corners equal to the overhead view, so image points map onto themselves
+IDENTITY = [[0, 0], [400, 0], [400, 600], [0, 600]]
+
+def add_game(boxes):
+    video_id = database.add_video('Game', 0, 'game.mp4', {})
+    database.set_video_boxes(video_id, boxes)
+    calibration_cache.set(video_id, [{'frame': 0, 'fieldPoints': IDENTITY}])
+    return video_id
+
+def test_bin_positions_rows_run_down_the_field():
+    counts = bin_positions([[10, 10], [390, 590], [390, 590], [500, 10]], bins_x=2, bins_y=3)
+    assert counts.tolist() == [[1, 0], [0, 0], [0, 2]]
+
+def test_heatmap_aggregates_videos_and_is_cached_until_boxes_change(client):
+    # Feet at (x + w/2, y + h)
+    first = add_game([
+        {'A': {'bbox': [0, 0, 20, 100]}, 'B': {'bbox': [300, 400, 20, 100]}},
+        {'A': {'bbox': [0, 0, 20, 100]}}
+    ])
+    second = add_game([{'A': {'bbox': [300, 400, 20, 100]}}])
+    engine = HeatmapEngine()
+
+    result = engine.heatmap([second, first], bins_x=2, bins_y=2, by_player=True)
+    assert result['video_ids'] == [first, second]
+    assert result['counts'].tolist() == [[2, 0], [0, 2]]
+    assert result['players']['A'].tolist() == [[2, 0], [0, 1]]
+    assert engine.heatmap([first, second], bins_x=2, bins_y=2, players=['B'])['total'] == 1
+    assert engine.heatmap([first, second], bins_x=2, bins_y=2, by_player=True) is result
+    assert engine.stats()['hits'] == 1
+
+    database.set_video_boxes(second, [{'A': {'bbox': [0, 0, 20, 100]}}])
+    assert engine.heatmap([first, second], bins_x=2, bins_y=2, by_player=True)['counts'].tolist() == [[3, 0], [0, 1]]
+
+    with pytest.raises(ValueError):
+        engine.heatmap([first], bins_x=0)
+    with pytest.raises(LookupError):
+        engine.heatmap([999])
+
+def test_heatmap_cache_misses_after_boxes_are_rewritten_in_place(client):
+    video_id = add_game([{'A': {'bbox': [0, 0, 20, 100]}}])
+    engine = HeatmapEngine()
+    assert engine.heatmap([video_id], bins_x=2, bins_y=2)['counts'].tolist() == [[1, 0], [0, 0]]
+
+    # Same frames, so only the box rows change
+    box_video_id = database_bounding_box.get_linked_video_ids(database_bounding_box.BOUNDING_BOXES_DB, [video_id])[video_id]
+    database_bounding_box.import_bounding_boxes_json(
+        database_bounding_box.BOUNDING_BOXES_DB, box_video_id, [{'A': {'bbox': [300, 400, 20, 100]}}]
+    )
+    assert engine.heatmap([video_id], bins_x=2, bins_y=2)['counts'].tolist() == [[0, 0], [0, 1]]
+    assert engine.stats() == {'hits': 0, 'misses': 2, 'evictions': 0, 'entries': 1}
+
+def test_heatmap_endpoint_returns_json_or_png(client):
+    video_id = add_game([{'A': {'bbox': [0, 0, 20, 100]}}])
+    response = client.get(f'/api/homography/heatmap?video_ids={video_id}&bins_x=4&bins_y=6&by_player=1')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert np.array(data['counts']).shape == (6, 4) and data['total'] == 1 and 'A' in data['players']
+
+    response = client.get(f'/api/homography/heatmap?video_ids={video_id}&format=png')
+    assert response.headers['Content-Type'] == 'image/png'
+    assert response.data.startswith(b'\x89PNG')
+
+    uncalibrated = database.add_video('Other', 0, 'other.mp4', {})
+    assert client.get(f'/api/homography/heatmap?video_ids={uncalibrated}').status_code == 404
+    assert client.get('/api/homography/heatmap').status_code == 400
@@ -0,0 +1,70 @@
+import time
+import threading
+import pytest
+import database
+import jobs
+from jobs import JobRunner
+
+@pytest.fixture
+def runner(db, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_PROGRESS_INTERVAL', 0)
+    return JobRunner(workers=2)
+
+def wait_for(job_id, statuses=('succeeded', 'failed', 'cancelled'), timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = database.get_job(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} still {job['status']}")
+
+def test_job_runs_and_reports_progress(runner):
+    seen = []
+
+    @runner.register('count')
+    def count(params, job):
+        for i in range(params['n']):
+            job.progress(i, params['n'])
+            seen.append(database.get_job(job.job_id, include_result=False)['progress'])
+        return {'total': params['n']}
+
+    job = wait_for(runner.submit('count', {'n': 4}))
+    assert job['status'] == 'succeeded'
+    assert job['result'] == {'total': 4}
+    assert job['progress'] == 1.0
+    assert seen == [0.0, 0.25, 0.5, 0.75]
+
+def test_job_failure_and_unknown_kind(runner):
+    @runner.register('boom')
+    def boom(params, job):
+        raise RuntimeError('no video')
+
+    job = wait_for(runner.submit('boom', {}))
+    assert job['status'] == 'failed' and job['error'] == 'no video'
+    with pytest.raises(ValueError):
+        runner.submit('missing', {})
+
+def test_cancel_stops_at_next_progress_call(runner):
+    started = threading.Event()
+
+    @runner.register('forever')
+    def forever(params, job):
+        i = 0
+        while True:
+            job.progress(i, i + 1)
+            started.set()
+            i += 1
+            time.sleep(0.01)
+
+    job_id = runner.submit('forever', {})
+    assert started.wait(5)
+    assert runner.cancel(job_id)
+    assert wait_for(job_id)['status'] == 'cancelled'
+    assert not runner.cancel(job_id)
+
+def test_unfinished_jobs_are_marked_interrupted(runner):
+    job_id = database.create_job('count', {'n': 1})
+    assert runner.recover() == 1
+    assert database.get_job(job_id)['status'] == 'interrupted'
+    assert runner.recover() == 0
@@ -0,0 +1,81 @@
+import json
+import sqlite3
+import pytest
+from json_patch import (
+    JsonPatchError, JsonPatchTestFailed, apply_patch, json_equal, parse_pointer, parse_version, patch_from_body
+)
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE films (id INTEGER PRIMARY KEY, data TEXT)')
+    conn.execute('INSERT INTO films (id, data) VALUES (1, ?)', (json.dumps({
+        'clips': [{'id': 'a'}, {'id': 'c'}],
+        'clipSettings': {'a': {'zoom': 1}},
+        'a/b': 1,
+        'flags': {'public': False}
+    }),))
+    yield conn
+    conn.close()
+
+def document(conn):
+    return json.loads(conn.execute('SELECT data FROM films WHERE id = 1').fetchone()[0])
+
+def test_parse_pointer_unescapes():
+    assert parse_pointer('') == []
+    assert parse_pointer('/a~1b/m~0n/0') == ['a/b', 'm~n', '0']
+    with pytest.raises(JsonPatchError):
+        parse_pointer('no-slash')
+
+def test_operations_apply_in_order(conn):
+    apply_patch(conn, 'films', 'data', 1, [
+        {'op': 'test', 'path': '/flags/public', 'value': False},
+        {'op': 'add', 'path': '/clips/1', 'value': {'id': 'b'}},
+        {'op': 'add', 'path': '/clips/-', 'value': {'id': 'd'}},
+        {'op': 'replace', 'path': '/clipSettings/a/zoom', 'value': 2.5},
+        {'op': 'add', 'path': '/clipSettings/b', 'value': {'label': 'Hold "up"', 'on': True, 'none': None}},
+        {'op': 'copy', 'from': '/clipSettings/a', 'path': '/clipSettings/c'},
+        {'op': 'move', 'from': '/a~1b', 'path': '/moved'},
+        {'op': 'remove', 'path': '/clips/0'}
+    ])
+    assert document(conn) == {
+        'clips': [{'id': 'b'}, {'id': 'c'}, {'id': 'd'}],
+        'clipSettings': {'a': {'zoom': 2.5}, 'b': {'label': 'Hold "up"', 'on': True, 'none': None}, 'c': {'zoom': 2.5}},
+        'moved': 1,
+        'flags': {'public': False}
+    }
+
+@pytest.mark.parametrize('operation, error', [
+    ({'op': 'test', 'path': '/flags/public', 'value': 0}, JsonPatchTestFailed),
+    ({'op': 'remove', 'path': '/missing'}, JsonPatchError),
+    ({'op': 'replace', 'path': '/clips/2', 'value': {}}, JsonPatchError),
+    ({'op': 'add', 'path': '/clips/01', 'value': {}}, JsonPatchError),
+    ({'op': 'add', 'path': '/missing/key', 'value': 1}, JsonPatchError),
+    ({'op': 'move', 'from': '/clipSettings', 'path': '/clipSettings/a/inner'}, JsonPatchError),
+    ({'op': 'add', 'path': '/x'}, JsonPatchError),
+    ({'op': 'frobnicate', 'path': '/x'}, JsonPatchError)
+])
+def test_failing_operation_raises(conn, operation, error):
+    with pytest.raises(error):
+        apply_patch(conn, 'films', 'data', 1, [operation])
+
+def test_null_document_starts_empty(conn):
+    conn.execute('INSERT INTO films (id, data) VALUES (2, NULL)')
+    apply_patch(conn, 'films', 'data', 2, [{'op': 'add', 'path': '/clips', 'value': []}])
+    assert conn.execute('SELECT data FROM films WHERE id = 2').fetchone()[0] == '{"clips":[]}'
+
+def test_json_equal():
+    assert json_equal({'a': [1, 2.0]}, {'a': [1.0, 2]})
+    assert not json_equal(True, 1)
+    assert not json_equal('1', 1)
+
+def test_patch_from_body():
+    operations = [{'op': 'remove', 'path': '/a'}]
+    assert patch_from_body(operations) == (operations, None)
+    assert patch_from_body({'operations': operations, 'version': 3}) == (operations, 3)
+    assert patch_from_body({'operations': operations, 'version': 3}, if_match='W/"7"') == (operations, 7)
+    assert parse_version(None) is None
+    with pytest.raises(JsonPatchError):
+        patch_from_body({'version': 3})
+    with pytest.raises(JsonPatchError):
+        parse_version('abc')
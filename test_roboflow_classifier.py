@@ -0,0 +1,108 @@
+import base64
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import numpy as np
+import pytest
+from roboflow_classifier import RoboflowClassifier
+import database
+from classification_cache import ClassificationCache
+
+class StubInferenceHandler(BaseHTTPRequestHandler):
+    """Answers classification requests with the mean pixel value of the posted JPEG"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        image = cv2.imdecode(np.frombuffer(base64.b64decode(body), dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        # Later requests answer sooner, so ordering has to come from the client
+        time.sleep(0.05 if image.mean() < 128 else 0.01)
+        with server.lock:
+            server.in_flight -= 1
+            server.requests += 1
+        payload = (
+            '{"predictions": [{"class": "frisbee", "confidence": %f}]}' % (image.mean() / 255)
+        ).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubInferenceHandler)
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def classifier(stub_server):
+    host, port = stub_server.server_address
+    return RoboflowClassifier(api_url=f"http://{host}:{port}", api_key='test', model_id='stub/1', max_in_flight=4)
+
+def _crops(values):
+    return [np.full((32, 32, 3), value, dtype=np.uint8) for value in values]
+
+def _confidence(result):
+    return result['predictions'][0]['confidence']
+
+def test_classify_sends_in_memory_jpeg(classifier):
+    result = classifier.classify(_crops([200])[0])
+    assert _confidence(result) == pytest.approx(200 / 255, abs=0.02)
+    assert base64.b64decode(result['image'])[:2] == b'\xff\xd8'
+
+def test_results_keep_input_order(classifier, stub_server):
+    values = [20, 220, 40, 240, 60, 250, 80, 230]
+    results = classifier.classify_many(_crops(values))
+    confidences = [_confidence(result) for result in results]
+    assert confidences == pytest.approx([v / 255 for v in values], abs=0.02)
+    assert 1 < stub_server.max_in_flight <= 4
+
+def test_iter_classified_streams_in_order(classifier):
+    values = list(range(0, 250, 10))
+    items = ((i, crop) for i, crop in enumerate(_crops(values)))
+    keys = []
+    for key, future in classifier.iter_classified(items, window=3):
+        keys.append(key)
+        assert _confidence(future.result()) == pytest.approx(values[key] / 255, abs=0.02)
+    assert keys == list(range(len(values)))
+
+@pytest.fixture
+def cache(classifier, db):
+    return ClassificationCache(classifier)
+
+def test_cache_answers_repeat_crops_without_requests(cache, stub_server):
+    crop = _crops([120])[0]
+    first = cache.classify(crop, video_id=1, frame_number=10, bbox=[1, 2, 30, 40], pad_crop=5)
+    assert stub_server.requests == 1
+
+    # Same key, then same pixels under a different key
+    again = cache.classify(crop, video_id=1, frame_number=10, bbox=[1, 2, 30, 40], pad_crop=5)
+    moved = cache.classify(crop.copy(), video_id=1, frame_number=11, bbox=[5, 5, 30, 40], pad_crop=5)
+    assert stub_server.requests == 1
+    assert again['predictions'] == first['predictions'] == moved['predictions']
+    assert 'image' not in again
+    assert len(cache.range(1, 10, 11)) == 2
+    assert cache.lookup(1, 10, [1, 2, 30, 40], pad_crop=5)['predictions'] == first['predictions']
+    assert cache.lookup(1, 10, [1, 2, 30, 40]) is None
+
+def test_cache_invalidation_by_model(cache, stub_server):
+    cache.classify(_crops([60])[0], video_id=2, frame_number=0, bbox=[0, 0, 10, 10])
+    assert database.delete_cached_classifications(model_id='other/1') == 0
+    assert database.delete_cached_classifications(model_id='stub/1') == 1
+    cache.classify(_crops([60])[0], video_id=2, frame_number=0, bbox=[0, 0, 10, 10])
+    assert stub_server.requests == 2
@@ -0,0 +1,73 @@
+import os
+import stat
+import pytest
+from seek_planner import KeyframeIndex, SeekPlanner, parse_packet_listing
+from video_capture_pool import PooledCapture
+
+# Decode order I P B B P B B, K for keyframes (as printed by ffprobe)
+PACKETS = """0,K__
+3000,___
+1000,___
+2000,___
+6000,K__
+4000,___
+5000,___
+"""
+
+def test_packet_listing_gives_display_order_keyframes():
+    assert parse_packet_listing(PACKETS) == [0, 6]
+    assert parse_packet_listing("N/A,K__\n\n") == []
+
+def test_read_through_decisions():
+    index = KeyframeIndex([0, 50, 100])
+    assert index.read_through(10, 14)        # no keyframe in between
+    assert index.read_through(10, 49)        # seeking would decode from 0
+    assert not index.read_through(10, 90)    # seek to 50 decodes 40 + overhead < 80
+    assert index.read_through(48, 52)        # short hop over a keyframe
+    assert not index.read_through(20, 10)    # backwards always seeks
+    assert not index.read_through(-1, 10)    # unknown position
+
+@pytest.fixture
+def fake_ffprobe(tmp_path):
+    script = tmp_path / 'ffprobe'
+    script.write_text("#!/bin/sh\ncat <<'EOF'\n" + PACKETS + "EOF\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script)
+
+def test_planner_probes_once_and_caches_on_disk(tmp_path, fake_ffprobe):
+    video = tmp_path / 'game.mp4'
+    video.write_bytes(b'not really a video')
+    cache_dir = str(tmp_path / 'keyframes')
+
+    planner = SeekPlanner(cache_dir=cache_dir, ffprobe=fake_ffprobe)
+    assert planner.index(str(video), wait=True).keyframes == [0, 6]
+    assert planner.stats()['probes'] == 1
+
+    fresh = SeekPlanner(cache_dir=cache_dir, ffprobe=fake_ffprobe)
+    assert fresh.index(str(video)).keyframes == [0, 6]
+    assert fresh.stats()['probes'] == 0 and fresh.stats()['disk_hits'] == 1
+
+def test_planner_never_probes_remote_sources(tmp_path, fake_ffprobe):
+    planner = SeekPlanner(cache_dir=str(tmp_path), ffprobe=fake_ffprobe)
+    url = 'https://f005.backblazeb2.com/file/remotion-videos/game.mp4'
+    assert planner.index(url, wait=True) is None
+    assert planner.index(url) is None
+    assert planner.read_through(url, 10, 15)
+    assert planner.stats()['probes'] == 0 and planner.stats()['probing'] == 0
+
+def test_planner_without_ffprobe_uses_gap_heuristic(tmp_path):
+    planner = SeekPlanner(cache_dir=str(tmp_path), ffprobe=None)
+    planner.ffprobe = None
+    assert planner.index('missing.mp4', wait=True) is None
+    assert planner.read_through('missing.mp4', 10, 15)
+    assert not planner.read_through('missing.mp4', 10, 500)
+
+def test_strided_reads_return_the_requested_frames(make_video):
+    capture = PooledCapture(make_video(40, size=(64, 48), step=6))
+    try:
+        for frame_number in [0, 3, 7, 8, 30, 33, 12]:
+            ret, frame = capture.read_frame(frame_number)
+            assert ret
+            assert abs(int(frame.mean()) - frame_number * 6) <= 2
+    finally:
+        capture.release()
@@ -0,0 +1,73 @@
+import random
+import database
+from trajectories import RangeIndex, collect_frames_for_batch, pair_catches_with_throws
+from bench_collect_frames import collect_frames_legacy, synthetic_game
+
+def test_range_index_merges_and_bounds():
+    index = RangeIndex([
+        {'player': 'A', 'range': (10, 20)},
+        {'player': 'A', 'range': (15, 30)},
+        {'player': 'A', 'range': (31, 35)},
+        {'player': 'A', 'range': (50, 60)},
+        {'player': 'B', 'range': (0, 5)}
+    ])
+    assert index._starts['A'] == [10, 50]
+    assert [index.contains('A', f) for f in (9, 10, 35, 36, 50, 60, 61)] == [False, True, True, False, True, True, False]
+    assert index.contains('B', 0) and not index.contains('B', 6)
+    assert not index.contains('C', 12)
+
+def test_inverted_collection_matches_legacy_scan():
+    boxes_data, ranges = synthetic_game(frames=600, players=5, catches=30, seed=3)
+    for skip in (0, 1, 4):
+        expected = collect_frames_legacy(boxes_data, (7, 640), ranges, skip=skip, name_prefix='x_')
+        actual = collect_frames_for_batch(
+            boxes_data, (7, 640), None, catch_throw_ranges=ranges, skip=skip, name_prefix='x_', is_throw_sequence=False
+        )
+        assert actual == expected
+
+def test_throw_sequence_collects_one_player():
+    boxes_data = [{'A': {'bbox': [f, 0, 1, 1]}, 'B': {'bbox': [0, f, 1, 1]}} for f in range(10)]
+    assert collect_frames_for_batch(boxes_data, (2, 8), 'A', skip=2) == [
+        (2, 'A', [2, 0, 1, 1]), (5, 'A', [5, 0, 1, 1]), (8, 'A', [8, 0, 1, 1])
+    ]
+
+def pair_catches_legacy(tags):
+    """The original nested scan over tags[i+1:]"""
+    pairs = []
+    for i, tag in enumerate(tags):
+        tag_name = tag.get('name', '')
+        if 'catch' in tag_name.lower():
+            player_name = tag_name.split(' catch')[0].strip()
+            for j, next_tag in enumerate(tags[i + 1:], start=i + 1):
+                next_tag_name = next_tag.get('name', '')
+                if 'throw' in next_tag_name.lower() and next_tag_name.startswith(player_name):
+                    pairs.append((player_name, tag.get('frame'), next_tag.get('frame'), i, j))
+                    break
+    return pairs
+
+def test_pairing_matches_legacy_scan():
+    rng = random.Random(7)
+    names = ['Al', 'Alex', 'Bo', 'Cy']
+    actions = ['catch', 'throw', 'Catch', 'drop', 'catch and throw']
+    tags = [
+        {'name': f"{rng.choice(names)} {rng.choice(actions)}", 'frame': rng.randrange(5000)}
+        for _ in range(400)
+    ]
+    expected = pair_catches_legacy(tags)
+    actual = [
+        (s['player'], s['catch_frame'], s['throw_frame'], s['catch_index'], s['throw_index'])
+        for s in pair_catches_with_throws(tags)
+    ]
+    assert actual == expected
+
+def test_possession_index_follows_metadata(db):
+    tags = [{'name': 'Al catch', 'frame': 10}, {'name': 'Al throw', 'frame': 40}]
+    video_id = database.add_video('game', 0, 'game.mp4', {'tags': tags})
+
+    # Built lazily for metadata written by add_video
+    assert [s['throw_frame'] for s in database.get_possession_sequences(video_id, tags)] == [40]
+
+    tags = tags + [{'name': 'Bo catch', 'frame': 50}, {'name': 'Bo throw', 'frame': 70}]
+    database.update_video_metadata(video_id, {'tags': tags})
+    data, _ = database.execute_query('SELECT player FROM possession_sequences WHERE video_id = ?', (video_id,))
+    assert sorted(row[0] for row in data) == ['Al', 'Bo']
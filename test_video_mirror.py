@@ -0,0 +1,88 @@
+import time
+import threading
+import pytest
+
+pytest.importorskip('b2sdk')
+from video_mirror import VideoMirror
+
+URL = 'https://f005.backblazeb2.com/file/remotion-videos/game.mp4'
+
+class FakeFileVersion:
+    def __init__(self, size):
+        self.upload_timestamp = 0
+        self.id_ = 'file-1'
+        self.size = size
+
+class FakeBucket:
+    """Counts file lookups; downloads always fail"""
+
+    def __init__(self, size=10, exists=True):
+        self.size = size
+        self.exists = exists
+        self.lookups = 0
+
+    def get_file_info_by_name(self, filename):
+        self.lookups += 1
+        if not self.exists:
+            raise FileNotFoundError(filename)
+        return FakeFileVersion(self.size)
+
+    def get_download_url(self, filename):
+        return URL
+
+    def download_file_by_name(self, filename):
+        raise Exception('offline')
+
+class SlowBucket(FakeBucket):
+    """Downloads hang until released, then fail"""
+
+    def __init__(self, size):
+        super().__init__(size)
+        self.started = []
+        self.release = threading.Event()
+
+    def download_file_by_name(self, filename):
+        self.started.append(filename)
+        self.release.wait(5)
+        raise Exception('offline')
+
+def test_unavailable_videos_are_not_rechecked_on_every_request(tmp_path):
+    missing = FakeBucket(exists=False)
+    mirror = VideoMirror(cache_dir=str(tmp_path), revalidate_seconds=60, buckets={'remotion-videos': missing})
+    assert mirror.local_path(URL) is None
+    assert mirror.local_path(URL) is None
+    assert missing.lookups == 1
+
+    too_large = FakeBucket(size=100)
+    mirror = VideoMirror(cache_dir=str(tmp_path), max_bytes=50, revalidate_seconds=60, buckets={'remotion-videos': too_large})
+    assert mirror.local_path(URL) is None
+    assert mirror.local_path(URL) is None
+    assert too_large.lookups == 1
+
+    failing = FakeBucket()
+    mirror = VideoMirror(cache_dir=str(tmp_path), revalidate_seconds=0.05, buckets={'remotion-videos': failing})
+    assert mirror.local_path(URL, wait=True) is None
+    assert mirror.local_path(URL) is None
+    assert failing.lookups == 1 and mirror.stats()['download_failures'] == 1
+
+    time.sleep(0.06)
+    mirror.local_path(URL, wait=True)
+    assert failing.lookups == 2
+
+def test_downloads_in_progress_are_not_rechecked(tmp_path):
+    bucket = FakeBucket()
+    mirror = VideoMirror(cache_dir=str(tmp_path), revalidate_seconds=60, buckets={'remotion-videos': bucket})
+    mirror._downloading.add(('remotion-videos', 'game.mp4'))
+    assert mirror.local_path(URL) is None
+    assert bucket.lookups == 0
+
+def test_downloads_in_progress_count_against_the_quota(tmp_path):
+    bucket = SlowBucket(size=10)
+    mirror = VideoMirror(cache_dir=str(tmp_path), max_bytes=15, revalidate_seconds=60, buckets={'remotion-videos': bucket})
+    assert mirror.local_path(URL) is None
+    assert mirror.stats()['reserved_bytes'] == 10
+    assert mirror.local_path(URL.replace('game.mp4', 'other.mp4')) is None
+    bucket.release.set()
+    while mirror.stats()['downloading']:
+        time.sleep(0.01)
+    assert bucket.started == ['game.mp4'] and mirror.stats()['reserved_bytes'] == 0
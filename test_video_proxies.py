@@ -0,0 +1,37 @@
+import pytest
+import video_proxies
+from video_proxies import ProxyStore, scaled_size
+
+@pytest.fixture
+def video_path(make_video):
+    """75 frames whose brightness encodes the frame number"""
+    return make_video(75, size=(320, 180), step=3)
+
+def test_scaled_size_is_even_and_never_upscales():
+    assert scaled_size(1920, 1080, 640) == (640, 360)
+    assert scaled_size(1280, 721, 640) == (640, 360)
+    assert scaled_size(320, 180, 640) == (320, 180)
+
+def test_build_proxy_and_sprites(video_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(video_proxies, 'PROXY_WIDTH', 160)
+    monkeypatch.setattr(video_proxies, 'SPRITE_STRIDE', 10)
+    monkeypatch.setattr(video_proxies, 'SPRITE_THUMB_WIDTH', 32)
+    store = ProxyStore(proxy_dir=str(tmp_path / 'proxies'))
+    assert store.manifest(video_path) is None
+
+    manifest = store.build(video_path)
+    assert manifest['frame_count'] == 75
+    assert (manifest['proxy']['width'], manifest['proxy']['height']) == (160, 90)
+    assert manifest['sprites']['count'] == 8 and len(manifest['sprites']['sheets']) == 1
+
+    for frame_number in [0, 41, 12, 74]:
+        ret, frame, scale = store.read_frame(video_path, frame_number)
+        assert ret and frame.shape == (90, 160, 3) and scale == 0.5
+        assert abs(int(frame.mean()) - frame_number * 3) <= 2
+
+    thumbnail_frame, thumbnail = store.thumbnail(video_path, 57)
+    assert thumbnail_frame == 50 and thumbnail.shape == (18, 32, 3)
+    assert abs(int(thumbnail.mean()) - 150) <= 3
+
+    # A fresh store finds the artifacts on disk
+    assert ProxyStore(proxy_dir=str(tmp_path / 'proxies')).manifest(video_path) == manifest
@@ -0,0 +1,129 @@
+"""
+Frame selection helpers for player trajectories and dataset builds.
+
+Kept free of Flask/OpenCV imports so they can be benchmarked and tested on
+their own.
+"""
+from bisect import bisect_right
+
+class RangeIndex:
+    """
+    Per-player index of inclusive frame ranges.
+
+    Overlapping or touching ranges of a player are merged, leaving sorted,
+    disjoint (start, end) pairs, so contains() is one bisect.
+    """
+
+    def __init__(self, ranges=None):
+        """
+        Args:
+            ranges: iterable of {'player': name, 'range': (start, end)} dicts,
+                as built for catch/throw exclusions
+        """
+        by_player = {}
+        for r in ranges or []:
+            by_player.setdefault(r['player'], []).append(tuple(r['range']))
+
+        self._starts = {}
+        self._ends = {}
+        for player, player_ranges in by_player.items():
+            merged = []
+            for start, end in sorted(player_ranges):
+                if merged and start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            self._starts[player] = [start for start, _ in merged]
+            self._ends[player] = [end for _, end in merged]
+
+    def __bool__(self):
+        return bool(self._starts)
+
+    def contains(self, player, frame):
+        """Whether frame falls inside any range of player"""
+        starts = self._starts.get(player)
+        if not starts:
+            return False
+        i = bisect_right(starts, frame) - 1
+        return i >= 0 and frame <= self._ends[player][i]
+
+def collect_frames_for_batch(boxes_data, frame_range, player_name, catch_throw_ranges=None, skip=0, name_prefix='', is_throw_sequence=True):
+    """
+    Collect frames for batch processing.
+
+    Args:
+        boxes_data: List of per-frame box dicts
+        frame_range: Tuple of (start_frame, end_frame)
+        player_name: Name of player to track
+        catch_throw_ranges: List of catch/throw ranges (or a RangeIndex) for checking exclusions
+        skip: Number of frames to skip
+        name_prefix: Prefix for player name in output
+        is_throw_sequence: If True, this is a throw sequence. If False, it's outside throw sequences
+
+    Returns:
+        List of tuples (frame_number, player_name, bbox)
+    """
+    frame_data = []
+    start_frame, end_frame = frame_range
+    step = skip + 1 if skip > 0 else 1
+    suffix = '' if is_throw_sequence else '_non_throw'
+
+    if is_throw_sequence:
+        # For throw sequences, only get the specific player
+        for frame in range(start_frame, min(end_frame + 1, len(boxes_data)), step):
+            box_data = boxes_data[frame].get(player_name)
+            if box_data is not None:
+                frame_data.append((frame, f"{name_prefix}{player_name}{suffix}", box_data['bbox']))
+        return frame_data
+
+    # For non-throw sequences, get all players not in catch/throw sequences
+    exclusions = catch_throw_ranges if isinstance(catch_throw_ranges, RangeIndex) else RangeIndex(catch_throw_ranges)
+    for frame in range(start_frame, min(end_frame + 1, len(boxes_data)), step):
+        for p_name, box_data in boxes_data[frame].items():
+            if not exclusions.contains(p_name, frame):
+                frame_data.append((frame, f"{name_prefix}{p_name}{suffix}", box_data['bbox']))
+
+    return frame_data
+
+def _is_catch(tag_name):
+    return 'catch' in tag_name.lower()
+
+def _is_throw(tag_name):
+    return 'throw' in tag_name.lower()
+
+def pair_catches_with_throws(tags):
+    """
+    Pair every catch tag with the next throw tag by the same player, in one pass.
+
+    A catch tag "<player> catch ..." is matched with the first later tag that
+    mentions "throw" and whose name starts with <player>, the same rule the
+    trajectory endpoints have always used. Catches still waiting for a throw
+    are keyed by player name, so each throw only checks the prefixes of its
+    own name.
+
+    Args:
+        tags: List of tag dicts from video metadata, in stored order
+
+    Returns:
+        List of {'player', 'catch_frame', 'throw_frame', 'catch_index', 'throw_index'}
+        dicts ordered by catch tag position
+    """
+    waiting = {}  # player name -> catch tag indexes without a throw yet
+    sequences = []
+    for index, tag in enumerate(tags):
+        tag_name = tag.get('name', '')
+        if waiting and _is_throw(tag_name):
+            for end in range(len(tag_name) + 1):
+                catches = waiting.pop(tag_name[:end], None)
+                for catch_index in catches or []:
+                    sequences.append({
+                        'player': tags[catch_index].get('name', '').split(' catch')[0].strip(),
+                        'catch_frame': tags[catch_index].get('frame'),
+                        'throw_frame': tag.get('frame'),
+                        'catch_index': catch_index,
+                        'throw_index': index
+                    })
+        if _is_catch(tag_name):
+            waiting.setdefault(tag_name.split(' catch')[0].strip(), []).append(index)
+    sequences.sort(key=lambda sequence: sequence['catch_index'])
+    return sequences
@@ -0,0 +1,187 @@
+import os
+import time
+import threading
+import urllib.parse
+from contextlib import contextmanager
+import cv2
+from seek_planner import seek_planner
+
+CAPTURE_POOL_MAX_OPEN = int(os.getenv('CAPTURE_POOL_MAX_OPEN', 8))
+CAPTURE_POOL_IDLE_SECONDS = float(os.getenv('CAPTURE_POOL_IDLE_SECONDS', 120))
+
+# Optional callable(url) -> local path or None, set by the video mirror
+_local_resolver = None
+
+def set_local_resolver(resolver):
+    global _local_resolver
+    _local_resolver = resolver
+
+def video_source(filepath):
+    """
+    What cv2.VideoCapture should open for a video filepath: a local mirror
+    copy when there is one, otherwise the (quoted) B2 URL
+    """
+    if '://' in filepath:
+        local_path = _local_resolver(filepath) if _local_resolver else None
+        if local_path:
+            return local_path
+        return urllib.parse.quote(filepath, safe=':/?=')
+    return filepath
+
+class PooledCapture:
+    """A cv2.VideoCapture that remembers which frame it will decode next"""
+
+    def __init__(self, source):
+        self.source = source
+        self.cap = cv2.VideoCapture(source)
+        self.position = 0  # frame number the next read() returns
+        self.last_used = time.monotonic()
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def read(self):
+        ret, frame = self.cap.read()
+        self.position = self.position + 1 if ret else -1
+        return ret, frame
+
+    def grab(self):
+        """Advance one frame without converting it to an image"""
+        ok = self.cap.grab()
+        self.position = self.position + 1 if ok else -1
+        return ok
+
+    def read_frame(self, frame_number):
+        """
+        Read a specific frame, decoding forward to it or seeking, whichever the
+        seek planner expects to decode fewer frames.
+        """
+        if frame_number != self.position:
+            if seek_planner.read_through(self.source, self.position, frame_number):
+                while self.position < frame_number and self.grab():
+                    pass
+                if self.position != frame_number:
+                    return False, None
+            else:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                self.position = frame_number
+        return self.read()
+
+    def release(self):
+        self.cap.release()
+
+class VideoCapturePool:
+    """
+    Thread-safe pool of open VideoCaptures keyed by video source.
+
+    A capture is checked out by one thread at a time. Returned captures stay
+    open so the next request against the same video skips the HTTP connection
+    and container/index parsing. At most max_open handles are kept; the least
+    recently used idle handle is closed to make room, and handles idle for
+    longer than idle_seconds are closed on the next pool access.
+    """
+
+    def __init__(self, max_open=CAPTURE_POOL_MAX_OPEN, idle_seconds=CAPTURE_POOL_IDLE_SECONDS):
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._idle = []  # PooledCaptures not currently checked out, oldest first
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._counters = {'opens': 0, 'reuses': 0, 'evictions': 0, 'open_failures': 0}
+
+    def _evict_idle_locked(self, now, make_room=False):
+        """Pick idle captures to close; make_room leaves space for one more checkout"""
+        expired = [c for c in self._idle if now - c.last_used > self.idle_seconds]
+        limit = self.max_open - 1 if make_room else self.max_open
+        while len(self._idle) - len(expired) + self._in_use > limit and len(expired) < len(self._idle):
+            # Over budget: close the least recently used survivors too
+            expired.append(next(c for c in self._idle if c not in expired))
+        for capture in expired:
+            self._idle.remove(capture)
+            self._counters['evictions'] += 1
+        return expired
+
+    def _checkout(self, source, frame_number):
+        now = time.monotonic()
+        with self._lock:
+            candidates = [c for c in self._idle if c.source == source]
+            capture = None
+            if candidates:
+                # Prefer the handle that can reach frame_number by reading forward the least
+                def distance(c):
+                    if frame_number is None or c.position < 0:
+                        return 0
+                    gap = frame_number - c.position
+                    return gap if gap >= 0 else float('inf')
+                capture = min(candidates, key=distance)
+                self._idle.remove(capture)
+                self._counters['reuses'] += 1
+            else:
+                self._counters['opens'] += 1
+            expired = self._evict_idle_locked(now, make_room=True)
+            self._in_use += 1
+
+        for stale in expired:
+            stale.release()
+
+        if capture is None:
+            capture = PooledCapture(source)
+            if not capture.is_opened():
+                with self._lock:
+                    self._counters['open_failures'] += 1
+        return capture
+
+    def _checkin(self, capture, keep):
+        capture.last_used = time.monotonic()
+        with self._lock:
+            self._in_use -= 1
+            keep = keep and capture.is_opened() and len(self._idle) + self._in_use < self.max_open
+            if keep:
+                self._idle.append(capture)
+        if not keep:
+            capture.release()
+
+    @contextmanager
+    def capture(self, filepath, frame_number=None):
+        """
+        Check out an open capture for filepath.
+
+        Args:
+            filepath: Video filepath or URL as stored in the videos table
+            frame_number: Frame the caller is about to read, used to pick the
+                idle handle that needs the shortest read-ahead
+
+        Yields:
+            PooledCapture (check is_opened() before reading)
+        """
+        capture = self._checkout(video_source(filepath), frame_number)
+        try:
+            yield capture
+        except BaseException:
+            # Decoder state is unknown after a failure (or an abandoned
+            # generator), don't hand it out again
+            self._checkin(capture, keep=False)
+            raise
+        else:
+            self._checkin(capture, keep=True)
+
+    def stats(self):
+        with self._lock:
+            expired = self._evict_idle_locked(time.monotonic())
+            checkouts = self._counters['opens'] + self._counters['reuses']
+            stats = {
+                **self._counters,
+                'open_handles': len(self._idle) + self._in_use,
+                'idle_handles': len(self._idle),
+                'in_use': self._in_use,
+                'max_open': self.max_open,
+                'reuse_rate': round(self._counters['reuses'] / checkouts, 3) if checkouts else None
+            }
+        for stale in expired:
+            stale.release()
+        return stats
+
+capture_pool = VideoCapturePool()
@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import threading
+import urllib.parse
+from collections import OrderedDict
+from video_capture_pool import set_local_resolver
+from b2 import bucket, sam_bucket, check_file_exists_in_b2, B2_BUCKET_NAME, B2_SAM_BUCKET
+
+VIDEO_MIRROR_DIR = os.getenv('VIDEO_MIRROR_DIR', 'video_mirror')
+VIDEO_MIRROR_MAX_BYTES = int(os.getenv('VIDEO_MIRROR_MAX_BYTES', 20 * 1024 * 1024 * 1024))
+VIDEO_MIRROR_REVALIDATE_SECONDS = float(os.getenv('VIDEO_MIRROR_REVALIDATE_SECONDS', 300))
+
+def b2_file_for(filepath):
+    """
+    (bucket name, file name) for a B2 download URL such as
+    https://f005.backblazeb2.com/file/<bucket>/<file name>, or None for anything else
+    """
+    if '://' not in filepath:
+        return None
+    path = urllib.parse.unquote(urllib.parse.urlparse(filepath).path)
+    parts = path.split('/', 3)
+    if len(parts) < 4 or parts[1] != 'file' or not parts[3]:
+        return None
+    return parts[2], parts[3]
+
+class VideoMirror:
+    """
+    Local copies of B2-hosted source videos, so OpenCV seeks hit the disk
+    instead of ranged HTTP reads.
+
+    The first lookup of a video starts a background download of the whole
+    file and keeps returning None (use the URL) until it is complete. A copy
+    is only used while its size and file id match B2, re-checked every
+    revalidate_seconds. Videos without a usable copy (downloading, missing
+    from B2, over the quota or failed to download) are not looked up in B2
+    again until revalidate_seconds have passed either. Copies are evicted
+    least recently used first to stay under max_bytes, counting the full
+    size of downloads in progress; a download that would not fit next to
+    them waits for a later lookup.
+    """
+
+    def __init__(self, cache_dir=VIDEO_MIRROR_DIR, max_bytes=VIDEO_MIRROR_MAX_BYTES,
+                 revalidate_seconds=VIDEO_MIRROR_REVALIDATE_SECONDS, buckets=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.buckets = buckets if buckets is not None else {B2_BUCKET_NAME: bucket, B2_SAM_BUCKET: sam_bucket}
+        self._entries = None  # key -> meta dict, least recently used first
+        self._validated = {}  # key -> monotonic time of the last B2 check
+        self._unavailable = {}  # key -> monotonic time it was found missing, too large or failed to download
+        self._downloading = set()
+        self._reserved = {}  # key -> bytes held back for a download in progress
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'downloads': 0, 'download_failures': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _paths(self, key):
+        bucket_name, file_name = key
+        data_path = os.path.join(self.cache_dir, bucket_name, file_name.replace('/', '__'))
+        return data_path, f"{data_path}.meta.json"
+
+    def _load_entries_locked(self):
+        """Rebuild the LRU from meta files left by a previous process"""
+        if self._entries is not None:
+            return
+        metas = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.meta.json'):
+                    continue
+                try:
+                    with open(os.path.join(root, name)) as f:
+                        metas.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        metas.sort(key=lambda meta: meta.get('last_used', 0))
+        self._entries = OrderedDict(
+            ((meta['bucket'], meta['file_name']), meta)
+            for meta in metas
+            if os.path.exists(self._paths((meta['bucket'], meta['file_name']))[0])
+        )
+
+    def _write_meta(self, key, meta):
+        _, meta_path = self._paths(key)
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+
+    def _remove_locked(self, key):
+        self._entries.pop(key, None)
+        self._validated.pop(key, None)
+        for path in self._paths(key):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _make_room_locked(self):
+        """Evict copies until they fit under max_bytes next to the downloads in progress"""
+        used = sum(meta['size'] for meta in self._entries.values()) + sum(self._reserved.values())
+        while self._entries and used > self.max_bytes:
+            key, meta = next(iter(self._entries.items()))
+            print(f"Evicting mirrored video {key[1]} ({meta['size']} bytes)")
+            self._remove_locked(key)
+            used -= meta['size']
+            self._counters['evictions'] += 1
+
+    def _download(self, key, file_info):
+        bucket_name, file_name = key
+        data_path, _ = self._paths(key)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        tmp_path = f"{data_path}.{threading.get_ident()}.tmp"
+        try:
+            with self._lock:
+                self._load_entries_locked()
+                self._make_room_locked()
+            print(f"📥 Mirroring {file_name} from B2 ({file_info['size']} bytes)")
+            started = time.perf_counter()
+            self.buckets[bucket_name].download_file_by_name(file_name).save_to(tmp_path)
+            if os.path.getsize(tmp_path) != file_info['size']:
+                raise Exception(f"Size mismatch: expected {file_info['size']}, got {os.path.getsize(tmp_path)}")
+            os.replace(tmp_path, data_path)
+            meta = {
+                'bucket': bucket_name,
+                'file_name': file_name,
+                'file_id': file_info['file_id'],
+                'size': file_info['size'],
+                'last_used': time.time()
+            }
+            self._write_meta(key, meta)
+            with self._lock:
+                self._entries[key] = meta
+                self._validated[key] = time.monotonic()
+                self._unavailable.pop(key, None)
+                self._counters['downloads'] += 1
+            print(f"✅ Mirrored {file_name} in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            with self._lock:
+                self._unavailable[key] = time.monotonic()
+                self._counters['download_failures'] += 1
+            print(f"❌ Error mirroring {file_name}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            with self._lock:
+                self._downloading.discard(key)
+                self._reserved.pop(key, None)
+
+    def _start_download(self, key, file_info, wait):
+        with self._lock:
+            if key in self._downloading:
+                return
+            if file_info['size'] + sum(self._reserved.values()) > self.max_bytes:
+                reason = 'larger than' if file_info['size'] > self.max_bytes else 'downloads in progress fill'
+                print(f"Not mirroring {key[1]}: {reason} the mirror quota")
+                self._unavailable[key] = time.monotonic()
+                return
+            # Reserve the whole file up front so concurrent downloads can't overrun the quota
+            self._downloading.add(key)
+            self._reserved[key] = file_info['size']
+        if wait:
+            self._download(key, file_info)
+        else:
+            threading.Thread(target=self._download, args=(key, file_info), daemon=True).start()
+
+    def local_path(self, filepath, download=True, wait=False):
+        """
+        Path of a verified local copy of a B2 video URL, or None to keep using the URL.
+
+        Args:
+            download: Start mirroring the video if there is no local copy
+            wait: Download on this thread instead of in the background
+        """
+        key = b2_file_for(filepath)
+        if key is None or key[0] not in self.buckets:
+            return None
+        data_path, _ = self._paths(key)
+
+        with self._lock:
+            self._load_entries_locked()
+            meta = self._entries.get(key)
+            fresh = meta and time.monotonic() - self._validated.get(key, float('-inf')) < self.revalidate_seconds
+            if fresh:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return data_path
+            # No usable copy yet: don't ask B2 on every frame request
+            checked = self._unavailable.get(key, float('-inf'))
+            if key in self._downloading or time.monotonic() - checked < self.revalidate_seconds:
+                self._counters['misses'] += 1
+                return None
+
+        exists, file_info = check_file_exists_in_b2(key[1], self.buckets[key[0]])
+        if not exists:
+            with self._lock:
+                self._unavailable[key] = time.monotonic()
+                self._counters['misses'] += 1
+            return None
+
+        with self._lock:
+            meta = self._entries.get(key)
+            if meta and meta['file_id'] == file_info['file_id'] and meta['size'] == file_info['size'] \
+                    and os.path.exists(data_path) and os.path.getsize(data_path) == meta['size']:
+                self._validated[key] = time.monotonic()
+                self._entries.move_to_end(key)
+                meta['last_used'] = time.time()
+                self._write_meta(key, meta)
+                self._counters['hits'] += 1
+                return data_path
+            if meta:
+                # Replaced in B2 (or truncated locally): drop the stale copy
+                self._remove_locked(key)
+                self._counters['invalidations'] += 1
+            self._counters['misses'] += 1
+
+        if download:
+            self._start_download(key, file_info, wait)
+            if wait:
+                return self.local_path(filepath, download=False)
+        return None
+
+    def stats(self):
+        with self._lock:
+            self._load_entries_locked()
+            return {
+                **self._counters,
+                'videos': len(self._entries),
+                'bytes': sum(meta['size'] for meta in self._entries.values()),
+                'reserved_bytes': sum(self._reserved.values()),
+                'max_bytes': self.max_bytes,
+                'downloading': sorted(name for _, name in self._downloading)
+            }
+
+video_mirror = VideoMirror()
+set_local_resolver(video_mirror.local_path)
@@ -0,0 +1,276 @@
+"""
+Low-resolution proxies and thumbnail sprite sheets of source videos.
+
+One pass over a video writes, into its own directory under PROXY_DIR:
+- proxy.mp4: downscaled, short-GOP H.264 (proxy.avi, all-intra MJPG, when
+  ffmpeg is not installed), one frame per source frame so frame numbers match
+- sprite_NNN.jpg: grids of thumbnails taken every SPRITE_STRIDE frames
+- manifest.json: dimensions and layout, written last
+"""
+import os
+import json
+import shutil
+import hashlib
+import threading
+import subprocess
+import cv2
+import numpy as np
+from video_capture_pool import video_source
+from frame_cache import read_video_frame
+
+PROXY_DIR = os.getenv('PROXY_DIR', 'video_proxies')
+PROXY_WIDTH = int(os.getenv('PROXY_WIDTH', 640))
+# Keyframe interval of the proxy; a seek decodes at most this many frames
+PROXY_GOP = int(os.getenv('PROXY_GOP', 10))
+PROXY_CRF = int(os.getenv('PROXY_CRF', 28))
+SPRITE_STRIDE = int(os.getenv('SPRITE_STRIDE', 30))
+SPRITE_THUMB_WIDTH = int(os.getenv('SPRITE_THUMB_WIDTH', 160))
+SPRITE_COLUMNS = 10
+SPRITE_ROWS = 10
+MANIFEST_VERSION = 1
+
+def scaled_size(width, height, target_width):
+    """Even-sized (width, height) at most target_width wide, keeping the aspect ratio"""
+    target_width = min(target_width, width)
+    target_height = int(round(height * target_width / width))
+    return max(2, target_width - target_width % 2), max(2, target_height - target_height % 2)
+
+class ProxyWriter:
+    """Writes BGR frames to a short-GOP H.264 proxy through ffmpeg, or MJPG through OpenCV"""
+
+    def __init__(self, directory, size, fps, ffmpeg=None):
+        width, height = size
+        self.ffmpeg = ffmpeg if ffmpeg is not None else shutil.which('ffmpeg')
+        if self.ffmpeg:
+            self.filename = 'proxy.mp4'
+            self.process = subprocess.Popen(
+                [self.ffmpeg, '-y', '-loglevel', 'error',
+                 '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f"{width}x{height}", '-r', f"{fps}", '-i', '-',
+                 '-an', '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(PROXY_CRF),
+                 '-g', str(PROXY_GOP), '-bf', '0', '-pix_fmt', 'yuv420p', '-movflags', '+faststart',
+                 os.path.join(directory, self.filename)],
+                stdin=subprocess.PIPE
+            )
+            self.writer = None
+        else:
+            self.filename = 'proxy.avi'
+            self.process = None
+            self.writer = cv2.VideoWriter(
+                os.path.join(directory, self.filename), cv2.VideoWriter_fourcc(*'MJPG'), fps, size
+            )
+
+    def write(self, frame):
+        if self.process:
+            self.process.stdin.write(frame.tobytes())
+        else:
+            self.writer.write(frame)
+
+    def close(self):
+        if self.process:
+            self.process.stdin.close()
+            if self.process.wait() != 0:
+                raise Exception(f"ffmpeg exited with code {self.process.returncode}")
+        else:
+            self.writer.release()
+
+    def abort(self):
+        if self.process:
+            self.process.kill()
+            self.process.wait()
+        else:
+            self.writer.release()
+
+class SpriteSheetWriter:
+    """Packs thumbnails into SPRITE_COLUMNS x SPRITE_ROWS JPEG sheets"""
+
+    def __init__(self, directory, thumb_size):
+        self.directory = directory
+        self.thumb_width, self.thumb_height = thumb_size
+        self.sheets = []
+        self.sheet = None
+        self.count = 0
+
+    def add(self, thumbnail):
+        slot = self.count % (SPRITE_COLUMNS * SPRITE_ROWS)
+        if slot == 0:
+            self.flush()
+            self.sheet = np.zeros((self.thumb_height * SPRITE_ROWS, self.thumb_width * SPRITE_COLUMNS, 3), dtype=np.uint8)
+        row, column = divmod(slot, SPRITE_COLUMNS)
+        y, x = row * self.thumb_height, column * self.thumb_width
+        self.sheet[y:y + self.thumb_height, x:x + self.thumb_width] = thumbnail
+        self.count += 1
+
+    def flush(self):
+        if self.sheet is None:
+            return
+        filename = f"sprite_{len(self.sheets):03d}.jpg"
+        cv2.imwrite(os.path.join(self.directory, filename), self.sheet, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        self.sheets.append(filename)
+        self.sheet = None
+
+class ProxyStore:
+    """
+    Proxy artifacts per video, keyed by the video's filepath.
+
+    Artifacts are built into a temporary directory and moved into place, so
+    a manifest is only ever visible once everything it lists exists.
+    """
+
+    def __init__(self, proxy_dir=PROXY_DIR, ffmpeg=None):
+        self.proxy_dir = proxy_dir
+        self.ffmpeg = ffmpeg
+        self._manifests = {}  # directory -> manifest
+        self._lock = threading.Lock()
+
+    def directory(self, filepath):
+        return os.path.join(self.proxy_dir, hashlib.sha1(filepath.encode('utf-8')).hexdigest())
+
+    def manifest(self, filepath):
+        """The manifest of a video's proxies, or None if they have not been built"""
+        directory = self.directory(filepath)
+        with self._lock:
+            if directory in self._manifests:
+                return self._manifests[directory]
+        try:
+            with open(os.path.join(directory, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('version') != MANIFEST_VERSION:
+            return None
+        with self._lock:
+            self._manifests[directory] = manifest
+        return manifest
+
+    def proxy_path(self, filepath):
+        manifest = self.manifest(filepath)
+        return os.path.join(self.directory(filepath), manifest['proxy']['file']) if manifest else None
+
+    def sprite_path(self, filepath, sheet):
+        manifest = self.manifest(filepath)
+        if not manifest or not 0 <= sheet < len(manifest['sprites']['sheets']):
+            return None
+        return os.path.join(self.directory(filepath), manifest['sprites']['sheets'][sheet])
+
+    def read_frame(self, filepath, frame_number):
+        """
+        Decode a frame from the proxy.
+
+        Returns:
+            (ret, frame, scale) where scale converts source pixel coordinates to
+            proxy pixels, or None if there is no proxy
+        """
+        manifest = self.manifest(filepath)
+        if not manifest:
+            return None
+        ret, frame = read_video_frame(self.proxy_path(filepath), frame_number)
+        return ret, frame, manifest['proxy']['width'] / manifest['width']
+
+    def thumbnail(self, filepath, frame_number):
+        """
+        The sprite thumbnail nearest at or before frame_number.
+
+        Returns:
+            (thumbnail frame number, BGR image), or None if there are no sprites
+        """
+        manifest = self.manifest(filepath)
+        if not manifest or not manifest['sprites']['count']:
+            return None
+        sprites = manifest['sprites']
+        index = min(max(0, frame_number) // sprites['stride'], sprites['count'] - 1)
+        sheet, slot = divmod(index, sprites['columns'] * sprites['rows'])
+        image = cv2.imread(self.sprite_path(filepath, sheet))
+        if image is None:
+            return None
+        row, column = divmod(slot, sprites['columns'])
+        y, x = row * sprites['thumb_height'], column * sprites['thumb_width']
+        return index * sprites['stride'], image[y:y + sprites['thumb_height'], x:x + sprites['thumb_width']]
+
+    def build(self, filepath, progress=None):
+        """
+        Decode a video once and write its proxy, sprite sheets and manifest.
+
+        Args:
+            filepath: Video filepath or URL as stored in the videos table
+            progress: Optional callable(done, total, message)
+
+        Returns:
+            The manifest
+        """
+        directory = self.directory(filepath)
+        build_dir = f"{directory}.{threading.get_ident()}.tmp"
+        shutil.rmtree(build_dir, ignore_errors=True)
+        os.makedirs(build_dir)
+
+        cap = cv2.VideoCapture(video_source(filepath))
+        if not cap.isOpened():
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise Exception("Could not open video")
+
+        proxy = None
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            proxy_size = scaled_size(width, height, PROXY_WIDTH)
+            thumb_size = scaled_size(width, height, SPRITE_THUMB_WIDTH)
+
+            proxy = ProxyWriter(build_dir, proxy_size, fps, ffmpeg=self.ffmpeg)
+            sprites = SpriteSheetWriter(build_dir, thumb_size)
+            frame_number = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if progress and frame_number % SPRITE_STRIDE == 0:
+                    progress(frame_number, total, f"frame {frame_number}")
+                small = cv2.resize(frame, proxy_size, interpolation=cv2.INTER_AREA)
+                proxy.write(small)
+                if frame_number % SPRITE_STRIDE == 0:
+                    sprites.add(cv2.resize(small, thumb_size, interpolation=cv2.INTER_AREA))
+                frame_number += 1
+            proxy.close()
+            sprites.flush()
+        except BaseException:
+            if proxy:
+                proxy.abort()
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+        finally:
+            cap.release()
+
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'source': filepath,
+            'frame_count': frame_number,
+            'fps': fps,
+            'width': width,
+            'height': height,
+            'proxy': {
+                'file': proxy.filename,
+                'width': proxy_size[0],
+                'height': proxy_size[1],
+                'gop': PROXY_GOP if proxy.ffmpeg else 1
+            },
+            'sprites': {
+                'stride': SPRITE_STRIDE,
+                'count': sprites.count,
+                'columns': SPRITE_COLUMNS,
+                'rows': SPRITE_ROWS,
+                'thumb_width': thumb_size[0],
+                'thumb_height': thumb_size[1],
+                'sheets': sprites.sheets
+            }
+        }
+        with open(os.path.join(build_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+
+        with self._lock:
+            self._manifests.pop(directory, None)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(build_dir, directory)
+        print(f"✅ Built proxy and {len(sprites.sheets)} sprite sheets for {filepath} ({frame_number} frames)")
+        return manifest
+
+proxy_store = ProxyStore()